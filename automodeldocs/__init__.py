@@ -3,6 +3,9 @@ import asyncio
 
 from function_discovery import parse_module
 
+from automodeldocs.explorer import fully_describe_item
+from automodeldocs.package import fully_describe_package
+
 
 def describe_function(
     function_name: str, source_file: pathlib.Path, module_name: str
@@ -10,5 +13,11 @@ def describe_function(
     target_module = parse_module(
         source_file, module_name=module_name, starting_path=None
     )
-    target_function = target_module.resolve_name(function_name)
-    return asyncio.run(describe_function(target_function))
+    target_function = target_module.resolve_name(function_name).origin
+    return asyncio.run(fully_describe_item(target_function))
+
+
+def describe_package(
+    package_path: pathlib.Path, package_name: str | None = None
+) -> dict[str, str]:
+    return asyncio.run(fully_describe_package(package_path, package_name))
@@ -0,0 +1,94 @@
+from __future__ import annotations
+import ast
+import builtins
+import difflib
+import logging
+import textwrap
+from dataclasses import dataclass
+from itertools import combinations
+from typing import Optional
+
+from automodeldocs.chat.tokens import count_tokens
+from automodeldocs.structures import Improvement
+
+logger = logging.getLogger(__name__)
+
+# Candidates written before checking whether the beam has converged.
+CONVERGENCE_PROBE_WIDTH = 2
+
+SMALL_SOURCE_TOKENS = 96
+LARGE_SOURCE_TOKENS = 384
+USEFUL_DOCSTRING_WORDS = 25
+MANY_UNRESOLVED_NAMES = 8
+
+
+@dataclass
+class BeamSignals:
+    source_tokens: int
+    docstring_words: int
+    unresolved_names: int
+    improvement: bool
+
+
+def unresolved_names(function_source: str) -> int:
+    """Names a function reads without defining them, i.e. it depends on."""
+    try:
+        tree = ast.parse(textwrap.dedent(function_source))
+    except SyntaxError:
+        return 0
+    defined = set(dir(builtins))
+    used = set()
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            defined.add(node.name)
+        elif isinstance(node, ast.arg):
+            defined.add(node.arg)
+        elif isinstance(node, ast.Name):
+            if isinstance(node.ctx, ast.Load):
+                used.add(node.id)
+            else:
+                defined.add(node.id)
+    return len(used - defined)
+
+
+def beam_signals(
+    function_source: str,
+    function_docs: Optional[str],
+    improvement: Optional[Improvement],
+) -> BeamSignals:
+    return BeamSignals(
+        source_tokens=count_tokens(function_source, "gpt-3.5-turbo-16k"),
+        docstring_words=len(function_docs.split()) if function_docs else 0,
+        unresolved_names=unresolved_names(function_source),
+        improvement=improvement is not None,
+    )
+
+
+def choose_beam_width(signals: BeamSignals, max_width: int) -> int:
+    """
+    Small, already documented or improvement-pass nodes get fewer candidates;
+    long code leaning on many outside names gets the full beam.
+    """
+    if signals.source_tokens <= SMALL_SOURCE_TOKENS:
+        width = 1
+    elif signals.source_tokens <= LARGE_SOURCE_TOKENS:
+        width = 2
+    else:
+        width = max_width
+    if signals.unresolved_names >= MANY_UNRESOLVED_NAMES:
+        width += 1
+    # A useful docstring is itself one of the candidates given to the evaluator.
+    if signals.docstring_words >= USEFUL_DOCSTRING_WORDS:
+        width -= 1
+    # Improvement passes are steered by feedback, so need less exploration.
+    if signals.improvement:
+        width -= 1
+    return max(1, min(width, max_width))
+
+
+def converged(candidates: list[str], threshold: float) -> bool:
+    """Whether any two candidates are near-identical."""
+    return any(
+        difflib.SequenceMatcher(None, first, second).ratio() >= threshold
+        for first, second in combinations(candidates, 2)
+    )
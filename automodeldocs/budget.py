@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import logging
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Optional
+
+from automodeldocs.config.llm_config import LLMConfig
+from automodeldocs.metrics import log_event
+
+logger = logging.getLogger(__name__)
+
+# USD per 1k (prompt, completion) tokens.
+MODEL_PRICES: dict[str, tuple[float, float]] = {
+    "gpt-4": (0.03, 0.06),
+    "gpt-3.5-turbo": (0.0015, 0.002),
+    "gpt-3.5-turbo-16k": (0.003, 0.004),
+}
+
+
+class BudgetExceededError(RuntimeError):
+    pass
+
+
+@dataclass(frozen=True)
+class Reservation:
+    """Estimated usage held against the budget while a request is in flight."""
+
+    tokens: int = 0
+    dollars: float = 0.0
+
+
+class BudgetLevel(IntEnum):
+    FULL = 0
+    # Beams shrink to a single candidate.
+    REDUCED_BEAM = 1
+    # Nodes are not re-described once they have an initial description.
+    NO_IMPROVEMENT = 2
+    # No further LLM calls, nodes fall back to their docstrings.
+    DOCSTRING_ONLY = 3
+
+
+@dataclass
+class RunBudget:
+    max_tokens: Optional[int] = None
+    max_dollars: Optional[float] = None
+    # Fraction of the budget at which REDUCED_BEAM, NO_IMPROVEMENT and DOCSTRING_ONLY start.
+    thresholds: tuple[float, float, float] = (0.6, 0.8, 0.95)
+    used_tokens: int = 0
+    used_dollars: float = 0.0
+    reserved_tokens: int = 0
+    reserved_dollars: float = 0.0
+    skipped: list[dict[str, str]] = field(default_factory=list)
+
+    @classmethod
+    def from_config(cls, config: LLMConfig) -> RunBudget:
+        return cls(max_tokens=config.token_budget, max_dollars=config.cost_budget)
+
+    def fraction_used(self, tokens: int = 0, dollars: float = 0.0) -> float:
+        """The fraction of the budget spent or reserved, plus `tokens` and `dollars`."""
+        fractions = [0.0]
+        if self.max_tokens is not None:
+            fractions.append(
+                (self.used_tokens + self.reserved_tokens + tokens) / self.max_tokens
+            )
+        if self.max_dollars is not None:
+            fractions.append(
+                (self.used_dollars + self.reserved_dollars + dollars) / self.max_dollars
+            )
+        return max(fractions)
+
+    def level(self) -> BudgetLevel:
+        fraction_used = self.fraction_used()
+        level = BudgetLevel.FULL
+        for threshold, next_level in zip(self.thresholds, list(BudgetLevel)[1:]):
+            if fraction_used >= threshold:
+                level = next_level
+        return level
+
+    def check(
+        self, model: str = "gpt-4", prompt_tokens: int = 0, completion_tokens: int = 0
+    ) -> Reservation:
+        """
+        Reserves the estimated usage of a request about to be sent, so that concurrent
+        requests cannot overshoot the budget between being sent and replying. The
+        reservation is released by `charge` or `release`.
+        """
+        reservation = Reservation(
+            prompt_tokens + completion_tokens,
+            _price(model, prompt_tokens, completion_tokens),
+        )
+        if (
+            self.fraction_used() >= 1.0
+            or self.fraction_used(reservation.tokens, reservation.dollars) > 1.0
+        ):
+            raise BudgetExceededError(
+                f"Run budget exhausted - {self.used_tokens} tokens, "
+                f"${self.used_dollars:.2f}, {self.reserved_tokens} tokens in flight"
+            )
+        self.reserved_tokens += reservation.tokens
+        self.reserved_dollars += reservation.dollars
+        return reservation
+
+    def release(self, reservation: Reservation) -> None:
+        self.reserved_tokens -= reservation.tokens
+        self.reserved_dollars -= reservation.dollars
+
+    def charge(
+        self,
+        model: str,
+        prompt_tokens: Optional[int],
+        completion_tokens: Optional[int],
+        reservation: Optional[Reservation] = None,
+    ) -> None:
+        prompt_tokens = prompt_tokens or 0
+        completion_tokens = completion_tokens or 0
+        previous_level = self.level()
+        if reservation is not None:
+            self.release(reservation)
+        self.used_tokens += prompt_tokens + completion_tokens
+        self.used_dollars += _price(model, prompt_tokens, completion_tokens)
+        if (current_level := self.level()) != previous_level:
+            log_event(
+                "budget.degraded",
+                level=logging.WARNING,
+                budget_level=current_level.name,
+                used_tokens=self.used_tokens,
+                used_dollars=round(self.used_dollars, 4),
+            )
+
+    def record_skip(self, stage: str, name: str) -> None:
+        self.skipped.append(
+            {"stage": stage, "name": name, "budget_level": self.level().name}
+        )
+
+    def report(self) -> dict:
+        return {
+            "max_tokens": self.max_tokens,
+            "max_dollars": self.max_dollars,
+            "used_tokens": self.used_tokens,
+            "used_dollars": round(self.used_dollars, 4),
+            "budget_level": self.level().name,
+            "skipped": self.skipped,
+        }
+
+
+def _price(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    prompt_price, completion_price = MODEL_PRICES.get(model, MODEL_PRICES["gpt-4"])
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000
+
+
+_run_budget: ContextVar[Optional[RunBudget]] = ContextVar("run_budget", default=None)
+
+
+def run_budget() -> RunBudget:
+    budget = _run_budget.get()
+    if budget is None:
+        budget = RunBudget.from_config(LLMConfig.from_env())
+        _run_budget.set(budget)
+    return budget
+
+
+def set_run_budget(budget: Optional[RunBudget]) -> None:
+    _run_budget.set(budget)
@@ -0,0 +1,118 @@
+from __future__ import annotations
+import argparse
+import json
+import logging
+import os
+import pathlib
+import random
+import time
+from typing import Optional
+
+from automodeldocs.cache_store import ContentStore
+from automodeldocs.describe.cache import DescribeDBCache
+from automodeldocs.metrics import log_event
+
+logger = logging.getLogger(__name__)
+
+LEGACY_CACHE_DIRS = [".function_cache", ".function_description_cache"]
+
+
+def remove_empty_directories(root: pathlib.Path, dry_run: bool = False) -> int:
+    """
+    Removes every directory under `root` that holds no files, such as those the
+    legacy fan and format caches created on each miss. Returns the count.
+    """
+    if not root.is_dir():
+        return 0
+    removed = 0
+    emptied: set[str] = set()
+    for directory, subdirectories, files in os.walk(root, topdown=False):
+        if files or any(
+            os.path.join(directory, sub) not in emptied for sub in subdirectories
+        ):
+            continue
+        if not dry_run:
+            os.rmdir(directory)
+        emptied.add(directory)
+        removed += 1
+    return removed
+
+
+def time_lookups(store: ContentStore, sample: int = 500) -> Optional[float]:
+    """Mean seconds to read and parse a random sample of stored documents."""
+    paths = [
+        path
+        for namespace in store.namespaces()
+        for path in (store.root / namespace).glob("*/*.json")
+    ]
+    if not paths:
+        return None
+    paths = random.sample(paths, min(sample, len(paths)))
+    start = time.perf_counter()
+    for path in paths:
+        with open(path) as f:
+            json.loads(f.read())
+    return (time.perf_counter() - start) / len(paths)
+
+
+def maintain(
+    store: ContentStore,
+    home: pathlib.Path,
+    max_bytes: Optional[int] = None,
+    ttl_days: Optional[float] = None,
+    dry_run: bool = False,
+) -> dict:
+    lookup_before = time_lookups(store)
+    reports = store.collect(
+        max_bytes, None if ttl_days is None else ttl_days * 86400, dry_run
+    )
+    legacy_directories = {
+        name: remove_empty_directories(home / name, dry_run)
+        for name in LEGACY_CACHE_DIRS
+    }
+    describe_db = home / "_function_descriptions.parquet"
+    if describe_db.exists() and not dry_run:
+        DescribeDBCache(describe_db).close()
+    summary = {
+        "removed": sum(report.removed for report in reports.values()),
+        "reclaimed_bytes": sum(report.reclaimed_bytes for report in reports.values()),
+        "remaining_bytes": sum(report.remaining_bytes for report in reports.values()),
+        "empty_legacy_directories": legacy_directories,
+        "lookup_us_before": None if lookup_before is None else lookup_before * 1e6,
+        "lookup_us_after": (
+            None
+            if (lookup_after := time_lookups(store)) is None
+            else lookup_after * 1e6
+        ),
+    }
+    log_event("cache.maintained", root=str(store.root), dry_run=dry_run, **summary)
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Expire, cap and tidy the on-disk caches."
+    )
+    parser.add_argument("--store", type=pathlib.Path)
+    parser.add_argument("--home", type=pathlib.Path, default=pathlib.Path.home())
+    parser.add_argument(
+        "--max-bytes",
+        type=int,
+        help="Largest size allowed per namespace, evicting the least recently read first",
+    )
+    parser.add_argument(
+        "--ttl-days", type=float, help="Drop documents unused for this long"
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Report without deleting anything"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    summary = maintain(
+        ContentStore(args.store or ContentStore.default_root()),
+        args.home,
+        args.max_bytes,
+        args.ttl_days,
+        args.dry_run,
+    )
+    print(json.dumps(summary, indent=2))
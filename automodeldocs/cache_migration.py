@@ -0,0 +1,125 @@
+from __future__ import annotations
+import argparse
+import json
+import logging
+import pathlib
+import shutil
+import sqlite3
+
+from automodeldocs import fan_cache, format_cache
+from automodeldocs.cache_store import ContentStore
+from automodeldocs.chat import cache as chat_cache
+from automodeldocs.metrics import log_event
+
+logger = logging.getLogger(__name__)
+
+
+def legacy_function_entries(
+    legacy_dir: pathlib.Path,
+) -> list[tuple[str, pathlib.Path]]:
+    """(cache key, entry directory) for every `<name>/<md5>/description.txt`."""
+    if not legacy_dir.is_dir():
+        return []
+    return [
+        (f"{entry.parent.parent.name}/{entry.parent.name}", entry.parent)
+        for entry in legacy_dir.glob("*/*/description.txt")
+    ]
+
+
+def migrate_fan_cache(store: ContentStore, legacy_dir: pathlib.Path) -> int:
+    migrated = 0
+    for key, entry in legacy_function_entries(legacy_dir):
+        try:
+            evaluation_response = json.loads(
+                (entry / "evaluation_response.json").read_text()
+            )
+        except (FileNotFoundError, json.JSONDecodeError) as e:
+            logger.warning(f"Skipping incomplete fan cache entry {entry} - {e!r}")
+            continue
+        store.put(
+            fan_cache.NAMESPACE,
+            key,
+            {
+                "description": (entry / "description.txt").read_text(),
+                "evaluation_response": evaluation_response,
+            },
+        )
+        migrated += 1
+    return migrated
+
+
+def migrate_format_cache(store: ContentStore, legacy_dir: pathlib.Path) -> int:
+    entries = legacy_function_entries(legacy_dir)
+    for key, entry in entries:
+        store.put(format_cache.NAMESPACE, key, (entry / "description.txt").read_text())
+    return len(entries)
+
+
+def migrate_chat_cache(
+    store: ContentStore, sqlite_path: pathlib.Path, json_path: pathlib.Path
+) -> int:
+    migrated = 0
+    if json_path.exists():
+        legacy_cache: dict[str, list[list[str]]] = json.loads(json_path.read_text())
+        for key, value in legacy_cache.items():
+            store.put(chat_cache.NAMESPACE, key, value)
+        migrated += len(legacy_cache)
+    if sqlite_path.exists():
+        connection = sqlite3.connect(sqlite_path)
+        try:
+            for key, value in connection.execute(
+                "SELECT message_hash, response FROM responses"
+            ):
+                store.put(chat_cache.NAMESPACE, key, json.loads(value))
+                migrated += 1
+        finally:
+            connection.close()
+    return migrated
+
+
+def migrate_all(
+    store: ContentStore, home: pathlib.Path, remove: bool = False
+) -> dict[str, int]:
+    """
+    Copies the per-function fan and format directories and the chat cache
+    (JSON or SQLite) from `home` into `store`. With `remove` the legacy caches
+    are deleted once copied.
+    """
+    fan_dir = home / ".function_cache"
+    format_dir = home / ".function_description_cache"
+    sqlite_path = home / ".llm_cache.sqlite3"
+    json_path = home / ".llm_cache.json"
+    migrated = {
+        "fan": migrate_fan_cache(store, fan_dir),
+        "format": migrate_format_cache(store, format_dir),
+        "chat": migrate_chat_cache(store, sqlite_path, json_path),
+    }
+    if remove:
+        for directory in [fan_dir, format_dir]:
+            shutil.rmtree(directory, ignore_errors=True)
+        for path in [
+            json_path,
+            sqlite_path,
+            sqlite_path.with_name(sqlite_path.name + "-wal"),
+            sqlite_path.with_name(sqlite_path.name + "-shm"),
+        ]:
+            path.unlink(missing_ok=True)
+    log_event("cache.migrated", root=str(store.root), removed=remove, **migrated)
+    return migrated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Move the legacy fan, format and chat caches into the content store."
+    )
+    parser.add_argument("--home", type=pathlib.Path, default=pathlib.Path.home())
+    parser.add_argument("--store", type=pathlib.Path)
+    parser.add_argument(
+        "--remove", action="store_true", help="Delete the legacy caches afterwards"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    migrated = migrate_all(
+        ContentStore(args.store or ContentStore.default_root()), args.home, args.remove
+    )
+    print(", ".join(f"{namespace}: {n}" for namespace, n in migrated.items()))
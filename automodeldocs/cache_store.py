@@ -0,0 +1,291 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import pathlib
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from hashlib import sha256
+from typing import Any, ClassVar, Iterator, Optional
+
+import cachetools
+
+from automodeldocs.config.llm_config import LLMConfig
+from automodeldocs.metrics import MEMORY_CACHE_EVENTS, log_event
+
+logger = logging.getLogger(__name__)
+
+# Temporary files older than this were left by a writer that crashed.
+STALE_TMP_SECONDS = 3600
+
+
+class MemoryTier(cachetools.LRUCache):
+    """
+    Recently used documents as encoded JSON, keyed by (namespace, key) and
+    bounded by their size in bytes. Least recently used documents go first.
+    Each hit is decoded afresh, so callers can't mutate what later hits see.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        super().__init__(maxsize=max_bytes, getsizeof=lambda entry: entry[1])
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, namespace: str, key: str) -> Optional[str]:
+        entry = self.get((namespace, key))
+        if entry is None:
+            self.misses += 1
+            MEMORY_CACHE_EVENTS.inc(namespace=namespace, event="miss")
+            return None
+        self.hits += 1
+        MEMORY_CACHE_EVENTS.inc(namespace=namespace, event="hit")
+        return entry[0]
+
+    def store(self, namespace: str, key: str, content: str) -> None:
+        size = len(content.encode())
+        if size <= self.maxsize:
+            self[(namespace, key)] = (content, size)
+
+    def popitem(self):
+        (namespace, key), entry = super().popitem()
+        self.evictions += 1
+        MEMORY_CACHE_EVENTS.inc(namespace=namespace, event="eviction")
+        return (namespace, key), entry
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "items": len(self),
+            "bytes": self.currsize,
+            "max_bytes": self.maxsize,
+        }
+
+
+@dataclass
+class CollectionReport:
+    removed: int = 0
+    reclaimed_bytes: int = 0
+    remaining: int = 0
+    remaining_bytes: int = 0
+
+
+class ContentStore:
+    """
+    JSON documents on disk, addressed by the SHA-256 of their key and grouped
+    into namespaces (`fan`, `format`, `chat`). Each document lives at
+    `<root>/<namespace>/<digest[:2]>/<digest[2:]>.json`, so a read is a single
+    `open` and no directory holds more than 1/256th of a namespace. Writes go
+    to a temporary file that is renamed into place, so a crash never leaves a
+    partial document behind.
+
+    With `memory_bytes` set, recently used documents are also kept in memory,
+    so repeated lookups skip the read. With
+    `track_access`, every read from disk also bumps the document's mtime, so
+    `collect` expires and evicts by last access rather than by last write.
+    """
+
+    _shared: ClassVar[Optional[ContentStore]] = None
+
+    def __init__(
+        self, root: pathlib.Path, memory_bytes: int = 0, track_access: bool = False
+    ) -> None:
+        self.root = root
+        self.memory = MemoryTier(memory_bytes) if memory_bytes > 0 else None
+        self.track_access = track_access and os.utime in os.supports_fd
+
+    @classmethod
+    def default_root(cls) -> pathlib.Path:
+        cache_dir = LLMConfig.from_env().cache_dir
+        if cache_dir is not None:
+            return pathlib.Path(cache_dir)
+        return pathlib.Path.home() / ".automodeldocs_cache"
+
+    @classmethod
+    def shared(cls) -> ContentStore:
+        if cls._shared is None:
+            config = LLMConfig.from_env()
+            ttl_seconds = (
+                None if config.cache_ttl_days is None else config.cache_ttl_days * 86400
+            )
+            # Reads always bump mtimes, even without a policy, so that a later
+            # `cache_maintenance --max-bytes` run evicts by last access.
+            cls._shared = cls(
+                cls.default_root(), config.memory_cache_bytes, track_access=True
+            )
+            cls._shared.migrate_legacy(pathlib.Path.home())
+            if config.cache_max_bytes is not None or ttl_seconds is not None:
+                # Collected once per process, off the event loop.
+                threading.Thread(
+                    target=cls._shared.collect,
+                    args=(config.cache_max_bytes, ttl_seconds),
+                    daemon=True,
+                ).start()
+        return cls._shared
+
+    def migrate_legacy(self, home: pathlib.Path) -> None:
+        """
+        Imports the caches kept under `home` before the content store, the
+        first time the store is opened, so upgrading doesn't lose them.
+        """
+        marker = self.root / ".legacy_migrated"
+        if marker.exists():
+            return
+        # Imported here as the migrated caches are themselves built on the store.
+        from automodeldocs.cache_migration import migrate_all
+
+        migrate_all(self, home)
+        self.root.mkdir(parents=True, exist_ok=True)
+        marker.touch()
+
+    @staticmethod
+    def digest(key: str) -> str:
+        return sha256(key.encode()).hexdigest()
+
+    def path(self, namespace: str, key: str) -> pathlib.Path:
+        digest = self.digest(key)
+        return self.root / namespace / digest[:2] / f"{digest[2:]}.json"
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        if self.memory is not None and (
+            (content := self.memory.lookup(namespace, key)) is not None
+        ):
+            return json.loads(content)
+        path = self.path(namespace, key)
+        try:
+            with open(path) as f:
+                content = f.read()
+                if self.track_access:
+                    os.utime(f.fileno())
+            document = json.loads(content)
+        except FileNotFoundError:
+            return None
+        except json.JSONDecodeError as e:
+            logger.warning(f"Ignoring unreadable cache entry {path} - {e!r}")
+            return None
+        if self.memory is not None:
+            self.memory.store(namespace, key, content)
+        return document
+
+    def put(self, namespace: str, key: str, value: Any) -> None:
+        path = self.path(namespace, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        content = json.dumps(value)
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        except FileNotFoundError:
+            # The shard was emptied and removed by a concurrent collection.
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        if self.memory is not None:
+            self.memory.store(namespace, key, content)
+
+    def stats(self) -> dict[str, int]:
+        return {} if self.memory is None else self.memory.stats()
+
+    def namespaces(self) -> list[str]:
+        if not self.root.is_dir():
+            return []
+        return sorted(path.name for path in self.root.iterdir() if path.is_dir())
+
+    def collect(
+        self,
+        max_bytes: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+        dry_run: bool = False,
+    ) -> dict[str, CollectionReport]:
+        """
+        Applies the retention policy to every namespace: documents unused for
+        `ttl_seconds` go first, then the least recently used until the
+        namespace fits in `max_bytes`. Temporary files left by crashed writers
+        and emptied shard directories are removed as well.
+        """
+        reports = {
+            namespace: self._collect_namespace(
+                namespace, max_bytes, ttl_seconds, dry_run
+            )
+            for namespace in self.namespaces()
+        }
+        log_event(
+            "cache.collected",
+            root=str(self.root),
+            dry_run=dry_run,
+            **{namespace: vars(report) for namespace, report in reports.items()},
+        )
+        return reports
+
+    def _collect_namespace(
+        self,
+        namespace: str,
+        max_bytes: Optional[int],
+        ttl_seconds: Optional[float],
+        dry_run: bool,
+    ) -> CollectionReport:
+        report = CollectionReport()
+        now = time.time()
+        entries: list[tuple[float, int, pathlib.Path]] = []
+
+        def remove(path: pathlib.Path, mtime: float, size: int) -> bool:
+            if not dry_run:
+                try:
+                    if path.stat().st_mtime != mtime:
+                        # Rewritten or read by a concurrent process since.
+                        return False
+                except FileNotFoundError:
+                    return False
+                path.unlink(missing_ok=True)
+            report.removed += 1
+            report.reclaimed_bytes += size
+            return True
+
+        for path in (self.root / namespace).glob("*/*"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            age = now - stat.st_mtime
+            if path.suffix == ".tmp":
+                if age > STALE_TMP_SECONDS:
+                    remove(path, stat.st_mtime, stat.st_size)
+            elif ttl_seconds is not None and age > ttl_seconds:
+                if not remove(path, stat.st_mtime, stat.st_size):
+                    report.remaining += 1
+                    report.remaining_bytes += stat.st_size
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        if max_bytes is not None and total > max_bytes:
+            entries.sort()
+            kept = []
+            for mtime, size, path in entries:
+                if total > max_bytes and remove(path, mtime, size):
+                    total -= size
+                else:
+                    kept.append((mtime, size, path))
+            entries = kept
+        if not dry_run:
+            for shard in (self.root / namespace).iterdir():
+                if shard.is_dir() and not any(shard.iterdir()):
+                    try:
+                        shard.rmdir()
+                    except OSError:
+                        # A concurrent put created a file in it since.
+                        pass
+        report.remaining += len(entries)
+        report.remaining_bytes += total
+        return report
+
+    def entries(self, namespace: str) -> Iterator[pathlib.Path]:
+        return (self.root / namespace).glob("*/*.json")
@@ -0,0 +1,340 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import pathlib
+import random
+import re
+import uuid
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional, Protocol
+
+import openai
+
+from automodeldocs.chat.cache import simple_cache
+from automodeldocs.chat.client import client_session
+from automodeldocs.chat.rate_limit import RateLimitError, rate_limiter_for
+from automodeldocs.chat.tokens import count_message_tokens, count_tokens
+from automodeldocs.config.llm_config import LLMConfig
+from automodeldocs.definitions import OpenAIInputMessage
+from automodeldocs.describe.function_scratch_prompt import SCRATCH_END
+from automodeldocs.response.formatted import FormattedOpenAIResponse
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Completion:
+    responses: list[FormattedOpenAIResponse]
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+
+
+class LLMBackend(Protocol):
+    name: str
+
+    async def complete(
+        self,
+        messages: list[OpenAIInputMessage],
+        model: str,
+        functions: str | None = None,
+        function_call: str | None = None,
+    ) -> Completion: ...
+
+    def stream(
+        self, messages: list[OpenAIInputMessage], model: str
+    ) -> AsyncIterator[str]: ...
+
+
+class ReplayMissError(KeyError):
+    pass
+
+
+class OpenAIBackend:
+    name = "openai"
+
+    def __init__(
+        self,
+        api_base: str = "https://api.openai.com/v1",
+        api_key: Optional[str] = None,
+    ) -> None:
+        self.api_base = api_base.rstrip("/")
+        self.api_key = api_key
+
+    @property
+    def chat_completions_url(self) -> str:
+        return f"{self.api_base}/chat/completions"
+
+    def _headers(self) -> dict[str, str]:
+        api_key = self.api_key if self.api_key is not None else openai.api_key
+        assert api_key is not None
+        return {
+            "Content-Type": "application/json",
+            "Authorization": "Bearer " + api_key,
+        }
+
+    async def complete(
+        self,
+        messages: list[OpenAIInputMessage],
+        model: str,
+        functions: str | None = None,
+        function_call: str | None = None,
+    ) -> Completion:
+        request_uuid = uuid.uuid4()
+        rate_limiter = rate_limiter_for(model)
+        json_data = {"model": model, "messages": messages}
+        if functions is not None:
+            json_data.update({"functions": functions})
+        if function_call is not None:
+            json_data.update({"function_call": function_call})
+        reserved_tokens = await rate_limiter.acquire(
+            count_message_tokens(messages, model)
+        )
+        logger.info(f"[{request_uuid}] Started Chat Completion Request")
+        async with client_session() as session:
+            async with session.post(
+                self.chat_completions_url,
+                headers=self._headers(),
+                json=json_data,
+            ) as response:
+                rate_limiter.update_from_headers(response.headers)
+                if response.status == 429:
+                    rate_limiter.back_off(response.headers)
+                    raise RateLimitError(await response.text())
+                if response.status >= 400:
+                    raise RuntimeError(
+                        f"Chat Completion failed with {response.status} - {await response.text()}"
+                    )
+                raw_response = await response.json()
+        usage = raw_response.get("usage", {})
+        rate_limiter.reconcile(reserved_tokens, usage.get("total_tokens"))
+        logger.info(f"[{request_uuid}] Finished Chat Completion Request")
+        return Completion(
+            FormattedOpenAIResponse.from_message(raw_response),
+            prompt_tokens=usage.get("prompt_tokens"),
+            completion_tokens=usage.get("completion_tokens"),
+        )
+
+    async def stream(
+        self, messages: list[OpenAIInputMessage], model: str
+    ) -> AsyncIterator[str]:
+        request_uuid = uuid.uuid4()
+        rate_limiter = rate_limiter_for(model)
+        prompt_tokens = count_message_tokens(messages, model)
+        reserved_tokens = await rate_limiter.acquire(prompt_tokens)
+        logger.info(f"[{request_uuid}] Started Chat Completion Stream")
+        completion_tokens = 0
+        async with client_session() as session:
+            async with session.post(
+                self.chat_completions_url,
+                headers=self._headers(),
+                json={"model": model, "messages": messages, "stream": True},
+            ) as response:
+                rate_limiter.update_from_headers(response.headers)
+                if response.status == 429:
+                    rate_limiter.back_off(response.headers)
+                    raise RateLimitError(await response.text())
+                if response.status >= 400:
+                    raise RuntimeError(
+                        f"Chat Completion failed with {response.status} - {await response.text()}"
+                    )
+                async for raw_line in response.content:
+                    line = raw_line.decode().strip()
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:") :].strip()
+                    if data == "[DONE]":
+                        break
+                    delta = json.loads(data)["choices"][0]["delta"].get("content")
+                    if delta:
+                        completion_tokens += count_tokens(delta, model)
+                        yield delta
+        rate_limiter.reconcile(reserved_tokens, prompt_tokens + completion_tokens)
+        logger.info(f"[{request_uuid}] Finished Chat Completion Stream")
+
+
+class ReplayBackend:
+    """Serves previously recorded responses from the chat cache, without network access."""
+
+    name = "replay"
+
+    async def complete(
+        self,
+        messages: list[OpenAIInputMessage],
+        model: str,
+        functions: str | None = None,
+        function_call: str | None = None,
+    ) -> Completion:
+        with simple_cache() as cache:
+            recorded_response = cache.try_retrieve(messages)
+        if recorded_response is None:
+            raise ReplayMissError(
+                f"No recorded response for {cache.hash_message(messages)}"
+            )
+        return Completion(
+            [FormattedOpenAIResponse(r[0], r[1]) for r in recorded_response]
+        )
+
+    async def stream(
+        self, messages: list[OpenAIInputMessage], model: str
+    ) -> AsyncIterator[str]:
+        yield (await self.complete(messages, model)).responses[-1].content
+
+
+class SyntheticBackend:
+    """
+    Returns well-formed responses for every prompt in the pipeline after a configurable
+    latency, so the pipeline can be exercised and timed offline.
+    """
+
+    name = "synthetic"
+
+    def __init__(
+        self, latency: float = 0.5, jitter: float = 0.1, seed: Optional[int] = None
+    ) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self._random = random.Random(seed)
+
+    def _delay(self) -> float:
+        return max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+
+    def _evaluation(self, n_documents: int) -> dict:
+        return {
+            "ratings": [
+                {"idx": str(idx), "rating": "B", "reasoning": "Synthetic"}
+                for idx in range(n_documents)
+            ],
+            "additional_context_required": [],
+            "best_documentation_feedback": {
+                "idx": str(self._random.randrange(n_documents)),
+                "feedback": "Synthetic feedback.",
+            },
+        }
+
+    def _reply(self, messages: list[OpenAIInputMessage]) -> str:
+        system_message = messages[0]["content"]
+        user_message = messages[-1]["content"]
+        # Packed prompts carry several items, each answered in its own section.
+        items = re.split(r"^## Item \d+", user_message, flags=re.MULTILINE)[1:]
+        if system_message.startswith("As an evaluator"):
+            if len(items) > 0:
+                return json.dumps(
+                    {
+                        "items": [
+                            {
+                                "item": str(idx),
+                                **self._evaluation(
+                                    max(
+                                        1,
+                                        len(re.findall(r"### Document \d+ ###", item)),
+                                    )
+                                ),
+                            }
+                            for idx, item in enumerate(items)
+                        ]
+                    }
+                )
+            n_documents = max(1, len(re.findall(r"## Document \d+ ##", user_message)))
+            return json.dumps(self._evaluation(n_documents))
+        if system_message.startswith("You reformat text into valid JSON"):
+            return user_message
+        if len(items) > 0:
+            return "\n".join(
+                f"## Item {idx}\nSynthetic notes on {len(item)} characters of code."
+                for idx, item in enumerate(items)
+            )
+        if "# Scratch" in system_message:
+            return (
+                f"# Scratch\nSynthetic notes on {len(user_message)} characters of code."
+                f"\n{SCRATCH_END}"
+            )
+        return "# Report\nSynthetic description of the requested item."
+
+    async def complete(
+        self,
+        messages: list[OpenAIInputMessage],
+        model: str,
+        functions: str | None = None,
+        function_call: str | None = None,
+    ) -> Completion:
+        await asyncio.sleep(self._delay())
+        reply = self._reply(messages)
+        return Completion(
+            [FormattedOpenAIResponse("assistant", reply)],
+            prompt_tokens=count_message_tokens(messages, model),
+            completion_tokens=count_tokens(reply, model),
+        )
+
+    async def stream(
+        self, messages: list[OpenAIInputMessage], model: str
+    ) -> AsyncIterator[str]:
+        words = self._reply(messages).split(" ")
+        delay = self._delay() / len(words)
+        for idx, word in enumerate(words):
+            await asyncio.sleep(delay)
+            yield word if idx == 0 else " " + word
+
+
+_backend: Optional[LLMBackend] = None
+
+
+def set_backend(backend: Optional[LLMBackend]) -> None:
+    global _backend
+    _backend = backend
+
+
+def backend_from_config(config: LLMConfig) -> LLMBackend:
+    if config.backend == "openai":
+        return OpenAIBackend(api_base=config.openai_api_base)
+    elif config.backend == "replay":
+        return ReplayBackend()
+    elif config.backend == "synthetic":
+        return SyntheticBackend(
+            latency=config.synthetic_latency, jitter=config.synthetic_jitter
+        )
+    elif config.backend == "batch":
+        return _batch_backend_from_config(config)
+    raise ValueError(f"Unknown LLM backend {config.backend}")
+
+
+def _batch_backend_from_config(config: LLMConfig) -> LLMBackend:
+    # Imported here as the batch module builds on the backends defined above.
+    from automodeldocs.chat.batch import (
+        BatchBackend,
+        LocalBatchEndpoint,
+        OpenAIBatchEndpoint,
+    )
+
+    batch_dir = (
+        pathlib.Path(config.batch_dir)
+        if config.batch_dir is not None
+        else pathlib.Path.home() / ".automodeldocs_batches"
+    )
+    if config.batch_endpoint == "openai":
+        endpoint = OpenAIBatchEndpoint(api_base=config.openai_api_base)
+    elif config.batch_endpoint == "local":
+        endpoint = LocalBatchEndpoint(
+            batch_dir / "local_endpoint",
+            SyntheticBackend(
+                latency=config.synthetic_latency, jitter=config.synthetic_jitter
+            ),
+        )
+    else:
+        raise ValueError(f"Unknown batch endpoint {config.batch_endpoint}")
+    return BatchBackend(
+        endpoint,
+        state_dir=batch_dir / "jobs",
+        collect_window=config.batch_collect_window,
+        poll_interval=config.batch_poll_interval,
+        max_wait=config.batch_max_wait,
+        max_requests=config.batch_max_requests,
+    )
+
+
+def get_backend() -> LLMBackend:
+    global _backend
+    if _backend is None:
+        _backend = backend_from_config(LLMConfig.from_env())
+    return _backend
@@ -0,0 +1,434 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import pathlib
+import shutil
+import uuid
+from dataclasses import dataclass
+from hashlib import sha256
+from typing import AsyncIterator, Optional, Protocol
+
+import aiohttp
+import openai
+
+from automodeldocs.chat.backends import Completion, LLMBackend
+from automodeldocs.chat.client import client_session
+from automodeldocs.definitions import OpenAIInputMessage
+from automodeldocs.metrics import log_event
+from automodeldocs.response.formatted import FormattedOpenAIResponse
+
+logger = logging.getLogger(__name__)
+
+CHAT_COMPLETIONS_ENDPOINT = "/v1/chat/completions"
+FAILED_STATUSES = ("failed", "expired", "cancelled")
+
+
+class BatchEndpoint(Protocol):
+    async def submit(self, input_path: pathlib.Path) -> str: ...
+
+    async def status(self, job_id: str) -> str: ...
+
+    async def results(self, job_id: str) -> dict[str, dict]: ...
+
+
+def _write_atomic(path: pathlib.Path, content: str) -> None:
+    tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    tmp_path.write_text(content)
+    os.replace(tmp_path, path)
+
+
+def _parse_results(lines: list[str]) -> dict[str, dict]:
+    results = {}
+    for line in lines:
+        if len(line.strip()) == 0:
+            continue
+        result = json.loads(line)
+        response = result.get("response") or {}
+        if response.get("status_code") == 200:
+            results[result["custom_id"]] = response["body"]
+        else:
+            logger.warning(
+                f"Batch request {result['custom_id']} failed - {result.get('error')}"
+            )
+    return results
+
+
+def _completion_body(completion: Completion) -> dict:
+    return {
+        "choices": [
+            {"index": idx, "message": {"role": r.role, "content": r.content}}
+            for idx, r in enumerate(completion.responses)
+        ],
+        "usage": {
+            "prompt_tokens": completion.prompt_tokens,
+            "completion_tokens": completion.completion_tokens,
+        },
+    }
+
+
+class LocalBatchEndpoint:
+    """
+    File-based stand-in for a batch endpoint. Jobs live in `root/<job_id>`, and are executed
+    against `backend` when first polled.
+    """
+
+    def __init__(
+        self, root: pathlib.Path, backend: LLMBackend, concurrency: int = 16
+    ) -> None:
+        self.root = root
+        self.backend = backend
+        self.concurrency = concurrency
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    async def submit(self, input_path: pathlib.Path) -> str:
+        job_id = f"batch_{uuid.uuid4().hex}"
+        job_dir = self.root / job_id
+        job_dir.mkdir()
+        shutil.copy(input_path, job_dir / "input.jsonl")
+        _write_atomic(job_dir / "status", "in_progress")
+        return job_id
+
+    async def status(self, job_id: str) -> str:
+        job_dir = self.root / job_id
+        status = (job_dir / "status").read_text()
+        if status == "in_progress":
+            await self._process(job_dir)
+            status = "completed"
+        return status
+
+    async def results(self, job_id: str) -> dict[str, dict]:
+        return _parse_results(
+            (self.root / job_id / "output.jsonl").read_text().splitlines()
+        )
+
+    async def _process(self, job_dir: pathlib.Path) -> None:
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run(request: dict) -> dict:
+            async with semaphore:
+                completion = await self.backend.complete(
+                    request["body"]["messages"], request["body"]["model"]
+                )
+            return {
+                "custom_id": request["custom_id"],
+                "response": {"status_code": 200, "body": _completion_body(completion)},
+                "error": None,
+            }
+
+        requests = [
+            json.loads(line)
+            for line in (job_dir / "input.jsonl").read_text().splitlines()
+            if len(line.strip()) > 0
+        ]
+        output = await asyncio.gather(*[run(request) for request in requests])
+        _write_atomic(
+            job_dir / "output.jsonl", "\n".join(json.dumps(o) for o in output) + "\n"
+        )
+        _write_atomic(job_dir / "status", "completed")
+
+
+class OpenAIBatchEndpoint:
+    def __init__(
+        self,
+        api_base: str = "https://api.openai.com/v1",
+        api_key: Optional[str] = None,
+    ) -> None:
+        self.api_base = api_base.rstrip("/")
+        self.api_key = api_key
+
+    def _headers(self) -> dict[str, str]:
+        api_key = self.api_key if self.api_key is not None else openai.api_key
+        assert api_key is not None
+        return {"Authorization": "Bearer " + api_key}
+
+    async def _get_json(self, path: str) -> dict:
+        async with client_session() as session:
+            async with session.get(
+                f"{self.api_base}{path}", headers=self._headers()
+            ) as response:
+                response.raise_for_status()
+                return await response.json()
+
+    async def submit(self, input_path: pathlib.Path) -> str:
+        async with client_session() as session:
+            form = aiohttp.FormData()
+            form.add_field("purpose", "batch")
+            form.add_field("file", input_path.read_bytes(), filename=input_path.name)
+            async with session.post(
+                f"{self.api_base}/files", headers=self._headers(), data=form
+            ) as response:
+                response.raise_for_status()
+                input_file_id = (await response.json())["id"]
+            async with session.post(
+                f"{self.api_base}/batches",
+                headers=self._headers(),
+                json={
+                    "input_file_id": input_file_id,
+                    "endpoint": CHAT_COMPLETIONS_ENDPOINT,
+                    "completion_window": "24h",
+                },
+            ) as response:
+                response.raise_for_status()
+                return (await response.json())["id"]
+
+    async def status(self, job_id: str) -> str:
+        return (await self._get_json(f"/batches/{job_id}"))["status"]
+
+    async def results(self, job_id: str) -> dict[str, dict]:
+        output_file_id = (await self._get_json(f"/batches/{job_id}"))["output_file_id"]
+        async with client_session() as session:
+            async with session.get(
+                f"{self.api_base}/files/{output_file_id}/content",
+                headers=self._headers(),
+            ) as response:
+                response.raise_for_status()
+                return _parse_results((await response.text()).splitlines())
+
+
+@dataclass
+class _PendingRequest:
+    custom_id: str
+    body: dict
+    future: asyncio.Future[Completion]
+
+
+class BatchBackend:
+    """
+    Collects requests instead of sending them, and submits everything that arrived within
+    `collect_window` seconds of quiet as one batch. A steady trickle of requests is still
+    submitted once the oldest has waited `max_wait` seconds, or once `max_requests` have
+    been collected. Each stage of a wave blocks on the one before it, so a wave goes out
+    as three sequential batches: its scratch prompts, then its description prompts, then
+    its evaluation prompts.
+
+    Submitted jobs and their results are recorded under `state_dir` per request. After a
+    restart each request is answered from the stored results, or re-attaches to the job it
+    was submitted in, however the requests happen to be batched this time; only requests
+    that were never submitted go out again.
+    """
+
+    name = "batch"
+
+    def __init__(
+        self,
+        endpoint: BatchEndpoint,
+        state_dir: pathlib.Path,
+        collect_window: float = 2.0,
+        poll_interval: float = 30.0,
+        max_wait: float = 30.0,
+        max_requests: int = 50_000,
+    ) -> None:
+        self.endpoint = endpoint
+        self.state_dir = state_dir
+        self.collect_window = collect_window
+        self.poll_interval = poll_interval
+        self.max_wait = max_wait
+        self.max_requests = max_requests
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        self._pending: list[_PendingRequest] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # Loop time by which the oldest pending request must be submitted.
+        self._flush_deadline: Optional[float] = None
+        self._running_batches: set[asyncio.Task] = set()
+        # How often each request body has been made, to tell identical requests apart.
+        self._occurrences: dict[str, int] = {}
+        self._results: dict[str, dict] = self._load_results()
+        # custom_id => id of the job it was submitted in, until that job completes.
+        self._submitted: dict[str, str] = self._load_submitted()
+        self._jobs: dict[str, asyncio.Task[None]] = {}
+
+    async def complete(
+        self,
+        messages: list[OpenAIInputMessage],
+        model: str,
+        functions: str | None = None,
+        function_call: str | None = None,
+    ) -> Completion:
+        body: dict = {"model": model, "messages": messages}
+        if functions is not None:
+            body.update({"functions": functions})
+        if function_call is not None:
+            body.update({"function_call": function_call})
+        future: asyncio.Future[Completion] = asyncio.get_running_loop().create_future()
+        self._pending.append(_PendingRequest(self._custom_id(body), body, future))
+        self._schedule_flush()
+        return await future
+
+    async def stream(
+        self, messages: list[OpenAIInputMessage], model: str
+    ) -> AsyncIterator[str]:
+        yield (await self.complete(messages, model)).responses[-1].content
+
+    def _custom_id(self, body: dict) -> str:
+        # Identical beam requests are told apart by the order they are made in, which
+        # doesn't depend on how they fall into batches.
+        digest = sha256(json.dumps(body, sort_keys=True).encode()).hexdigest()[:32]
+        occurrence = self._occurrences.get(digest, 0)
+        self._occurrences[digest] = occurrence + 1
+        return f"{digest}-{occurrence}"
+
+    @property
+    def _results_path(self) -> pathlib.Path:
+        return self.state_dir / "results.jsonl"
+
+    def _job_path(self, job_id: str) -> pathlib.Path:
+        return self.state_dir / f"{job_id}.job.json"
+
+    def _load_results(self) -> dict[str, dict]:
+        results = {}
+        if self._results_path.exists():
+            for line in self._results_path.read_text().splitlines():
+                try:
+                    result = json.loads(line)
+                except json.JSONDecodeError:
+                    # The tail of a write interrupted by a crash.
+                    continue
+                results[result["custom_id"]] = result["body"]
+        return results
+
+    def _load_submitted(self) -> dict[str, str]:
+        submitted = {}
+        for job_path in self.state_dir.glob("*.job.json"):
+            job = json.loads(job_path.read_text())
+            submitted.update(
+                {custom_id: job["job_id"] for custom_id in job["custom_ids"]}
+            )
+        return submitted
+
+    def _schedule_flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if len(self._pending) >= self.max_requests:
+            self._flush()
+            return
+        loop = asyncio.get_running_loop()
+        if self._flush_deadline is None:
+            self._flush_deadline = loop.time() + self.max_wait
+        self._flush_handle = loop.call_at(
+            min(loop.time() + self.collect_window, self._flush_deadline), self._flush
+        )
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        self._flush_handle = None
+        self._flush_deadline = None
+        pending, self._pending = self._pending, []
+        batch = asyncio.create_task(self._run_batch(pending))
+        self._running_batches.add(batch)
+        batch.add_done_callback(self._running_batches.discard)
+
+    async def _run_batch(self, pending: list[_PendingRequest]) -> None:
+        jobs: dict[str, list[_PendingRequest]] = {}
+        misses = []
+        for request in pending:
+            if request.custom_id in self._results:
+                continue
+            job_id = self._submitted.get(request.custom_id)
+            if job_id is None:
+                misses.append(request)
+            else:
+                jobs.setdefault(job_id, []).append(request)
+        log_event(
+            "batch.collected",
+            n_requests=len(pending),
+            stored=len(pending) - len(misses) - sum(len(r) for r in jobs.values()),
+            resumed=sum(len(r) for r in jobs.values()),
+            submitted=len(misses),
+        )
+        errors: dict[str, BaseException] = {}
+        if len(misses) > 0:
+            try:
+                jobs.setdefault(await self._submit(misses), []).extend(misses)
+            except Exception as e:
+                errors.update({request.custom_id: e for request in misses})
+        outcomes = await asyncio.gather(
+            *[self._job(job_id) for job_id in jobs], return_exceptions=True
+        )
+        for requests, outcome in zip(jobs.values(), outcomes):
+            if isinstance(outcome, BaseException):
+                errors.update({request.custom_id: outcome for request in requests})
+        for request in pending:
+            if request.future.done():
+                # Its caller was cancelled.
+                continue
+            if request.custom_id in errors:
+                request.future.set_exception(errors[request.custom_id])
+            elif request.custom_id not in self._results:
+                request.future.set_exception(
+                    RuntimeError(f"Batch has no result for {request.custom_id}")
+                )
+            else:
+                body = self._results[request.custom_id]
+                usage = body.get("usage") or {}
+                request.future.set_result(
+                    Completion(
+                        FormattedOpenAIResponse.from_message(body),
+                        prompt_tokens=usage.get("prompt_tokens"),
+                        completion_tokens=usage.get("completion_tokens"),
+                    )
+                )
+
+    async def _submit(self, pending: list[_PendingRequest]) -> str:
+        input_file = self.state_dir / f"{uuid.uuid4().hex}.input.jsonl"
+        _write_atomic(
+            input_file,
+            "\n".join(
+                json.dumps(
+                    {
+                        "custom_id": p.custom_id,
+                        "method": "POST",
+                        "url": CHAT_COMPLETIONS_ENDPOINT,
+                        "body": p.body,
+                    }
+                )
+                for p in pending
+            )
+            + "\n",
+        )
+        try:
+            job_id = await self.endpoint.submit(input_file)
+        finally:
+            input_file.unlink()
+        custom_ids = [p.custom_id for p in pending]
+        _write_atomic(
+            self._job_path(job_id),
+            json.dumps({"job_id": job_id, "custom_ids": custom_ids}),
+        )
+        self._submitted.update({custom_id: job_id for custom_id in custom_ids})
+        log_event("batch.submitted", job_id=job_id, n_requests=len(pending))
+        return job_id
+
+    def _job(self, job_id: str) -> asyncio.Task[None]:
+        # Batches collected later can be waiting on the same job after a restart.
+        task = self._jobs.get(job_id)
+        if task is None:
+            task = self._jobs[job_id] = asyncio.ensure_future(
+                self._wait_for_job(job_id)
+            )
+            task.add_done_callback(lambda _: self._jobs.pop(job_id, None))
+        return task
+
+    async def _wait_for_job(self, job_id: str) -> None:
+        while (status := await self.endpoint.status(job_id)) != "completed":
+            if status in FAILED_STATUSES:
+                self._forget_job(job_id)
+                raise RuntimeError(f"Batch {job_id} finished as {status}")
+            await asyncio.sleep(self.poll_interval)
+        results = await self.endpoint.results(job_id)
+        with open(self._results_path, "a") as f:
+            for custom_id, body in results.items():
+                f.write(json.dumps({"custom_id": custom_id, "body": body}) + "\n")
+        self._results.update(results)
+        self._forget_job(job_id)
+        log_event("batch.completed", job_id=job_id, n_results=len(results))
+
+    def _forget_job(self, job_id: str) -> None:
+        job_path = self._job_path(job_id)
+        for custom_id in json.loads(job_path.read_text())["custom_ids"]:
+            self._submitted.pop(custom_id, None)
+        job_path.unlink()
@@ -2,26 +2,23 @@ from __future__ import annotations
 
 import json
 import logging
-import pathlib
 from contextlib import contextmanager
-from dataclasses import dataclass, field
 from hashlib import sha256
-from typing import Optional
+from typing import Iterator, Optional
 
+from automodeldocs.cache_store import ContentStore
 from automodeldocs.definitions import OpenAIInputMessage
 from automodeldocs.response.formatted import FormattedOpenAIResponse
 
 logger = logging.getLogger(__name__)
 logger.setLevel("WARN")
 
+NAMESPACE = "chat"
+
 
 @contextmanager
-def simple_cache():
-    cache = SimpleFileCache.from_file()
-    try:
-        yield cache
-    finally:
-        cache.to_file()
+def simple_cache() -> Iterator[ResponseCache]:
+    yield ResponseCache(ContentStore.shared())
 
 
 def hash_dict(item: dict | list[dict] | list[OpenAIInputMessage]) -> int:
@@ -29,23 +26,18 @@ def hash_dict(item: dict | list[dict] | list[OpenAIInputMessage]) -> int:
     return hashed_item
 
 
-@dataclass
-class SimpleFileCache:
-    # InputHash => list[Role, Content]
-    _cache: dict[str, list[list[str]]] = field(default_factory=dict)
-
-    @classmethod
-    def cache_file(cls) -> pathlib.Path:
-        return pathlib.Path.home() / ".llm_cache.json"
+class ResponseCache:
+    # InputHash => list[Role, Content], stored in the `chat` namespace of the content store.
+    def __init__(self, store: ContentStore) -> None:
+        self.store = store
 
     @classmethod
-    def from_file(cls) -> SimpleFileCache:
-        if cls.cache_file().exists():
-            return SimpleFileCache(_cache=json.load(open(cls.cache_file(), "r")))
-        return SimpleFileCache(_cache={})
+    def from_file(cls) -> ResponseCache:
+        return cls(ContentStore.shared())
 
-    def to_file(self):
-        json.dump(self._cache, open(self.cache_file(), "w"))
+    def to_file(self) -> None:
+        # Every item is written to the store as it is added.
+        pass
 
     @classmethod
     def hash_message(cls, messages: list[OpenAIInputMessage]) -> str:
@@ -54,13 +46,20 @@ class SimpleFileCache:
     def try_retrieve(
         self, messages: list[OpenAIInputMessage]
     ) -> Optional[list[tuple[str, str]]]:
-        message_hash = self.hash_message(messages)
-        if message_hash in self._cache:
-            res = self._cache[message_hash]
-            return [(m[0], m[1]) for m in res]
-        return None
+        response = self.store.get(NAMESPACE, self.hash_message(messages))
+        if response is None:
+            return None
+        return [(m[0], m[1]) for m in response]
 
     def add_item(
         self, messages: list[OpenAIInputMessage], value: list[FormattedOpenAIResponse]
     ) -> None:
-        self._cache[self.hash_message(messages)] = [[v.role, v.content] for v in value]
+        self.store.put(
+            NAMESPACE,
+            self.hash_message(messages),
+            [[v.role, v.content] for v in value],
+        )
+
+
+# The name the cache had when it was a single JSON file.
+SimpleFileCache = ResponseCache
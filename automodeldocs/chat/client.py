@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import logging
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Optional
+
+import aiohttp
+
+from automodeldocs.budget import RunBudget, set_run_budget
+from automodeldocs.config.llm_config import LLMConfig
+
+logger = logging.getLogger(__name__)
+
+_pooled_session: ContextVar[Optional[aiohttp.ClientSession]] = ContextVar(
+    "pooled_session", default=None
+)
+
+
+def _pooled_connector(config: LLMConfig) -> aiohttp.TCPConnector:
+    return aiohttp.TCPConnector(
+        limit=config.max_connections,
+        limit_per_host=config.max_connections_per_host,
+        ttl_dns_cache=config.dns_cache_ttl,
+        keepalive_timeout=config.keepalive_timeout,
+    )
+
+
+@asynccontextmanager
+async def llm_client() -> AsyncIterator[aiohttp.ClientSession]:
+    """
+    Owns a long-lived, pooled HTTP session for every LLM request made inside it.
+
+    Nested uses share the outermost session, so a pipeline entry point can be called from
+    another entry point without opening a second pool. The outermost use also starts a
+    fresh run budget, which is left in place afterwards so the run can still be reported.
+    """
+    existing_session = _pooled_session.get()
+    if existing_session is not None and not existing_session.closed:
+        yield existing_session
+        return
+    config = LLMConfig.from_env()
+    set_run_budget(RunBudget.from_config(config))
+    session = aiohttp.ClientSession(
+        connector=_pooled_connector(config),
+        timeout=aiohttp.ClientTimeout(total=config.request_timeout),
+    )
+    token = _pooled_session.set(session)
+    logger.info("Opened pooled LLM client")
+    try:
+        yield session
+    finally:
+        _pooled_session.reset(token)
+        await session.close()
+        logger.info("Closed pooled LLM client")
+
+
+@asynccontextmanager
+async def client_session() -> AsyncIterator[aiohttp.ClientSession]:
+    pooled_session = _pooled_session.get()
+    if pooled_session is not None and not pooled_session.closed:
+        yield pooled_session
+        return
+    # Outside of `llm_client` fall back to a single-use session.
+    async with aiohttp.ClientSession() as session:
+        yield session
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+import time
+from dataclasses import dataclass
+from typing import Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+class RateLimitError(RuntimeError):
+    pass
+
+
+@dataclass(frozen=True)
+class RateLimits:
+    requests_per_minute: int
+    tokens_per_minute: int
+
+
+# Conservative defaults, replaced by the x-ratelimit-limit-* headers after the first reply.
+DEFAULT_RATE_LIMITS: dict[str, RateLimits] = {
+    "gpt-4": RateLimits(requests_per_minute=500, tokens_per_minute=10_000),
+    "gpt-3.5-turbo": RateLimits(requests_per_minute=3_500, tokens_per_minute=90_000),
+    "gpt-3.5-turbo-16k": RateLimits(
+        requests_per_minute=3_500, tokens_per_minute=180_000
+    ),
+}
+FALLBACK_RATE_LIMITS = RateLimits(requests_per_minute=500, tokens_per_minute=10_000)
+# Completion tokens reserved per request until the reply reports its real usage.
+EXPECTED_COMPLETION_TOKENS = 512
+
+
+def parse_reset_duration(value: str) -> Optional[float]:
+    """Parses reset headers such as `20ms`, `1s` or `6m0s` into seconds."""
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if len(parts) == 0:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+class _Bucket:
+    def __init__(self, per_minute: int) -> None:
+        self.capacity = float(per_minute)
+        self.available = float(per_minute)
+        self._updated = time.monotonic()
+
+    @property
+    def refill_rate(self) -> float:
+        return self.capacity / 60.0
+
+    def refill(self, now: float) -> None:
+        self.available = min(
+            self.capacity, self.available + (now - self._updated) * self.refill_rate
+        )
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        # Requests larger than the whole bucket are admitted once it is full.
+        amount = min(amount, self.capacity)
+        if self.available >= amount:
+            return 0.0
+        return (amount - self.available) / self.refill_rate
+
+
+class RateLimiter:
+    """
+    Client-side admission control for one model, tracking requests and tokens per minute.
+
+    Requests wait in arrival order until both budgets can cover them, so the provider
+    ceiling is approached without being exceeded.
+    """
+
+    def __init__(self, model: str, limits: RateLimits) -> None:
+        self.model = model
+        self._requests = _Bucket(limits.requests_per_minute)
+        self._tokens = _Bucket(limits.tokens_per_minute)
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, prompt_tokens: int) -> int:
+        reserved_tokens = prompt_tokens + EXPECTED_COMPLETION_TOKENS
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._requests.refill(now)
+                self._tokens.refill(now)
+                wait = max(
+                    self._paused_until - now,
+                    self._requests.wait_time(1),
+                    self._tokens.wait_time(reserved_tokens),
+                )
+                if wait <= 0:
+                    self._requests.available -= 1
+                    self._tokens.available -= reserved_tokens
+                    return reserved_tokens
+                logger.debug(
+                    f"[{self.model}] Waiting {wait:.2f}s for rate limit budget"
+                )
+                await asyncio.sleep(wait)
+
+    def reconcile(self, reserved_tokens: int, used_tokens: Optional[int]) -> None:
+        if used_tokens is None:
+            return
+        self._tokens.available = min(
+            self._tokens.capacity,
+            self._tokens.available + reserved_tokens - used_tokens,
+        )
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        for bucket, kind in ((self._requests, "requests"), (self._tokens, "tokens")):
+            if (limit := headers.get(f"x-ratelimit-limit-{kind}")) is not None:
+                bucket.capacity = float(limit)
+            if (remaining := headers.get(f"x-ratelimit-remaining-{kind}")) is not None:
+                # The provider's view includes other clients sharing the key.
+                bucket.available = min(bucket.available, float(remaining))
+
+    def back_off(self, headers: Mapping[str, str]) -> None:
+        delays = [
+            parse_reset_duration(value)
+            for value in (
+                headers.get("retry-after"),
+                headers.get("x-ratelimit-reset-requests"),
+                headers.get("x-ratelimit-reset-tokens"),
+            )
+            if value is not None
+        ]
+        delay = max([d for d in delays if d is not None], default=1.0)
+        self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        logger.warning(
+            f"[{self.model}] Rate limited, pausing admissions for {delay:.2f}s"
+        )
+
+
+_rate_limiters: dict[str, RateLimiter] = {}
+
+
+def rate_limiter_for(model: str) -> RateLimiter:
+    if model not in _rate_limiters:
+        _rate_limiters[model] = RateLimiter(
+            model, DEFAULT_RATE_LIMITS.get(model, FALLBACK_RATE_LIMITS)
+        )
+    return _rate_limiters[model]
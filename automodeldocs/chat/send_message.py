@@ -1,18 +1,37 @@
+import asyncio
 import logging
-import uuid
-from typing import Generic, TypeVar
+from typing import AsyncIterator, Generic, TypeVar
 
-import aiohttp
 from dotenv import load_dotenv
 
-from automodeldocs.chat.cache import SimpleFileCache, simple_cache
+from automodeldocs.budget import BudgetExceededError, Reservation, run_budget
+from automodeldocs.chat.cache import ResponseCache, simple_cache
+from automodeldocs.chat.single_flight import SingleFlight
+from automodeldocs.chat.tokens import count_message_tokens, count_tokens
+from automodeldocs.context_guard import COMPLETION_RESERVE, ensure_fits
 from automodeldocs.definitions import OpenAIInputMessage
+from automodeldocs.metrics import (
+    CACHE_LOOKUPS,
+    LLM_COMPLETION_TOKENS,
+    LLM_IN_FLIGHT,
+    LLM_PROMPT_TOKENS,
+    LLM_REQUEST_SECONDS,
+    LLM_RETRIES,
+    log_event,
+)
 from automodeldocs.response.formatted import FormattedOpenAIResponse
 
 load_dotenv(r"D:\ShareableAI\automodeldocs\.env")
 
-import openai
-from tenacity import retry, stop_after_attempt, wait_exponential_jitter
+# Imported after the environment is loaded, so `openai` picks up the API key.
+from automodeldocs.chat.backends import ReplayMissError, get_backend
+from tenacity import (
+    RetryCallState,
+    retry,
+    retry_if_not_exception_type,
+    stop_after_attempt,
+    wait_exponential_jitter,
+)
 
 from automodeldocs.chat.model import GPT_MODEL
 
@@ -20,6 +39,8 @@ T = TypeVar("T")
 
 logger = logging.getLogger(__name__)
 
+STREAM_ATTEMPTS = 3
+
 
 class CacheStatus(Generic[T]):
     def __init__(self, item: T, cached: bool):
@@ -27,6 +48,11 @@ class CacheStatus(Generic[T]):
         self.cached = cached
 
 
+chat_completion_flight: SingleFlight[CacheStatus[list[FormattedOpenAIResponse]]] = (
+    SingleFlight("chat_completion_request")
+)
+
+
 async def reformat_json(text: str) -> list[FormattedOpenAIResponse]:
     return (
         await chat_completion_request(
@@ -38,60 +64,191 @@ async def reformat_json(text: str) -> list[FormattedOpenAIResponse]:
                 {"role": "user", "content": text},
             ],
             model="gpt-3.5-turbo",
+            stage="reformat_json",
         )
     ).item
 
 
-@retry(
-    wait=wait_exponential_jitter(initial=60, max=2 * 180, exp_base=2),
-    stop=stop_after_attempt(3),
-    reraise=True,
-)
 async def chat_completion_request(
     messages: list[OpenAIInputMessage],
     functions: str | None = None,
     function_call: str | None = None,
     model: str = GPT_MODEL,
     use_cache: bool = True,
+    coalesce: bool | None = None,
+    stage: str = "chat",
 ) -> CacheStatus[list[FormattedOpenAIResponse]]:
-    cache: SimpleFileCache
-    request_uuid = uuid.uuid4()
+    cache: ResponseCache
     with simple_cache() as cache:
         if use_cache and (
             (cached_response := cache.try_retrieve(messages)) is not None
         ):
+            CACHE_LOOKUPS.inc(cache="chat", result="hit")
             formatted_cached_response = [
                 FormattedOpenAIResponse(r[0], r[1]) for r in cached_response
             ]
             return CacheStatus(formatted_cached_response, True)
-        assert openai.api_key is not None
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": "Bearer " + openai.api_key,
-        }
-        json_data = {"model": model, "messages": messages}
-        if functions is not None:
-            json_data.update({"functions": functions})
-        if function_call is not None:
-            json_data.update({"function_call": function_call})
+    if use_cache:
+        CACHE_LOOKUPS.inc(cache="chat", result="miss")
+    ensure_fits(messages, model, stage)
+    # Uncached beam sampling relies on independent samples, so it only coalesces on request.
+    if coalesce is None:
+        coalesce = use_cache
+    if not coalesce:
+        return await _issue_chat_completion(
+            messages, functions, function_call, model, stage=stage
+        )
+    return await chat_completion_flight.run(
+        (cache.hash_message(messages), model, functions, function_call),
+        lambda: _issue_chat_completion(
+            messages, functions, function_call, model, stage=stage
+        ),
+    )
+
+
+def _record_retry(retry_state: RetryCallState) -> None:
+    LLM_RETRIES.inc(stage=retry_state.kwargs.get("stage", "chat"))
+    log_event(
+        "llm.retry",
+        level=logging.WARNING,
+        stage=retry_state.kwargs.get("stage", "chat"),
+        attempt=retry_state.attempt_number,
+        error=retry_state.outcome.exception() if retry_state.outcome else None,
+    )
+
+
+def _reserve(messages: list[OpenAIInputMessage], model: str) -> Reservation:
+    # The completion is not known yet, so it is estimated at the most the guard leaves room for.
+    return run_budget().check(
+        model, count_message_tokens(messages, model), COMPLETION_RESERVE
+    )
+
+
+def _record_usage(
+    stage: str,
+    model: str,
+    prompt_tokens: int | None,
+    completion_tokens: int | None,
+    reservation: Reservation,
+) -> None:
+    run_budget().charge(model, prompt_tokens, completion_tokens, reservation)
+    if prompt_tokens is not None:
+        LLM_PROMPT_TOKENS.inc(prompt_tokens, stage=stage, model=model)
+    if completion_tokens is not None:
+        LLM_COMPLETION_TOKENS.inc(completion_tokens, stage=stage, model=model)
+
+
+@retry(
+    wait=wait_exponential_jitter(initial=1, max=30, exp_base=2),
+    stop=stop_after_attempt(5),
+    retry=retry_if_not_exception_type((ReplayMissError, BudgetExceededError)),
+    before_sleep=_record_retry,
+    reraise=True,
+)
+async def _issue_chat_completion(
+    messages: list[OpenAIInputMessage],
+    functions: str | None,
+    function_call: str | None,
+    model: str,
+    stage: str = "chat",
+) -> CacheStatus[list[FormattedOpenAIResponse]]:
+    cache: ResponseCache
+    with simple_cache() as cache:
         try:
-            logger.info(f"[{request_uuid}] Started Chat Completion Request")
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    "https://api.openai.com/v1/chat/completions",
-                    headers=headers,
-                    json=json_data,
-                ) as response:
-                    formatted_response = FormattedOpenAIResponse.from_message(
-                        await response.json()
+            reservation = _reserve(messages, model)
+            try:
+                with LLM_IN_FLIGHT.track(stage=stage), LLM_REQUEST_SECONDS.time(
+                    stage=stage, model=model
+                ):
+                    completion = await get_backend().complete(
+                        messages,
+                        model,
+                        functions=functions,
+                        function_call=function_call,
                     )
-                    cache.add_item(messages, formatted_response)
-                    logging.info(
-                        f"Replying with new response - {formatted_response[-1]}"
-                    )
-                    logger.info(f"[{request_uuid}] Finished Chat Completion Request")
-                    return CacheStatus(formatted_response, False)
+            except BaseException:
+                run_budget().release(reservation)
+                raise
+            _record_usage(
+                stage,
+                model,
+                completion.prompt_tokens,
+                completion.completion_tokens,
+                reservation,
+            )
+            formatted_response = completion.responses
+            cache.add_item(messages, formatted_response)
+            logging.info(f"Replying with new response - {formatted_response[-1]}")
+            return CacheStatus(formatted_response, False)
         except Exception as e:
-            print("Unable to generate ChatCompletion response")
-            print(f"Exception: {e}")
+            log_event(
+                "llm.request_failed",
+                level=logging.ERROR,
+                stage=stage,
+                model=model,
+                error=e,
+            )
             raise e
+
+
+async def chat_completion_stream(
+    messages: list[OpenAIInputMessage],
+    model: str = GPT_MODEL,
+    use_cache: bool = True,
+    stage: str = "chat",
+) -> AsyncIterator[str]:
+    """
+    Streaming variant of `chat_completion_request`, yielding content deltas as they arrive.
+
+    Cached responses are replayed as a single delta, and the completed stream is written to
+    the cache.
+    """
+    cache: ResponseCache
+    with simple_cache() as cache:
+        if use_cache and (
+            (cached_response := cache.try_retrieve(messages)) is not None
+        ):
+            CACHE_LOOKUPS.inc(cache="chat", result="hit")
+            yield cached_response[-1][1]
+            return
+    if use_cache:
+        CACHE_LOOKUPS.inc(cache="chat", result="miss")
+    ensure_fits(messages, model, stage)
+    reservation = _reserve(messages, model)
+    try:
+        for attempt in range(1, STREAM_ATTEMPTS + 1):
+            content: list[str] = []
+            try:
+                with LLM_IN_FLIGHT.track(stage=stage), LLM_REQUEST_SECONDS.time(
+                    stage=stage, model=model
+                ):
+                    async for delta in get_backend().stream(messages, model):
+                        content.append(delta)
+                        yield delta
+                break
+            except Exception as e:
+                # Deltas already handed to the consumer cannot be retried.
+                if len(content) > 0 or attempt == STREAM_ATTEMPTS:
+                    log_event(
+                        "llm.stream_failed",
+                        level=logging.ERROR,
+                        stage=stage,
+                        model=model,
+                        error=e,
+                    )
+                    raise e
+                LLM_RETRIES.inc(stage=stage)
+                await asyncio.sleep(2**attempt)
+    except BaseException:
+        run_budget().release(reservation)
+        raise
+    completion = "".join(content)
+    _record_usage(
+        stage,
+        model,
+        count_message_tokens(messages, model),
+        count_tokens(completion, model),
+        reservation,
+    )
+    with simple_cache() as cache:
+        cache.add_item(messages, [FormattedOpenAIResponse("assistant", completion)])
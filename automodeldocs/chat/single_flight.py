@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Generic, Hashable, TypeVar
+
+from automodeldocs.metrics import SINGLE_FLIGHT_REQUESTS
+
+T = TypeVar("T")
+
+_flights: list[SingleFlight] = []
+
+
+@dataclass
+class _Flight(Generic[T]):
+    task: asyncio.Task[T]
+    waiters: int = 0
+
+
+class SingleFlight(Generic[T]):
+    """
+    Coalesces concurrent calls that share a key onto a single in-flight request.
+
+    The first caller for a key issues the request, every caller arriving before it completes
+    awaits the same result. The request runs in its own task, so a cancelled caller doesn't
+    cancel it for the others; it is only cancelled once every caller has gone.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.issued = 0
+        self.coalesced = 0
+        self._in_flight: dict[Hashable, _Flight[T]] = {}
+        _flights.append(self)
+
+    async def run(self, key: Hashable, request: Callable[[], Awaitable[T]]) -> T:
+        flight = self._in_flight.get(key)
+        if flight is not None:
+            self.coalesced += 1
+            SINGLE_FLIGHT_REQUESTS.inc(flight=self.name, outcome="coalesced")
+        else:
+            flight = self._in_flight[key] = _Flight(asyncio.ensure_future(request()))
+            flight.task.add_done_callback(lambda _: self._land(key, flight))
+            self.issued += 1
+            SINGLE_FLIGHT_REQUESTS.inc(flight=self.name, outcome="issued")
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Callers arriving while the cancelled request winds down start
+                # a fresh one rather than joining it.
+                if self._in_flight.get(key) is flight:
+                    del self._in_flight[key]
+                flight.task.cancel()
+
+    def _land(self, key: Hashable, flight: _Flight[T]) -> None:
+        if self._in_flight.get(key) is flight:
+            del self._in_flight[key]
+        if not flight.task.cancelled():
+            # Mark the exception as retrieved, waiters (if any) still receive it.
+            flight.task.exception()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "issued": self.issued,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._in_flight),
+        }
+
+
+def single_flight_stats() -> dict[str, dict[str, int]]:
+    return {flight.name: flight.stats() for flight in _flights}
@@ -0,0 +1,42 @@
+import logging
+from functools import lru_cache
+from typing import Optional
+
+import tiktoken
+
+from automodeldocs.definitions import OpenAIInputMessage
+
+logger = logging.getLogger(__name__)
+
+# Per-message framing used by the chat format, see OpenAI's token counting cookbook.
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 3
+
+
+@lru_cache(maxsize=None)
+def _encoding(model: str) -> Optional[tiktoken.Encoding]:
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning(
+            f"Unable to load tiktoken encoding for {model}, estimating - {e}"
+        )
+        return None
+
+
+def count_tokens(text: str, model: str) -> int:
+    encoding = _encoding(model)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(messages: list[OpenAIInputMessage], model: str) -> int:
+    return TOKENS_PER_REPLY + sum(
+        TOKENS_PER_MESSAGE
+        + count_tokens(message["role"], model)
+        + count_tokens(message["content"], model)
+        for message in messages
+    )
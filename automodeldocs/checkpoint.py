@@ -0,0 +1,208 @@
+from __future__ import annotations
+import argparse
+import asyncio
+import logging
+import pathlib
+from typing import Hashable, Mapping, Optional
+
+from function_discovery import parse_module
+from function_discovery.structure import ClassContainer
+
+from automodeldocs.chat.client import llm_client
+from automodeldocs.config.llm_config import LLMConfig
+from automodeldocs.explorer import (
+    NodeState,
+    build_dependency_graph,
+    report_run,
+    resolve_graph,
+)
+from automodeldocs.graph import DependencyGraph
+from automodeldocs.metrics import log_event
+from automodeldocs.snapshot import (
+    GraphSnapshot,
+    NodeSnapshot,
+    module_keys,
+    source_digest,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def node_keys(
+    graph: DependencyGraph, known: Optional[Mapping[Hashable, str]] = None
+) -> dict[Hashable, str]:
+    """
+    Snapshot keys for every container in `graph`: its `known` module-qualified
+    key, or else its qualname, e.g. `Model.fit`. Node names can't serve, as a
+    helper's node is named after whichever class's method reached it first.
+    """
+    qualnames: dict[Hashable, str] = {}
+    for container in graph.containers():
+        if isinstance(container, ClassContainer):
+            for method in container.functions:
+                qualnames[method] = f"{container.name}.{method.name}"
+    known = known or {}
+    return {
+        container: known.get(container) or qualnames.get(container) or container.name
+        for container in graph.containers()
+    }
+
+
+def take_snapshot(
+    graph: DependencyGraph, keys: Optional[Mapping[Hashable, str]] = None
+) -> GraphSnapshot:
+    snapshot = GraphSnapshot()
+    keys = node_keys(graph, keys)
+    for container in graph.containers():
+        node = graph.node(container)
+        snapshot.add(
+            NodeSnapshot(
+                name=node.name,
+                key=keys[container],
+                digest=source_digest(container.source()),
+                state=node.state.name.lower(),
+                description=node.description,
+                feedback=node.feedback,
+                dependencies=[
+                    keys[dependency] for dependency in graph.dependencies(container)
+                ],
+                iterations=node.iterations,
+            )
+        )
+    return snapshot
+
+
+def restore_checkpoint(
+    graph: DependencyGraph,
+    snapshot: GraphSnapshot,
+    keys: Optional[Mapping[Hashable, str]] = None,
+) -> int:
+    """
+    Puts every node of a rebuilt graph back into its checkpointed state, along
+    with edges found after the graph was first built. Nodes whose source has
+    changed since are left to be described again. Returns the restored count.
+    """
+    containers = {key: container for container, key in node_keys(graph, keys).items()}
+    restored = 0
+    for key, container in containers.items():
+        node = graph.node(container)
+        stored = snapshot.reusable(key, source_digest(container.source()))
+        if stored is None:
+            continue
+        node.description = stored.description
+        node.feedback = stored.feedback
+        node.state = NodeState[stored.state.upper()]
+        node.iterations = stored.iterations
+        for dependency in stored.dependencies:
+            if dependency in containers:
+                graph.add_edge(container, containers[dependency])
+        restored += 1
+    return restored
+
+
+class Checkpointer:
+    """
+    Saves the graph to `path` every `interval` seconds while a run is in
+    progress, and once more when it ends - whether it finished or failed.
+    """
+
+    def __init__(
+        self,
+        graph: DependencyGraph,
+        path: pathlib.Path,
+        interval: float,
+        keys: Optional[Mapping[Hashable, str]] = None,
+    ) -> None:
+        self.graph = graph
+        self.path = path
+        self.interval = interval
+        self.keys = keys
+        self._task: Optional[asyncio.Task] = None
+
+    def save(self) -> None:
+        take_snapshot(self.graph, self.keys).save(self.path)
+        log_event("checkpoint.saved", path=str(self.path), nodes=self.graph.node_count)
+
+    async def _save_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            self.save()
+
+    async def __aenter__(self) -> Checkpointer:
+        self._task = asyncio.create_task(self._save_periodically())
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        if self._task is not None:
+            self._task.cancel()
+        self.save()
+
+
+def resume_from_checkpoint(
+    graph: DependencyGraph,
+    checkpoint_path: pathlib.Path,
+    keys: Optional[Mapping[Hashable, str]] = None,
+) -> None:
+    snapshot = GraphSnapshot.load(checkpoint_path)
+    if snapshot is None:
+        logger.warning(f"No checkpoint at {checkpoint_path}, starting from scratch")
+        return
+    restored = restore_checkpoint(graph, snapshot, keys)
+    log_event(
+        "checkpoint.resumed",
+        path=str(checkpoint_path),
+        restored=restored,
+        nodes=graph.node_count,
+    )
+
+
+async def describe_with_checkpoints(
+    container,
+    checkpoint_path: pathlib.Path,
+    resume: bool = False,
+    keys: Optional[Mapping[Hashable, str]] = None,
+) -> str:
+    """
+    Describes `container`, saving the graph to `checkpoint_path` as it goes.
+    `keys` are the module-qualified snapshot keys of the containers whose
+    module is known; see `module_keys`.
+    """
+    graph: DependencyGraph = DependencyGraph()
+    async with llm_client():
+        # The fan cache serves the rebuild for nodes finished before a crash.
+        await build_dependency_graph(container, graph)
+        if resume:
+            resume_from_checkpoint(graph, checkpoint_path, keys)
+        # Only start saving once restored, so the checkpoint is never clobbered.
+        async with Checkpointer(
+            graph, checkpoint_path, LLMConfig.from_env().checkpoint_interval, keys
+        ):
+            scheduler = await resolve_graph(graph, [container])
+    report_run(graph, scheduler)
+    return graph.node(container).description
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Describe an item, checkpointing progress so it can be resumed."
+    )
+    parser.add_argument("source", type=pathlib.Path)
+    parser.add_argument("name")
+    parser.add_argument("--module-name")
+    parser.add_argument("--checkpoint", type=pathlib.Path, required=True)
+    parser.add_argument(
+        "--resume", action="store_true", help="Continue from --checkpoint"
+    )
+    args = parser.parse_args()
+    module_name = args.module_name or args.source.stem
+    module = parse_module(args.source, module_name=module_name, starting_path=None)
+    print(
+        asyncio.run(
+            describe_with_checkpoints(
+                module.resolve_name(args.name).origin,
+                args.checkpoint,
+                args.resume,
+                module_keys(module, module_name, args.source.read_text()),
+            )
+        )
+    )
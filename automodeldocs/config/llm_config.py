@@ -1,12 +1,48 @@
 import os
 from dataclasses import dataclass
 from functools import lru_cache
+from typing import Optional
 
 
 @dataclass
 class LLMConfig:
     beam_width: int
     description_iterations: int
+    description_convergence: float = 0.95
+    beam_concurrency: int = 8
+    adaptive_beam: bool = False
+    beam_convergence: float = 0.9
+    describe_concurrency: int = 16
+    pack_small_functions: bool = False
+    pack_max_tokens: int = 200
+    pack_max_items: int = 8
+    pack_collect_window: float = 0.05
+    max_connections: int = 100
+    max_connections_per_host: int = 32
+    dns_cache_ttl: int = 300
+    keepalive_timeout: float = 30.0
+    request_timeout: float = 600.0
+    backend: str = "openai"
+    openai_api_base: str = "https://api.openai.com/v1"
+    synthetic_latency: float = 0.5
+    synthetic_jitter: float = 0.1
+    metrics_path: Optional[str] = None
+    cache_dir: Optional[str] = None
+    # Approximate: counts cached documents by their JSON size, not their size in memory.
+    memory_cache_bytes: int = 64 * 1024 * 1024
+    cache_max_bytes: Optional[int] = None
+    cache_ttl_days: Optional[float] = None
+    fingerprint_cache_keys: bool = True
+    legacy_fan_keys: bool = True
+    checkpoint_interval: float = 30.0
+    batch_endpoint: str = "local"
+    batch_dir: Optional[str] = None
+    batch_collect_window: float = 2.0
+    batch_poll_interval: float = 30.0
+    batch_max_wait: float = 30.0
+    batch_max_requests: int = 50_000
+    token_budget: Optional[int] = None
+    cost_budget: Optional[float] = None
 
     @classmethod
     @lru_cache(maxsize=1)
@@ -14,4 +50,68 @@ class LLMConfig:
         return cls(
             beam_width=int(os.environ.get("BEAM_WIDTH", 3)),
             description_iterations=int(os.environ.get("DESCRIPTION_ITERATIONS", 2)),
+            description_convergence=float(
+                os.environ.get("DESCRIPTION_CONVERGENCE", 0.95)
+            ),
+            beam_concurrency=int(os.environ.get("BEAM_CONCURRENCY", 8)),
+            adaptive_beam=os.environ.get("ADAPTIVE_BEAM", "false").lower()
+            in ("1", "true", "yes"),
+            beam_convergence=float(os.environ.get("BEAM_CONVERGENCE", 0.9)),
+            describe_concurrency=int(os.environ.get("DESCRIBE_CONCURRENCY", 16)),
+            pack_small_functions=os.environ.get("PACK_SMALL_FUNCTIONS", "false").lower()
+            in ("1", "true", "yes"),
+            pack_max_tokens=int(os.environ.get("PACK_MAX_TOKENS", 200)),
+            pack_max_items=int(os.environ.get("PACK_MAX_ITEMS", 8)),
+            pack_collect_window=float(os.environ.get("PACK_COLLECT_WINDOW", 0.05)),
+            max_connections=int(os.environ.get("MAX_CONNECTIONS", 100)),
+            max_connections_per_host=int(
+                os.environ.get("MAX_CONNECTIONS_PER_HOST", 32)
+            ),
+            dns_cache_ttl=int(os.environ.get("DNS_CACHE_TTL", 300)),
+            keepalive_timeout=float(os.environ.get("KEEPALIVE_TIMEOUT", 30.0)),
+            request_timeout=float(os.environ.get("REQUEST_TIMEOUT", 600.0)),
+            backend=os.environ.get("LLM_BACKEND", "openai"),
+            openai_api_base=os.environ.get(
+                "OPENAI_API_BASE", "https://api.openai.com/v1"
+            ),
+            synthetic_latency=float(os.environ.get("SYNTHETIC_LATENCY", 0.5)),
+            synthetic_jitter=float(os.environ.get("SYNTHETIC_JITTER", 0.1)),
+            metrics_path=os.environ.get("METRICS_PATH"),
+            cache_dir=os.environ.get("CACHE_DIR"),
+            memory_cache_bytes=int(
+                os.environ.get("MEMORY_CACHE_BYTES", 64 * 1024 * 1024)
+            ),
+            cache_max_bytes=(
+                int(os.environ["CACHE_MAX_BYTES"])
+                if "CACHE_MAX_BYTES" in os.environ
+                else None
+            ),
+            cache_ttl_days=(
+                float(os.environ["CACHE_TTL_DAYS"])
+                if "CACHE_TTL_DAYS" in os.environ
+                else None
+            ),
+            fingerprint_cache_keys=os.environ.get(
+                "FINGERPRINT_CACHE_KEYS", "true"
+            ).lower()
+            in ("1", "true", "yes"),
+            legacy_fan_keys=os.environ.get("LEGACY_FAN_KEYS", "true").lower()
+            in ("1", "true", "yes"),
+            checkpoint_interval=float(os.environ.get("CHECKPOINT_INTERVAL", 30.0)),
+            batch_endpoint=os.environ.get("BATCH_ENDPOINT", "local"),
+            batch_dir=os.environ.get("BATCH_DIR"),
+            batch_collect_window=float(os.environ.get("BATCH_COLLECT_WINDOW", 2.0)),
+            batch_poll_interval=float(os.environ.get("BATCH_POLL_INTERVAL", 30.0)),
+            batch_max_wait=float(os.environ.get("BATCH_MAX_WAIT", 30.0)),
+            batch_max_requests=int(os.environ.get("BATCH_MAX_REQUESTS", 50_000)),
+            token_budget=(
+                int(os.environ["TOKEN_BUDGET"])
+                if "TOKEN_BUDGET" in os.environ
+                else None
+            ),
+            cost_budget=(
+                float(os.environ["COST_BUDGET"])
+                if "COST_BUDGET" in os.environ
+                else None
+            ),
         )
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import logging
+from typing import Callable, Optional
+
+from automodeldocs.chat.tokens import count_message_tokens, count_tokens
+from automodeldocs.definitions import OpenAIInputMessage
+from automodeldocs.metrics import PROMPT_COMPACTIONS, PROMPTS_REJECTED, log_event
+from automodeldocs.structures import DescriptionContext, Improvement
+
+logger = logging.getLogger(__name__)
+
+MODEL_CONTEXT_WINDOWS: dict[str, int] = {
+    "gpt-4": 8_192,
+    "gpt-4-32k": 32_768,
+    "gpt-3.5-turbo": 4_096,
+    "gpt-3.5-turbo-16k": 16_384,
+}
+# Tokens left free in the window for the completion.
+COMPLETION_RESERVE = 1_024
+# Context descriptions are first summarised down to this many characters before being dropped.
+SUMMARISED_CONTEXT_CHARS = 600
+TRUNCATION_MARKER = "\n# ... source truncated to fit the context window ...\n"
+DOCUMENT_TRUNCATION_MARKER = "\n... document truncated to fit the context window ...\n"
+
+PromptBuilder = Callable[[str, Optional[Improvement]], list[OpenAIInputMessage]]
+DocumentsBuilder = Callable[[list[str]], list[OpenAIInputMessage]]
+
+
+class ContextWindowExceededError(RuntimeError):
+    pass
+
+
+def prompt_token_limit(model: str) -> int:
+    return MODEL_CONTEXT_WINDOWS.get(model, MODEL_CONTEXT_WINDOWS["gpt-4"]) - (
+        COMPLETION_RESERVE
+    )
+
+
+def ensure_fits(messages: list[OpenAIInputMessage], model: str, stage: str) -> None:
+    prompt_tokens = count_message_tokens(messages, model)
+    if prompt_tokens > prompt_token_limit(model):
+        PROMPTS_REJECTED.inc(stage=stage, model=model)
+        raise ContextWindowExceededError(
+            f"{stage} prompt has {prompt_tokens} tokens, "
+            f"{model} accepts {prompt_token_limit(model)}"
+        )
+
+
+def compact_prompt(
+    build: PromptBuilder,
+    source: str,
+    improvement: Optional[Improvement],
+    model: str,
+    stage: str,
+    marker: str = TRUNCATION_MARKER,
+) -> list[OpenAIInputMessage]:
+    """
+    Builds the prompt for `source` and `improvement`, compacting it until it fits `model`'s
+    context window. Compaction happens in a fixed order - the oldest feedback turns are
+    trimmed, then context descriptions are summarised and dropped from least to most
+    relevant, and finally the source is truncated.
+    """
+    limit = prompt_token_limit(model)
+
+    def fits(messages: list[OpenAIInputMessage]) -> bool:
+        return count_message_tokens(messages, model) <= limit
+
+    def record(step: str) -> None:
+        PROMPT_COMPACTIONS.inc(stage=stage, step=step)
+        log_event("prompt.compacted", stage=stage, step=step, model=model)
+
+    messages = build(source, improvement)
+    if fits(messages):
+        return messages
+    while improvement is not None and len(improvement.feedback) > 0:
+        improvement = Improvement(improvement.feedback[1:], improvement.context)
+        record("feedback")
+        if fits(messages := build(source, improvement)):
+            return messages
+    if improvement is not None and len(improvement.context.context) > 0:
+        context = {
+            name: description[:SUMMARISED_CONTEXT_CHARS]
+            for name, description in improvement.context.context.items()
+        }
+        improvement = Improvement(improvement.feedback, DescriptionContext(context))
+        record("summarise_context")
+        if fits(messages := build(source, improvement)):
+            return messages
+        # Entries the source never mentions go first, longest first within each group.
+        for name in sorted(
+            context,
+            key=lambda n: (n.split(".")[-1] in source, -len(context[n])),
+        ):
+            context = {k: v for k, v in context.items() if k != name}
+            improvement = Improvement(improvement.feedback, DescriptionContext(context))
+            record("drop_context")
+            if fits(messages := build(source, improvement)):
+                return messages
+    truncated_source = source
+    while not fits(messages) and len(truncated_source) > 0:
+        overflow = count_message_tokens(messages, model) - limit
+        truncated_source = truncated_source[
+            : max(0, len(truncated_source) - (overflow + 16) * 4)
+        ]
+        messages = build(truncated_source + marker, improvement)
+    record("truncate_source")
+    return messages
+
+
+def compact_documents(
+    build: DocumentsBuilder,
+    documents: list[str],
+    model: str,
+    stage: str,
+) -> tuple[list[OpenAIInputMessage], list[int]]:
+    """
+    Builds the prompt for `documents`, compacting it until it fits `model`'s context
+    window. The longest documents are dropped first, narrowing the beam down to a single
+    document, and then the documents left are truncated evenly. Returns the prompt and the
+    indices of the documents it contains.
+    """
+    limit = prompt_token_limit(model)
+
+    def overflow(messages: list[OpenAIInputMessage]) -> int:
+        return count_message_tokens(messages, model) - limit
+
+    def record(step: str) -> None:
+        PROMPT_COMPACTIONS.inc(stage=stage, step=step)
+        log_event("prompt.compacted", stage=stage, step=step, model=model)
+
+    kept = list(range(len(documents)))
+    messages = build(documents)
+    if overflow(messages) <= 0:
+        return messages, kept
+    while len(kept) > 1:
+        kept.remove(max(kept, key=lambda idx: len(documents[idx])))
+        record("narrow_beam")
+        if overflow(messages := build([documents[idx] for idx in kept])) <= 0:
+            return messages, kept
+    truncated = [documents[idx] for idx in kept]
+    while (excess := overflow(messages)) > 0 and any(len(d) > 0 for d in truncated):
+        cut = (excess + 16) * 4 // len(truncated) + 1
+        truncated = [d[: max(0, len(d) - cut)] for d in truncated]
+        messages = build([d + DOCUMENT_TRUNCATION_MARKER for d in truncated])
+    record("truncate_documents")
+    return messages, kept
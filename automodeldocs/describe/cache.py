@@ -2,16 +2,25 @@ from __future__ import annotations
 
 import dataclasses
 import json
+import logging
+import os
 import pathlib
+import threading
 from dataclasses import dataclass
-from typing import Optional
+from hashlib import sha256
+from typing import Iterable, Optional
 
 import cachetools
 import pandas as pd
 from function_discovery.structure import FunctionContainer
 
+from automodeldocs.fingerprint import source_key
 from automodeldocs.structures import Improvement
 
+logger = logging.getLogger(__name__)
+
+COLUMNS = ["digest", "function_source", "function_name", "improvements", "response"]
+
 
 @dataclass
 class FunctionDescriptionRequest:
@@ -29,78 +38,197 @@ class FunctionDescriptionRequest:
         return FunctionDescriptionRequest(function_info, improvement)
 
 
-class DescribeDBCache(cachetools.Cache):
-    __data: pd.DataFrame
-    __currsize: int = 0
-    __maxsize: int = -1
+def request_digest(function_source: str, function_name: str, improvements: str) -> str:
+    return sha256(
+        json.dumps([source_key(function_source), function_name, improvements]).encode()
+    ).hexdigest()
 
-    def __init__(self):
+
+class DescribeDBCache(cachetools.Cache):
+    """
+    Function descriptions keyed by a digest of (source, name, improvement).
+
+    Every entry is held in an in-memory index, so lookups never touch disk.
+    Writes are appended to a JSON-lines write-ahead log next to the parquet
+    file; once the log holds at least `compact_every` writes and
+    `compact_ratio` of the parquet file's rows, a background thread folds it
+    into the parquet file. Since each rewrite of the file is paid for by writes
+    in proportion to its size, a write costs O(1) amortized. Loading replays
+    the parquet file and then any logs, so nothing written before a crash is
+    lost.
+    """
+
+    def __init__(
+        self,
+        path: Optional[pathlib.Path] = None,
+        compact_every: int = 1000,
+        compact_ratio: float = 0.25,
+    ) -> None:
         super().__init__(maxsize=-1)
-        self._reload_data()
+        self.path = path or self._source()
+        self.compact_every = compact_every
+        self.compact_ratio = compact_ratio
+        self._index: dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._compaction: Optional[threading.Thread] = None
+        self._pending = 0
+        self._compacted_rows = 0
+        self._load()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._wal = open(self._wal_path, "a")
+
+    @property
+    def _wal_path(self) -> pathlib.Path:
+        return self.path.with_suffix(".wal.jsonl")
+
+    @property
+    def _compacting_wal_path(self) -> pathlib.Path:
+        return self.path.with_suffix(".compacting.jsonl")
 
-    def _reload_data(self) -> None:
-        self.__data = self._load_db()
-        self.__currsize = self.__data.shape[0]
+    @staticmethod
+    def _improvements(key: FunctionDescriptionRequest) -> str:
+        return json.dumps(
+            key.improvement.as_dict() if key.improvement is not None else {}
+        )
 
-    def __contains__(self, item: FunctionDescriptionRequest) -> bool:  # type: ignore
-        return self[item] is not None
+    @classmethod
+    def _digest(cls, key: FunctionDescriptionRequest) -> str:
+        return request_digest(
+            key.function_info.source(), key.function_info.name, cls._improvements(key)
+        )
 
-    def __getitem__(self, key: FunctionDescriptionRequest) -> str:
-        self._reload_data()
-        # Begin with the entire dataframe and filter it down based on the request attributes.
-        filtered_df = self.__data[
-            (self.__data["function_source"] == key.function_info.source())
-            & (self.__data["function_name"] == key.function_info.name)
-        ]
+    def __contains__(self, item: FunctionDescriptionRequest) -> bool:  # type: ignore
+        return self._digest(item) in self._index
 
-        if key.improvement is not None:
-            filtered_df = filtered_df[
-                filtered_df["improvements"] == json.dumps(key.improvement.as_dict())
-            ]
+    def __len__(self) -> int:
+        return len(self._index)
 
-        if not filtered_df.empty:
-            row = filtered_df.iloc[0]
-            return row["response"]
-        else:
-            self.__missing__(key)
-            raise RuntimeError("Unreachable")
+    def __getitem__(self, key: FunctionDescriptionRequest) -> str:
+        response = self._index.get(self._digest(key))
+        if response is None:
+            return self.__missing__(key)
+        return response
 
     def __setitem__(self, key: FunctionDescriptionRequest, value: str):
         row = {
+            "digest": self._digest(key),
             "function_source": key.function_info.source(),
             "function_name": key.function_info.name,
-            "improvements": json.dumps(
-                key.improvement.as_dict() if key.improvement is not None else {}
-            ),
+            "improvements": self._improvements(key),
             "response": value,
         }
-        self.__data = pd.concat([self.__data, pd.DataFrame([row])], ignore_index=True)
-        self._dump_data()
+        with self._lock:
+            self._index[row["digest"]] = value
+            self._wal.write(json.dumps(row) + "\n")
+            self._wal.flush()
+            self._pending += 1
+        if self._pending >= max(
+            self.compact_every, self.compact_ratio * self._compacted_rows
+        ):
+            self.compact(wait=False)
 
     @staticmethod
     def _source() -> pathlib.Path:
         return pathlib.Path.home() / "_function_descriptions.parquet"
 
-    @classmethod
-    def _load_db(cls) -> pd.DataFrame:
-        if cls._source().exists():
-            return pd.read_parquet(cls._source())
-        empty_df = pd.DataFrame(
-            columns=[
-                "function_source",
-                "function_name",
-                "prior_description",
-                "improvements",
-                "response",
-            ]
-        )
-
-        # You can now specify the dtype for simpler columns
-        empty_df["function_source"] = empty_df["function_source"].astype("str")
-        empty_df["function_name"] = empty_df["function_name"].astype("str")
-        empty_df["response"] = empty_df["response"].astype("str")
-        return empty_df
+    def _load(self) -> None:
+        data = self._read_parquet()
+        self._compacted_rows = data.shape[0]
+        for row in data.itertuples(index=False):
+            self._index[row.digest] = row.response
+        for wal_path in [self._compacting_wal_path, self._wal_path]:
+            for row in self._read_wal(wal_path):
+                self._index[row["digest"]] = row["response"]
+                self._pending += 1
+
+    def _read_parquet(self) -> pd.DataFrame:
+        if not self.path.exists():
+            return pd.DataFrame(columns=COLUMNS).astype("str")
+        data = pd.read_parquet(self.path)
+        # Stored digests go stale when the key scheme changes, e.g. with
+        # FINGERPRINT_CACHE_KEYS, so they are always derived afresh.
+        data["digest"] = [
+            request_digest(source, name, improvements)
+            for source, name, improvements in zip(
+                data["function_source"],
+                data["function_name"],
+                data["improvements"],
+            )
+        ]
+        return data[COLUMNS]
 
-    def _dump_data(self):
-        # TODO: Add queue/write ahead.
-        self.__data.to_parquet(self._source())
+    @staticmethod
+    def _read_wal(wal_path: pathlib.Path) -> Iterable[dict]:
+        if not wal_path.exists():
+            return []
+        rows = []
+        with open(wal_path) as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError:
+                    # The tail of a write interrupted by a crash.
+                    logger.warning(f"Skipping a torn entry in {wal_path}")
+                    continue
+                row["digest"] = request_digest(
+                    row["function_source"], row["function_name"], row["improvements"]
+                )
+                rows.append(row)
+        return rows
+
+    def compact(self, wait: bool = True) -> None:
+        """
+        Fold the write-ahead log into the parquet file. With `wait`, a
+        compaction already in progress is waited out and the writes made
+        since are folded in after it.
+        """
+        while True:
+            with self._lock:
+                if self._compaction is not None and self._compaction.is_alive():
+                    compaction, started = self._compaction, False
+                elif self._compacting_wal_path.exists() or self._pending > 0:
+                    # Writes from here on go to a fresh log while this one is folded in.
+                    self._wal.close()
+                    if self._compacting_wal_path.exists():
+                        # Left by a compaction that never finished; fold both in.
+                        with open(self._compacting_wal_path, "a") as f:
+                            f.write(self._wal_path.read_text())
+                        self._wal_path.unlink()
+                    else:
+                        os.replace(self._wal_path, self._compacting_wal_path)
+                    self._wal = open(self._wal_path, "a")
+                    self._pending = 0
+                    compaction = self._compaction = threading.Thread(
+                        target=self._compact, daemon=True
+                    )
+                    compaction.start()
+                    started = True
+                else:
+                    return
+            if not wait:
+                return
+            compaction.join()
+            if started:
+                return
+
+    def _compact(self) -> None:
+        data = pd.concat(
+            [
+                self._read_parquet(),
+                pd.DataFrame(
+                    list(self._read_wal(self._compacting_wal_path)), columns=COLUMNS
+                ),
+            ],
+            ignore_index=True,
+        ).drop_duplicates("digest", keep="last")
+        tmp_path = self.path.with_suffix(".parquet.tmp")
+        data.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, self.path)
+        self._compacting_wal_path.unlink()
+        self._compacted_rows = data.shape[0]
+        logger.info(f"Compacted {self.path} to {data.shape[0]} descriptions")
+
+    def close(self) -> None:
+        self.compact()
+        with self._lock:
+            self._wal.close()
@@ -3,6 +3,9 @@ from typing import Optional
 from automodeldocs.shared_prompts.base import Prompt
 from automodeldocs.structures import DescriptionContext
 
+# Ends the notes, so a streamed reply can be handed on as soon as it arrives.
+SCRATCH_END = "# End of Scratch"
+
 
 class ScratchFunctionPrompt(Prompt):
     _identity: str = """You are a Machine Learning Engineer. Your manager has requested a report into how a specific 
@@ -30,6 +33,7 @@ model, ensure you describe the architecture of the model. If you cannot, explain
 Always reply in the following format;
 # Scratch
 Your initial notes on the function to be provided, meeting all goals above.
+{scratch_end}
 
 You will be creating a report on the function: {function_name}
 """
@@ -48,6 +52,7 @@ You will be creating a report on the function: {function_name}
         return (
             self._identity.format(
                 function_name=self.function_name,
+                scratch_end=SCRATCH_END,
                 context=self.context.as_str() if self.context else "",
             )
             + "\n"
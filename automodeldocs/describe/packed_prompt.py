@@ -0,0 +1,76 @@
+from automodeldocs.shared_prompts.base import Prompt
+
+
+def format_packed_item(idx: int, name: str, body: str) -> str:
+    return f"## Item {idx}: {name} ##\n{body}"
+
+
+class PackedScratchPrompt(Prompt):
+    _identity: str = """You are a Machine Learning Engineer. Your manager has requested technical notes on several small,
+independent functions from the same codebase.
+
+For each function, write down technical notes that help a prospective user understand what the function does;
+its role in the machine learning pipeline, the operations it performs, how it transforms its inputs into its
+outputs, and the types and shapes of its parameters and return value.
+
+Treat every item separately - do not mix notes between items.
+
+Always reply in the following format, with one section per item, in the order given;
+## Item 0
+Your notes on item 0.
+## Item 1
+Your notes on item 1.
+"""
+
+    def __init__(self, function_names: list[str], code_sources: list[str]) -> None:
+        self.function_names = function_names
+        self.code_sources = code_sources
+
+    def system_message(self, **kwargs) -> str:
+        return self._identity + "\n"
+
+    def user_message(self, **kwargs) -> str:
+        return "\n".join(
+            format_packed_item(idx, name, f"Code:\n{source}")
+            for idx, (name, source) in enumerate(
+                zip(self.function_names, self.code_sources)
+            )
+        )
+
+
+class PackedDescribeFunctions(Prompt):
+    _identity: str = """You are a Machine Learning Engineer writing documentation for several small, independent functions.
+
+Ideal documentation focuses on each function as a tool for doing something - it abstracts away the complexity of how
+the function is doing something, and focuses instead on how the function can be used to accomplish something, as well as
+how to change parameters to achieve different goals. If a function cannot be understood without another function,
+say so rather than guessing.
+
+Each item comes with your technical notes on it. Treat every item separately - do not mix descriptions between items.
+
+Always reply in the following format, with one section per item, in the order given;
+## Item 0
+Concise summary of item 0, summarising your technical notes.
+## Item 1
+Concise summary of item 1, summarising your technical notes.
+"""
+
+    def __init__(
+        self, function_names: list[str], scratches: list[str], code_sources: list[str]
+    ) -> None:
+        self.function_names = function_names
+        self.scratches = scratches
+        self.code_sources = code_sources
+
+    def system_message(self, **kwargs) -> str:
+        return self._identity + "\n"
+
+    def user_message(self, **kwargs) -> str:
+        return "\n".join(
+            format_packed_item(
+                idx, name, f"Technical Notes:\n{scratch}\nCode:\n{source}"
+            )
+            for idx, (name, scratch, source) in enumerate(
+                zip(self.function_names, self.scratches, self.code_sources)
+            )
+        )
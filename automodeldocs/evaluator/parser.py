@@ -7,6 +7,7 @@ from dataclasses import dataclass
 from json import JSONDecodeError
 
 from automodeldocs.chat.send_message import reformat_json
+from automodeldocs.metrics import log_event
 from automodeldocs.response.formatted import FormattedOpenAIResponse
 
 
@@ -44,37 +45,39 @@ class EvaluationResponse:
             try:
                 evaluation_response = json.loads(reformatted_json)
             except JSONDecodeError:
-                breakpoint()
+                logging.error(f"Couldn't parse reformatted JSON - {reformatted_json}")
                 raise RuntimeError("Tried to reformat, still failed.")
 
         try:
-            _ratings = evaluation_response["ratings"]
-            additional_context_items = evaluation_response[
-                "additional_context_required"
-            ]
-            best_documentation_feedback = evaluation_response[
-                "best_documentation_feedback"
-            ]
-            print(additional_context_items)
-            additional_items = []
-            # Also deal with ' x and y' types
-            for additional_context_request in additional_context_items:
-                if len(additional_context_request.keys()) > 0:
-                    if "," in additional_context_request["name"]:
-                        split_items = [
-                            a.strip()
-                            for a in additional_context_request["name"].split(",")
-                        ]
-                        for item in split_items:
-                            additional_items.append(item)
-                    else:
-                        additional_items.append(additional_context_request["name"])
-            return EvaluationResponse(
-                documentation_idx=int(best_documentation_feedback["idx"]),
-                feedback=best_documentation_feedback["feedback"],
-                additional_context_items=additional_items,
-                missing_information=(len(additional_context_items) > 0),
-            )
+            return EvaluationResponse.from_json(evaluation_response)
         except KeyError:
             logging.error(f"Couldn't parse JSON reply - {evaluation_response}")
             raise RuntimeError
+
+    @staticmethod
+    def from_json(evaluation_response: dict) -> EvaluationResponse:
+        _ratings = evaluation_response["ratings"]
+        additional_context_items = evaluation_response["additional_context_required"]
+        best_documentation_feedback = evaluation_response["best_documentation_feedback"]
+        log_event(
+            "evaluation.additional_context_requested",
+            items=additional_context_items,
+        )
+        additional_items = []
+        # Also deal with ' x and y' types
+        for additional_context_request in additional_context_items:
+            if len(additional_context_request.keys()) > 0:
+                if "," in additional_context_request["name"]:
+                    split_items = [
+                        a.strip() for a in additional_context_request["name"].split(",")
+                    ]
+                    for item in split_items:
+                        additional_items.append(item)
+                else:
+                    additional_items.append(additional_context_request["name"])
+        return EvaluationResponse(
+            documentation_idx=int(best_documentation_feedback["idx"]),
+            feedback=best_documentation_feedback["feedback"],
+            additional_context_items=additional_items,
+            missing_information=(len(additional_context_items) > 0),
+        )
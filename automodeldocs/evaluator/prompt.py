@@ -72,3 +72,63 @@ Ensure the response can be parsed by Python json.loads.
                 for (idx, document) in enumerate(self.documents)
             ]
         )
+
+
+class PackedEvaluator(Evaluator):
+    _packing_note: str = """You will be given several independent items, each with its own documentation drafts. Assess
+every item separately, applying the criteria above to each.
+"""
+
+    _reply_format: str = """Always reply using the format below, with one entry per item, where the square brackets indicate lists:
+{
+    "items": [
+        {
+            "item": "numeric index of the item, starting at 0",
+            "ratings": [
+                {
+                    "idx": "numeric index of documentation within this item, starting at 0",
+                    "rating": "letter grade",
+                    "reasoning": "reasoning for grade"
+                }
+            ],
+            "additional_context_required": [
+                {
+                    "name": "The name of a single function, method, or class, e.g. numpy.where. This will be used in name resolution, so it must match the code exactly.",
+                    "reasoning": "Why additional information about this item would improve the existing description",
+                }
+            ],
+            "best_documentation_feedback": {
+                "idx": "index of best documentation within this item",
+                "feedback": "in-depth feedback for improving the best documentation",
+            }
+        }
+    ]
+}
+Ensure the response can be parsed by Python json.loads.
+"""
+
+    def __init__(
+        self, function_names: list[str], documentation: list[list[str]]
+    ) -> None:
+        super().__init__([])
+        self.function_names = function_names
+        self.item_documents = documentation
+
+    def system_message(self, **kwargs) -> str:
+        return (
+            f"{self._identity}\n{self._packing_note}"
+            + "\nResponse Format:\n"
+            + self._reply_format
+        )
+
+    def user_message(self, **kwargs) -> str:
+        return "\n".join(
+            f"## Item {item_idx}: {name} ##\n"
+            + "\n".join(
+                f"### Document {document_idx} ###\n{document}"
+                for document_idx, document in enumerate(documents)
+            )
+            for item_idx, (name, documents) in enumerate(
+                zip(self.function_names, self.item_documents)
+            )
+        )
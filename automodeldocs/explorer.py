@@ -1,8 +1,10 @@
 from __future__ import annotations
 import asyncio
+import dataclasses
+import json
 import logging
 import pathlib
-from typing import TypeAlias, Union, Sequence
+from typing import Callable, TypeAlias, Union, Sequence
 
 from function_discovery import parse_module
 from function_discovery.structure import (
@@ -11,10 +13,35 @@ from function_discovery.structure import (
     ModuleContainer,
     ScopeContainer,
 )
-from dataclasses import dataclass
+from enum import IntEnum
 
+from automodeldocs.beam import (
+    CONVERGENCE_PROBE_WIDTH,
+    beam_signals,
+    choose_beam_width,
+    converged,
+)
+from automodeldocs.budget import BudgetExceededError, BudgetLevel, run_budget
+from automodeldocs.cache_store import ContentStore
+from automodeldocs.chat.client import llm_client
+from automodeldocs.chat.model import GPT_MODEL
 from automodeldocs.chat.send_message import chat_completion_request
+from automodeldocs.chat.single_flight import SingleFlight
+from automodeldocs.chat.tokens import count_tokens
 from automodeldocs.config.llm_config import LLMConfig
+from automodeldocs.context_guard import compact_documents
+from automodeldocs.definitions import OpenAIInputMessage
+from automodeldocs.graph import DependencyGraph
+from automodeldocs.metrics import (
+    BEAM_CANDIDATES,
+    CACHE_LOOKUPS,
+    DESCRIPTION_ITERATIONS,
+    STAGE_SECONDS,
+    log_event,
+    metrics,
+)
+from automodeldocs.packing import FunctionPacker, PackedItem
+from automodeldocs.scheduler import TopologicalScheduler
 from automodeldocs.utils import take_items
 from automodeldocs.writer import write_description, write_scratch, format_description
 from automodeldocs.evaluator.parser import EvaluationResponse
@@ -32,90 +59,101 @@ logger = logging.getLogger(__name__)
 
 Container: TypeAlias = Union[FunctionContainer, ClassContainer, ModuleContainer]
 
+_packer: tuple[asyncio.AbstractEventLoop, FunctionPacker] | None = None
 
-@dataclass
-class InitialDescription:
-    container: Container
-    name: str
-    description: str
-    dependencies: list[
-        Union[InitialDescription, ResolvingDescription, ResolvedDescription]
-    ]
-    feedback: str
-
-    def __repr__(self) -> str:
-        return (
-            f"InitialDescription(\n\tcontainer: {self.container.__class__},"
-            f"\n\tname: {self.name},"
-            f"\n\tdescription: {' '.join(take_items(self.description.split(' '), 50))}{'...' if len(self.feedback.split()) > 50 else ''}"
-            f"\n\tdependencies: {[str(dependency.__class__) + '(' + dependency.name + ')' for dependency in self.dependencies]}"
-            f"\n\tfeedback: {' '.join(take_items(self.feedback.split(' '), 50))}{'...' if len(self.feedback.split()) > 50 else ''}"
-            "\n)"
-        )
-
-    def __hash__(self) -> int:
-        return hash(
-            tuple([self.container, self.description]) + tuple(self.dependencies)
-        )
+fan_and_evaluate_flight: SingleFlight[tuple[str, EvaluationResponse]] = SingleFlight(
+    "fan_and_evaluate"
+)
 
 
-@dataclass
-class ResolvingDescription:
-    container: Container
-    name: str
-    description: str
-    dependencies: list[
-        Union[InitialDescription, ResolvingDescription, ResolvedDescription]
-    ]
-    feedback: str
+class NodeState(IntEnum):
+    INITIAL = 0
+    RESOLVING = 1
+    RESOLVED = 2
+
+
+class DescriptionNode:
+    """
+    A container's description as it moves from its first draft, through
+    improvement passes, to resolved. Nodes are updated in place and hash by
+    identity; their dependencies are edges in the DependencyGraph.
+    """
+
+    __slots__ = ("container", "name", "description", "feedback", "state", "iterations")
+
+    def __init__(
+        self,
+        container: Container,
+        name: str,
+        description: str,
+        feedback: str,
+        state: NodeState = NodeState.INITIAL,
+        iterations: int = 0,
+    ) -> None:
+        self.container = container
+        self.name = name
+        self.description = description
+        self.feedback = feedback
+        self.state = state
+        # Improvement passes run so far.
+        self.iterations = iterations
 
     def __repr__(self) -> str:
         return (
-            f"ResolvingDescription(\n\tcontainer: {self.container.__class__},"
+            f"DescriptionNode(\n\tstate: {self.state.name},"
+            f"\n\titerations: {self.iterations},"
+            f"\n\tcontainer: {self.container.__class__},"
             f"\n\tname: {self.name},"
-            f"\n\tdescription: \"{' '.join(take_items(self.description.split(' '), 25))}{'...' if len(self.feedback.split()) > 26 else ''}\"\n"
-            f"\n\tdependencies: {[str(dependency.__class__) + '(' + dependency.name + ')' for dependency in self.dependencies]}"
-            f"\n\tfeedback: \"{' '.join(take_items(self.feedback.split(' '), 25))}{'...' if len(self.feedback.split()) > 26 else ''}\"\n"
+            f"\n\tdescription: {' '.join(take_items(self.description.split(' '), 25))}{'...' if len(self.description.split()) > 25 else ''}"
+            f"\n\tfeedback: {' '.join(take_items(self.feedback.split(' '), 25))}{'...' if len(self.feedback.split()) > 25 else ''}"
             "\n)"
         )
 
-    def __hash__(self) -> int:
-        return hash(
-            tuple([self.container, self.description]) + tuple(self.dependencies)
-        )
-
-
-@dataclass
-class ResolvedDescription:
-    container: Container
-    name: str
-    description: str
-    dependencies: list[
-        Union[InitialDescription, ResolvingDescription, ResolvedDescription]
-    ]
-    feedback: str
-
-    def __repr__(self) -> str:
-        return (
-            f"ResolvedDescription(\n\tcontainer: {self.container.__class__},"
-            f"\n\tname: {self.name},"
-            f"\n\tdescription: {' '.join(take_items(self.description.split(' '), 25))}{'...' if len(self.feedback.split()) > 26 else ''}"
-            f"\n\tdependencies: {[str(dependency.__class__) + '(' + dependency.name + ')' for dependency in self.dependencies]}"
-            f"\n\tfeedback: {' '.join(take_items(self.feedback.split(' '), 25))}{'...' if len(self.feedback.split()) > 26 else ''}"
-            "\n)"
-        )
 
-    def __hash__(self) -> int:
-        return hash(
-            tuple([self.container, self.description]) + tuple(self.dependencies)
-        )
+def refinement_stop_reason(
+    iterations: int,
+    max_iterations: int,
+    previous_description: str,
+    current_description: str,
+    new_dependencies: int,
+    threshold: float,
+) -> str | None:
+    """
+    Why a node should stop being refined after its latest improvement pass, or
+    None if it should take another pass with its new dependencies as context.
+    """
+    if new_dependencies == 0:
+        return "no_new_context"
+    if converged([previous_description, current_description], threshold):
+        return "converged"
+    if iterations >= max_iterations:
+        return "iteration_cap"
+    return None
+
+
+def resolve_node(node: DescriptionNode, reason: str) -> DescriptionNode:
+    node.state = NodeState.RESOLVED
+    DESCRIPTION_ITERATIONS.observe(node.iterations, reason=reason)
+    log_event(
+        "describe.resolved", name=node.name, iterations=node.iterations, reason=reason
+    )
+    return node
 
 
 async def describe_and_try_resolve_node(
-    node: InitialDescription | ResolvingDescription, description_context: dict
-) -> ResolvedDescription | ResolvingDescription:
+    node: DescriptionNode,
+    description_context: dict,
+    graph: DependencyGraph,
+) -> DescriptionNode:
     context_node: FunctionContainer | ClassContainer
-    description_node: InitialDescription | ResolvingDescription | ResolvedDescription
+    description_node: DescriptionNode
+    config = LLMConfig.from_env()
+    if run_budget().level() >= BudgetLevel.NO_IMPROVEMENT:
+        run_budget().record_skip("improvement", node.name)
+        return resolve_node(node, "budget")
+    if node.iterations >= config.description_iterations:
+        return resolve_node(node, "iteration_cap")
+    previous_description = node.description
     current_description, evaluation_response = await fan_and_evaluate(
         node.container.source(),
         node.name,
@@ -133,237 +171,160 @@ async def describe_and_try_resolve_node(
             ),
         ),
     )
+    node.iterations += 1
+    node.description = current_description
+    node.feedback = evaluation_response.feedback
+    known_dependencies = set(graph.dependencies(node.container))
     additional_dependencies = [
-        node.container.resolve_name(additional_context_item).origin
-        for additional_context_item in evaluation_response.additional_context_items
-        if node.container.resolve_name(additional_context_item) is not None
-        and node.container.resolve_name(additional_context_item).origin
-        not in [n.container for n in node.dependencies]
+        dependency
+        for dependency in dict.fromkeys(
+            node.container.resolve_name(additional_context_item).origin
+            for additional_context_item in evaluation_response.additional_context_items
+            if node.container.resolve_name(additional_context_item) is not None
+        )
+        if isinstance(dependency, (FunctionContainer, ClassContainer))
+        and dependency not in known_dependencies
     ]
+    reason = refinement_stop_reason(
+        node.iterations,
+        config.description_iterations,
+        previous_description,
+        current_description,
+        len(additional_dependencies),
+        config.description_convergence,
+    )
+    if reason is not None:
+        return resolve_node(node, reason)
     class_name = node.name if isinstance(node.container, ClassContainer) else ""
-    if len(additional_dependencies) > 0:
-        return ResolvingDescription(
-            container=node.container,
-            name=node.name,
-            description=current_description,
-            dependencies=node.dependencies
-            + list(
-                asyncio.gather(
-                    *[
-                        convert_dependency_to_description(additional_dep, node, class_name)
-                        for additional_dep in additional_dependencies
-                    ]
-                )
-            ),
-            feedback=evaluation_response.feedback,
-        )
-    return ResolvedDescription(
-        container=node.container,
-        name=node.name,
-        description=current_description,
-        dependencies=node.dependencies,
-        feedback=evaluation_response.feedback,
+    await asyncio.gather(
+        *[
+            convert_dependency_to_description(additional_dep, node, graph, class_name)
+            for additional_dep in additional_dependencies
+        ]
     )
-
-
-async def resolve_dependencies(
-    node: InitialDescription | ResolvingDescription,
-    parent_descriptions: set[FunctionContainer | ClassContainer],
-) -> InitialDescription | ResolvingDescription:
-    for idx in range(len(node.dependencies)):
-        dependency = node.dependencies[idx]
-        if isinstance(dependency, InitialDescription):
-            resolving_node = ResolvingDescription(
-                dependency.container,
-                dependency.name,
-                dependency.description,
-                dependency.dependencies,
-                feedback=dependency.feedback,
-            )
-            node.dependencies[idx] = resolving_node
-            node.dependencies[idx] = await resolve_description(
-                resolving_node, parent_descriptions
-            )
-        elif isinstance(dependency, ResolvingDescription):
-            node.dependencies[idx] = await resolve_description(
-                dependency, parent_descriptions
-            )
-        elif isinstance(dependency, ResolvedDescription):
-            pass
+    node.state = NodeState.RESOLVING
     return node
 
 
-def all_trivial_dependencies_met(
-    dependencies: list[InitialDescription | ResolvingDescription | ResolvedDescription],
-    parent_descriptions: set,
+async def describe_node(
+    container: FunctionContainer | ClassContainer, graph: DependencyGraph
 ) -> bool:
-    return (
-        # No dependencies to meet
-        (len(dependencies) == 0)
-        # All dependencies are met
-        or (all(isinstance(n, ResolvedDescription) for n in dependencies))
-        # All dependencies that can be met, are met.
-        or (
-            all(
-                isinstance(dependency, ResolvedDescription)
-                for dependency in dependencies
-                if dependency.container not in parent_descriptions
-            )
-        )
+    node = graph.node(container)
+    description_context = {
+        dependency: graph.node(dependency)
+        for dependency in graph.dependencies(container)
+        if graph.node(dependency).state is NodeState.RESOLVED
+    }
+    log_event("describe.start", name=node.name)
+    with STAGE_SECONDS.time(stage="describe_node"):
+        await describe_and_try_resolve_node(node, description_context, graph)
+    return node.state is NodeState.RESOLVED
+
+
+async def resolve_graph(
+    graph: DependencyGraph,
+    targets: Sequence[FunctionContainer | ClassContainer],
+    progress: Callable[[int, int], None] | None = None,
+) -> TopologicalScheduler:
+    scheduler = TopologicalScheduler(
+        graph,
+        describe=lambda container: describe_node(container, graph),
+        concurrency=LLMConfig.from_env().describe_concurrency,
+        is_done=lambda container: graph.node(container).state is NodeState.RESOLVED,
+        progress=progress,
     )
+    with STAGE_SECONDS.time(stage="resolve_description"):
+        await scheduler.run(targets)
+    return scheduler
 
 
-async def resolve_description(
-    node: InitialDescription | ResolvingDescription,
-    parent_descriptions: set[
-        FunctionContainer | ClassContainer
-    ] = None,  # TODO: This need a better name
-) -> ResolvedDescription | ResolvingDescription:
-    if parent_descriptions is None:
-        parent_descriptions = set()
-    description_context: dict[
-        FunctionContainer | ClassContainer,
-        Union[InitialDescription, ResolvingDescription, ResolvedDescription],
-    ] = {}
-    print(f"Describing {node.name}")
-    parent_descriptions = parent_descriptions | {node.container}
-    while not all_trivial_dependencies_met(node.dependencies, parent_descriptions):
-        node = await resolve_dependencies(node, parent_descriptions)
-    for dependency in node.dependencies:
-        if isinstance(dependency, ResolvedDescription):
-            description_context[dependency.container] = dependency
-    # If there are no dependencies, resolve
-    if len(node.dependencies) == 0:
-        return await describe_and_try_resolve_node(node, description_context)
-    # If the only resolving dependencies of this node are parent functions, resolve this node
-    elif all(
-        isinstance(dependency, ResolvedDescription)
-        or isinstance(dependency, InitialDescription)
-        for dependency in node.dependencies
-        if dependency.container not in parent_descriptions
-    ):
-        return await describe_and_try_resolve_node(node, description_context)
-    # If any of this node's dependencies have not resolved, this is also still resolving.
-    elif any(isinstance(n, ResolvingDescription) for n in node.dependencies):
-        return ResolvingDescription(
-            node.container,
-            node.name,
-            node.description,
-            node.dependencies,
-            feedback=node.feedback,
+async def create_class_dependency_graph(
+    class_info: ClassContainer, graph: DependencyGraph
+) -> DescriptionNode:
+    async def build() -> DescriptionNode:
+        return DescriptionNode(
+            container=class_info,
+            name=class_info.name,
+            description=(
+                f"A description of the class {class_info.name}"
+                if class_info.docs() is None
+                else class_info.docs()
+            ),
+            feedback="Insufficient information provided about the class.",
         )
-    # Otherwise all dependencies have resolved, and we can also resolve
-    else:
-        resolved_node = await describe_and_try_resolve_node(node, description_context)
-        return resolved_node
 
-
-async def create_class_dependency_graph(
-    class_info: ClassContainer,
-    resolving: dict[
-        FunctionContainer | ClassContainer,
-        Union[InitialDescription, ResolvingDescription, ResolvedDescription],
-    ]
-    | None = None,
-) -> InitialDescription:
-    if resolving is None:
-        resolving = {}
-    resolving_class_node = InitialDescription(
-        container=class_info,
-        name=class_info.name,
-        description=f"A description of the class {class_info.name}"
-        if class_info.docs() is None
-        else class_info.docs(),
-        dependencies=[],
-        feedback="Insufficient information provided about the class.",
-    )
-    function_dependencies: Sequence[InitialDescription] = await asyncio.gather(
+    class_node, created = await graph.node_for(class_info, build)
+    if not created:
+        return class_node
+    await asyncio.gather(
         *[
-            create_function_dependency_graph(
-                function_info=function,
-                class_name=class_info.name,
-                resolving=resolving | {class_info: resolving_class_node},
+            convert_dependency_to_description(
+                function, class_node, graph, class_name=class_info.name
             )
             for function in class_info.functions
         ]
     )
-    resolving_class_node.dependencies = list(function_dependencies)
-    return resolving_class_node
+    return class_node
 
 
 async def convert_dependency_to_description(
     dependency: FunctionContainer | ClassContainer,
-    parent_node: InitialDescription | ResolvingDescription | ResolvedDescription,
+    parent_node: DescriptionNode,
+    graph: DependencyGraph,
     class_name: str | None = None,
-    resolving: dict | None = None,
 ):
-    if resolving is None:
-        resolving = {}
+    graph.add_edge(parent_node.container, dependency)
     if isinstance(dependency, FunctionContainer):
         return await create_function_dependency_graph(
-            function_info=dependency,
-            class_name=class_name,
-            resolving=resolving | {parent_node.container: parent_node},
+            function_info=dependency, class_name=class_name, graph=graph
         )
     elif isinstance(dependency, ClassContainer):
-        return await create_class_dependency_graph(
-            class_info=dependency,
-            resolving=resolving | {parent_node.container: parent_node},
-        )
+        return await create_class_dependency_graph(class_info=dependency, graph=graph)
 
 
 async def create_function_dependency_graph(
     function_info: FunctionContainer,
     class_name: str | None,
-    resolving: dict[
-        FunctionContainer | ClassContainer,
-        Union[InitialDescription, ResolvingDescription, ResolvedDescription],
-    ]
-    | None = None,
-) -> InitialDescription:
-    if resolving is None:
-        resolving = {}
-    # Add in a self-loop rather than recalculating
-    if function_info in resolving:
-        res = resolving[function_info]
-        assert isinstance(res, InitialDescription)
-        return res
+    graph: DependencyGraph,
+) -> DescriptionNode:
     if class_name is None:
         function_name = function_info.name
     else:
         function_name = f"{class_name}.{function_info.name}"
-    function_docs = function_info.docs()
-    function_source = function_info.source()
-    initial_description, evaluation_response = await fan_and_evaluate(
-        function_source, function_name, function_docs
-    )
+    evaluation_response: EvaluationResponse | None = None
+
+    async def build() -> DescriptionNode:
+        nonlocal evaluation_response
+        initial_description, evaluation_response = await fan_and_evaluate(
+            function_info.source(), function_name, function_info.docs()
+        )
+        return DescriptionNode(
+            container=function_info,
+            name=function_name,
+            description=initial_description,
+            feedback=evaluation_response.feedback,
+        )
+
+    # Referrers share the node; only the builder expands its dependencies, and
+    # it does so after registering the node so that cycles find it.
+    current_node, created = await graph.node_for(function_info, build)
+    if not created:
+        return current_node
+    assert evaluation_response is not None
     dependencies = [
         function_info.resolve_name(additional_context_item).origin
         for additional_context_item in evaluation_response.additional_context_items
         if function_info.resolve_name(additional_context_item) is not None
     ]
-    current_node = InitialDescription(
-        container=function_info,
-        name=function_name,
-        description=initial_description,
-        feedback=evaluation_response.feedback,
-        dependencies=[],
-    )
-    sub_nodes = list(
-        await asyncio.gather(
-            *[
-                convert_dependency_to_description(
-                    dependency,
-                    current_node,
-                    class_name=class_name,
-                    resolving=resolving,
-                )
-                for dependency in dependencies
-                if isinstance(dependency, (FunctionContainer, ClassContainer))
-            ]
-        )
+    await asyncio.gather(
+        *[
+            convert_dependency_to_description(
+                dependency, current_node, graph, class_name=class_name
+            )
+            for dependency in dict.fromkeys(dependencies)
+            if isinstance(dependency, (FunctionContainer, ClassContainer))
+        ]
     )
-    current_node.dependencies = list(sub_nodes)
     return current_node
 
 
@@ -380,62 +341,231 @@ async def fan_and_evaluate(
         improvement=improvement,
     )
     if cache_entry is not None:
+        CACHE_LOOKUPS.inc(cache="fan", result="hit")
         return cache_entry
-    description_strings: list[str] = list(
-        await asyncio.gather(
-            *[
-                write_description(
-                    function_source=function_source,
-                    function_name=function_name,
-                    scratch=(
-                        await write_scratch(function_source, function_name, improvement)
-                    ),
-                    improvement=improvement,
+    CACHE_LOOKUPS.inc(cache="fan", result="miss")
+    if run_budget().level() >= BudgetLevel.DOCSTRING_ONLY:
+        return _docstring_only(function_name, function_docs)
+    try:
+        return await fan_and_evaluate_flight.run(
+            (
+                function_source,
+                function_name,
+                function_docs,
+                json.dumps(improvement.as_dict()) if improvement is not None else None,
+            ),
+            lambda: (
+                function_packer().describe(
+                    PackedItem(function_source, function_name, function_docs)
                 )
-                for _ in range(LLMConfig.from_env().beam_width)
-            ]
+                if _packable(function_source, improvement)
+                else _fan_and_evaluate(
+                    function_source, function_name, function_docs, improvement
+                )
+            ),
         )
+    except BudgetExceededError:
+        return _docstring_only(function_name, function_docs)
+
+
+def _docstring_only(
+    function_name: str, function_docs: str | None
+) -> tuple[str, EvaluationResponse]:
+    run_budget().record_skip("description", function_name)
+    return function_docs or "", EvaluationResponse(
+        documentation_idx=0,
+        feedback="",
+        additional_context_items=[],
+        missing_information=False,
     )
-    if function_docs is not None:
-        description_strings += [function_docs]
-    evaluation_response = await EvaluationResponse.from_fmt(
-        (
-            await chat_completion_request(
-                [
-                    message_from_system_str(
-                        Evaluator(description_strings).system_message()
-                    ),
-                    message_from_user_str(
-                        Evaluator(description_strings).user_message()
-                    ),
-                ]
-            )
-        ).item[-1]
+
+
+def _packable(function_source: str, improvement: Improvement | None) -> bool:
+    config = LLMConfig.from_env()
+    return (
+        config.pack_small_functions
+        and improvement is None
+        and count_tokens(function_source, "gpt-3.5-turbo-16k") <= config.pack_max_tokens
     )
-    best_description = await format_description(
-        function_name, description_strings[evaluation_response.documentation_idx]
+
+
+def function_packer() -> FunctionPacker:
+    # Packs collect across concurrent nodes, so there is one packer per event loop.
+    global _packer
+    if _packer is None or _packer[0] is not asyncio.get_running_loop():
+        config = LLMConfig.from_env()
+        _packer = (
+            asyncio.get_running_loop(),
+            FunctionPacker(
+                describe_single=lambda item: _fan_and_evaluate(
+                    item.function_source, item.function_name, item.function_docs, None
+                ),
+                beam_width=_pack_beam_width,
+                max_items=config.pack_max_items,
+                collect_window=config.pack_collect_window,
+            ),
+        )
+    return _packer[1]
+
+
+def _beam_width(
+    function_name: str,
+    function_source: str,
+    function_docs: str | None,
+    improvement: Improvement | None,
+) -> int:
+    if run_budget().level() >= BudgetLevel.REDUCED_BEAM:
+        run_budget().record_skip("beam", function_name)
+        return 1
+    config = LLMConfig.from_env()
+    if not config.adaptive_beam:
+        return config.beam_width
+    return choose_beam_width(
+        beam_signals(function_source, function_docs, improvement), config.beam_width
     )
-    save_fan_cache(
-        function_source=function_source,
-        function_name=function_name,
-        function_docs=function_docs,
-        improvement=improvement,
-        description=best_description,
-        evaluation_response=evaluation_response,
+
+
+def _count_skipped_by_signals(width: int) -> None:
+    # Counted where a width is applied, so a pack counts once rather than per item.
+    config = LLMConfig.from_env()
+    if config.adaptive_beam and run_budget().level() < BudgetLevel.REDUCED_BEAM:
+        BEAM_CANDIDATES.inc(config.beam_width - width, result="skipped_by_signals")
+
+
+def _pack_beam_width(items: list[PackedItem]) -> int:
+    width = max(
+        _beam_width(item.function_name, item.function_source, item.function_docs, None)
+        for item in items
     )
-    return best_description, evaluation_response
+    _count_skipped_by_signals(width)
+    return width
 
 
-async def fully_describe_item(container: ScopeContainer) -> str:
+def _evaluation_messages(documents: list[str]) -> list[OpenAIInputMessage]:
+    evaluator = Evaluator(documents)
+    return [
+        message_from_system_str(evaluator.system_message()),
+        message_from_user_str(evaluator.user_message()),
+    ]
+
+
+async def _fan_and_evaluate(
+    function_source: str,
+    function_name: str,
+    function_docs: str | None,
+    improvement: Improvement | None,
+) -> tuple[str, EvaluationResponse]:
+    with STAGE_SECONDS.time(stage="fan_and_evaluate"):
+        beam_semaphore = asyncio.Semaphore(LLMConfig.from_env().beam_concurrency)
+
+        async def beam_member() -> str:
+            async with beam_semaphore:
+                scratch = await write_scratch(
+                    function_source, function_name, improvement
+                )
+                return await write_description(
+                    function_source=function_source,
+                    function_name=function_name,
+                    scratch=scratch,
+                    improvement=improvement,
+                )
+
+        config = LLMConfig.from_env()
+        beam_width = _beam_width(
+            function_name, function_source, function_docs, improvement
+        )
+        _count_skipped_by_signals(beam_width)
+        # Write a couple of candidates first, and only widen the beam if they differ.
+        probe_width = (
+            min(beam_width, CONVERGENCE_PROBE_WIDTH)
+            if config.adaptive_beam
+            else beam_width
+        )
+        description_strings: list[str] = list(
+            await asyncio.gather(*[beam_member() for _ in range(probe_width)])
+        )
+        if beam_width > probe_width:
+            if converged(description_strings, config.beam_convergence):
+                BEAM_CANDIDATES.inc(
+                    beam_width - probe_width, result="skipped_converged"
+                )
+            else:
+                description_strings += await asyncio.gather(
+                    *[beam_member() for _ in range(beam_width - probe_width)]
+                )
+        BEAM_CANDIDATES.inc(len(description_strings), result="written")
+        if function_docs is not None:
+            description_strings += [function_docs]
+        evaluation_messages, evaluated = compact_documents(
+            _evaluation_messages, description_strings, GPT_MODEL, stage="evaluation"
+        )
+        evaluation_response = await EvaluationResponse.from_fmt(
+            (
+                await chat_completion_request(evaluation_messages, stage="evaluation")
+            ).item[-1]
+        )
+        # Compaction may have dropped candidates, so map the pick back to the full beam.
+        evaluation_response = dataclasses.replace(
+            evaluation_response,
+            documentation_idx=evaluated[evaluation_response.documentation_idx],
+        )
+        best_description = await format_description(
+            function_name, description_strings[evaluation_response.documentation_idx]
+        )
+        save_fan_cache(
+            function_source=function_source,
+            function_name=function_name,
+            function_docs=function_docs,
+            improvement=improvement,
+            description=best_description,
+            evaluation_response=evaluation_response,
+        )
+        return best_description, evaluation_response
+
+
+async def build_dependency_graph(
+    container: ScopeContainer, graph: DependencyGraph
+) -> DescriptionNode:
     if isinstance(container, FunctionContainer):
-        base_graph = await create_function_dependency_graph(container, class_name=None)
+        return await create_function_dependency_graph(
+            container, class_name=None, graph=graph
+        )
     elif isinstance(container, ClassContainer):
-        base_graph = await create_class_dependency_graph(container)
-    else:
-        raise ValueError
-    resolved_desc = await resolve_description(base_graph)
-    breakpoint()
-    return resolved_desc.description
+        return await create_class_dependency_graph(container, graph)
+    raise ValueError
+
+
+def iteration_report(graph: DependencyGraph, top: int = 10) -> dict:
+    nodes = sorted(graph.nodes(), key=lambda node: node.iterations, reverse=True)
+    return {
+        "total": sum(node.iterations for node in nodes),
+        "most": {node.name: node.iterations for node in nodes[:top]},
+    }
+
+
+def report_run(
+    graph: DependencyGraph, scheduler: TopologicalScheduler, **fields: object
+) -> None:
+    log_event(
+        "run.report",
+        graph=graph.report(),
+        schedule=scheduler.stats(),
+        budget=run_budget().report(),
+        iterations=iteration_report(graph),
+        memory_cache=ContentStore.shared().stats(),
+        **fields,
+    )
+    if (metrics_path := LLMConfig.from_env().metrics_path) is not None:
+        metrics.dump(pathlib.Path(metrics_path))
+
+
+async def fully_describe_item(container: ScopeContainer) -> str:
+    graph: DependencyGraph = DependencyGraph()
+    async with llm_client():
+        await build_dependency_graph(container, graph)
+        scheduler = await resolve_graph(graph, [container])
+    report_run(graph, scheduler)
+    return graph.node(container).description
 
 
 if __name__ == "__main__":
@@ -1,10 +1,14 @@
 import hashlib
 import json
-import pathlib
 
+from automodeldocs.cache_store import ContentStore
+from automodeldocs.config.llm_config import LLMConfig
 from automodeldocs.evaluator.parser import EvaluationResponse
+from automodeldocs.fingerprint import docs_fingerprint, source_fingerprint
 from automodeldocs.structures import Improvement
 
+NAMESPACE = "fan"
+
 
 def try_load_fan_cache(
     function_source: str,
@@ -12,16 +16,27 @@ def try_load_fan_cache(
     function_docs: str | None,
     improvement: Improvement | None = None,
 ) -> tuple[str, EvaluationResponse] | None:
-    fan_cache_location = _fan_cache_location(
-        function_source, function_name, function_docs, improvement
-    )
-    if not (fan_cache_location / "description.txt").exists():
+    store = ContentStore.shared()
+    key = fan_cache_key(function_source, function_name, function_docs, improvement)
+    entry = store.get(NAMESPACE, key)
+    config = LLMConfig.from_env()
+    if entry is None and config.fingerprint_cache_keys and config.legacy_fan_keys:
+        # Written, or migrated, before keys were fingerprinted; each hit is copied
+        # to its fingerprint key. LEGACY_FAN_KEYS=false saves the second read on
+        # every miss once the legacy entries are no longer needed.
+        entry = store.get(
+            NAMESPACE,
+            legacy_fan_cache_key(
+                function_source, function_name, function_docs, improvement
+            ),
+        )
+        if entry is not None:
+            store.put(NAMESPACE, key, entry)
+    if entry is None:
         return None
     return (
-        open(fan_cache_location / "description.txt").read(),
-        EvaluationResponse.from_dict(
-            json.load(open(fan_cache_location / "evaluation_response.json"))
-        ),
+        entry["description"],
+        EvaluationResponse.from_dict(entry["evaluation_response"]),
     )
 
 
@@ -33,29 +48,50 @@ def save_fan_cache(
     description: str,
     evaluation_response: EvaluationResponse,
 ) -> None:
-    fan_cache_location = _fan_cache_location(
-        function_source, function_name, function_docs, improvement
+    ContentStore.shared().put(
+        NAMESPACE,
+        fan_cache_key(function_source, function_name, function_docs, improvement),
+        {
+            "description": description,
+            "evaluation_response": evaluation_response.to_dict(),
+        },
     )
-    fan_cache_location.mkdir(parents=True, exist_ok=True)
-    with open(fan_cache_location / "description.txt", "w") as f:
-        f.write(description)
-    with open(fan_cache_location / "evaluation_response.json", "w") as f:
-        json.dump(evaluation_response.to_dict(), f)
 
 
-def _fan_cache_location(
+def fan_cache_key(
+    function_source: str,
+    function_name: str,
+    function_docs: str | None,
+    improvement: Improvement | None = None,
+) -> str:
+    """
+    Keyed on the source's syntax tree and the docstring's words, so
+    reformatting or re-commenting a function still hits.
+    """
+    if not LLMConfig.from_env().fingerprint_cache_keys:
+        return legacy_fan_cache_key(
+            function_source, function_name, function_docs, improvement
+        )
+    hasher = hashlib.sha256()
+    hasher.update(source_fingerprint(function_source).encode())
+    if function_docs is not None:
+        hasher.update(docs_fingerprint(function_docs).encode())
+    if improvement is not None:
+        hasher.update(json.dumps(improvement.as_dict()).encode("utf-8"))
+    return f"{function_name}/{hasher.hexdigest()}"
+
+
+def legacy_fan_cache_key(
     function_source: str,
     function_name: str,
     function_docs: str | None,
     improvement: Improvement | None = None,
-) -> pathlib.Path:
-    cache_dir = pathlib.Path.home() / ".function_cache"
+) -> str:
+    # The same digest the per-function directories used, so migrated entries hit.
     hasher = hashlib.md5()
     hasher.update(function_source.encode())
     if function_docs is not None:
         hasher.update(function_docs.encode())
     if improvement is not None:
         hasher.update(json.dumps(improvement.as_dict()).encode("utf-8"))
-    function_cache_root = cache_dir / function_name / str(hasher.hexdigest())
-    function_cache_root.mkdir(exist_ok=True, parents=True)
-    return function_cache_root
+    return f"{function_name}/{hasher.hexdigest()}"
@@ -0,0 +1,61 @@
+from __future__ import annotations
+import ast
+import logging
+import textwrap
+from functools import lru_cache
+from hashlib import sha256
+
+from automodeldocs.config.llm_config import LLMConfig
+
+logger = logging.getLogger(__name__)
+
+DOCSTRING_OWNERS = (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)
+
+
+class _NormalizeDocstrings(ast.NodeTransformer):
+    """Collapses whitespace in docstrings, which formatters re-indent and re-wrap."""
+
+    def generic_visit(self, node: ast.AST) -> ast.AST:
+        super().generic_visit(node)
+        if (
+            isinstance(node, DOCSTRING_OWNERS)
+            and node.body
+            and isinstance(node.body[0], ast.Expr)
+            and isinstance(node.body[0].value, ast.Constant)
+            and isinstance(node.body[0].value.value, str)
+        ):
+            node.body[0].value.value = " ".join(node.body[0].value.value.split())
+        return node
+
+
+def canonical_source(source: str) -> str:
+    """
+    The source as its syntax tree, without comments, layout, quoting or
+    indentation, so reformatting or re-commenting code leaves it unchanged.
+    Source that doesn't parse is only stripped of indentation and trailing
+    whitespace.
+    """
+    try:
+        tree = ast.parse(textwrap.dedent(source))
+    except SyntaxError:
+        return "\n".join(line.rstrip() for line in textwrap.dedent(source).splitlines())
+    return ast.dump(_NormalizeDocstrings().visit(tree))
+
+
+@lru_cache(maxsize=4096)
+def source_fingerprint(source: str) -> str:
+    return sha256(canonical_source(source).encode()).hexdigest()
+
+
+def source_key(source: str) -> str:
+    """
+    The digest caches and snapshots key a function's source on: its
+    fingerprint, or a hash of the raw text with FINGERPRINT_CACHE_KEYS=false.
+    """
+    if LLMConfig.from_env().fingerprint_cache_keys:
+        return source_fingerprint(source)
+    return sha256(source.encode()).hexdigest()
+
+
+def docs_fingerprint(docs: str) -> str:
+    return " ".join(docs.split())
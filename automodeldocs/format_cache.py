@@ -1,37 +1,32 @@
 import hashlib
-import json
-import pathlib
 
-from automodeldocs.evaluator.parser import EvaluationResponse
-from automodeldocs.structures import Improvement
+from automodeldocs.cache_store import ContentStore
+
+NAMESPACE = "format"
 
 
 def try_load_formatted_description_cache(
     function_name: str,
     function_description: str,
 ) -> str | None:
-    fn_cache_location = _fn_cache_location(function_name, function_description)
-    if not (fn_cache_location / "description.txt").exists():
-        return None
-    return open(fn_cache_location / "description.txt").read()
+    return ContentStore.shared().get(
+        NAMESPACE, format_cache_key(function_name, function_description)
+    )
 
 
 def save_formatted_description_to_cache(
     function_name: str, function_description: str, formatted_description: str
 ) -> None:
-    fn_cache_location = _fn_cache_location(function_name, function_description)
-    with open(fn_cache_location / "description.txt", "w") as f:
-        f.write(formatted_description)
+    ContentStore.shared().put(
+        NAMESPACE,
+        format_cache_key(function_name, function_description),
+        formatted_description,
+    )
 
 
-def _fn_cache_location(
-    function_name: str,
-    function_description: str,
-) -> pathlib.Path:
-    cache_dir = pathlib.Path.home() / ".function_description_cache"
+def format_cache_key(function_name: str, function_description: str) -> str:
+    # The same digest the per-function directories used, so migrated entries hit.
     hasher = hashlib.md5()
     hasher.update(function_name.encode())
     hasher.update(function_description.encode())
-    function_cache_root = cache_dir / function_name / str(hasher.hexdigest())
-    function_cache_root.mkdir(exist_ok=True, parents=True)
-    return function_cache_root
+    return f"{function_name}/{hasher.hexdigest()}"
@@ -0,0 +1,149 @@
+from __future__ import annotations
+import asyncio
+import logging
+from array import array
+from typing import Awaitable, Callable, Generic, Hashable, Iterable, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+NodeT = TypeVar("NodeT")
+
+
+class DependencyGraph(Generic[NodeT]):
+    """
+    Process-wide registry of description nodes, one per container.
+
+    Every referrer of a container shares the same node, so a helper used by
+    ten functions is described once. Nodes still being built are tracked with
+    a future that later referrers await instead of building their own.
+
+    Containers are interned to integer ids on first sight, and each node's
+    dependencies are held as an array of ids, so traversals never hash
+    containers or nodes.
+    """
+
+    def __init__(self) -> None:
+        self._ids: dict[Hashable, int] = {}
+        self._containers: list[Hashable] = []
+        self._nodes: list[Optional[NodeT]] = []
+        self._edges: list[array] = []
+        self._building: dict[Hashable, asyncio.Future[NodeT]] = {}
+        self._node_count = 0
+        self._edge_count = 0
+
+    def __contains__(self, container: Hashable) -> bool:
+        node_id = self._ids.get(container)
+        return node_id is not None and self._nodes[node_id] is not None
+
+    def __len__(self) -> int:
+        return self._node_count
+
+    def id_of(self, container: Hashable) -> int:
+        node_id = self._ids.get(container)
+        if node_id is None:
+            node_id = self._ids[container] = len(self._containers)
+            self._containers.append(container)
+            self._nodes.append(None)
+            self._edges.append(array("L"))
+        return node_id
+
+    def container_of(self, node_id: int) -> Hashable:
+        return self._containers[node_id]
+
+    async def node_for(
+        self, container: Hashable, build: Callable[[], Awaitable[NodeT]]
+    ) -> tuple[NodeT, bool]:
+        """
+        Return the node for `container`, building it if nobody has yet.
+
+        The flag is True only for the caller whose `build` ran, which is then
+        responsible for expanding the node's dependencies.
+        """
+        if container in self:
+            return self.node(container), False
+        if container in self._building:
+            return await asyncio.shield(self._building[container]), False
+        future: asyncio.Future[NodeT] = asyncio.get_running_loop().create_future()
+        self._building[container] = future
+        try:
+            node = await build()
+        except BaseException as exc:
+            future.set_exception(exc)
+            # Mark the exception as retrieved when no one else is waiting.
+            future.exception()
+            raise
+        finally:
+            del self._building[container]
+        self.update(container, node)
+        future.set_result(node)
+        return node, True
+
+    def node(self, container: Hashable) -> NodeT:
+        node = self._nodes[self._ids[container]]
+        if node is None:
+            raise KeyError(container)
+        return node
+
+    def update(self, container: Hashable, node: NodeT) -> None:
+        """Set the stored node, e.g. when restoring it from a snapshot."""
+        node_id = self.id_of(container)
+        if self._nodes[node_id] is None:
+            self._node_count += 1
+        self._nodes[node_id] = node
+
+    def add_edge(self, container: Hashable, dependency: Hashable) -> None:
+        dependency_id = self.id_of(dependency)
+        edges = self._edges[self.id_of(container)]
+        if dependency_id not in edges:
+            edges.append(dependency_id)
+            self._edge_count += 1
+
+    def dependency_ids(self, node_id: int) -> array:
+        return self._edges[node_id]
+
+    def dependencies(self, container: Hashable) -> list[Hashable]:
+        return [self._containers[i] for i in self._edges[self.id_of(container)]]
+
+    def dependents(self, container: Hashable) -> list[Hashable]:
+        node_id = self.id_of(container)
+        return [
+            self._containers[parent]
+            for parent, edges in enumerate(self._edges)
+            if node_id in edges
+        ]
+
+    def nodes(self) -> list[NodeT]:
+        return [node for node in self._nodes if node is not None]
+
+    def containers(self) -> list[Hashable]:
+        return [
+            container
+            for container, node in zip(self._containers, self._nodes)
+            if node is not None
+        ]
+
+    def transitive_dependents(self, containers: Iterable[Hashable]) -> set[Hashable]:
+        """`containers` plus everything that depends on them, directly or not."""
+        dependents: list[list[int]] = [[] for _ in self._edges]
+        for parent, edges in enumerate(self._edges):
+            for dependency in edges:
+                dependents[dependency].append(parent)
+        affected = {self.id_of(container) for container in containers}
+        stack = list(affected)
+        while stack:
+            for parent in dependents[stack.pop()]:
+                if parent not in affected:
+                    affected.add(parent)
+                    stack.append(parent)
+        return {self._containers[node_id] for node_id in affected}
+
+    @property
+    def node_count(self) -> int:
+        return self._node_count
+
+    @property
+    def edge_count(self) -> int:
+        return self._edge_count
+
+    def report(self) -> dict[str, int]:
+        return {"nodes": self.node_count, "edges": self.edge_count}
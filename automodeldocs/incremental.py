@@ -0,0 +1,206 @@
+from __future__ import annotations
+import argparse
+import ast
+import asyncio
+import logging
+import pathlib
+import re
+import subprocess
+from typing import Hashable, Iterator, Mapping, Optional
+
+from function_discovery import parse_module
+
+from automodeldocs.chat.client import llm_client
+from automodeldocs.checkpoint import node_keys, take_snapshot
+from automodeldocs.explorer import (
+    NodeState,
+    build_dependency_graph,
+    report_run,
+    resolve_graph,
+)
+from automodeldocs.graph import DependencyGraph
+from automodeldocs.metrics import log_event
+from automodeldocs.snapshot import (
+    GraphSnapshot,
+    module_keys,
+    qualified_name,
+    source_digest,
+)
+
+logger = logging.getLogger(__name__)
+
+# Lines touched per file; None means treat the whole file as changed.
+ChangedLines = Mapping[pathlib.Path, Optional[set[int]]]
+
+HUNK_HEADER = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@")
+
+
+def changed_lines_from_diff(
+    diff: str, root: pathlib.Path
+) -> dict[pathlib.Path, set[int]]:
+    """New-side line numbers touched by a unified diff, per file."""
+    changed: dict[pathlib.Path, set[int]] = {}
+    current: Optional[pathlib.Path] = None
+    for line in diff.splitlines():
+        if line.startswith("+++ "):
+            target = line[4:].strip()
+            current = (
+                None if target == "/dev/null" else root / target.removeprefix("b/")
+            )
+            if current is not None:
+                changed.setdefault(current, set())
+        elif current is not None and (match := HUNK_HEADER.match(line)):
+            start, count = int(match.group(1)), int(match.group(2) or 1)
+            # Pure deletions have no new lines; mark the line they were removed before.
+            changed[current].update(range(start, start + max(count, 1)))
+    return changed
+
+
+def git_changed_lines(rev: str, root: pathlib.Path) -> dict[pathlib.Path, set[int]]:
+    diff = subprocess.run(
+        ["git", "diff", "-U0", rev, "--", "*.py"],
+        cwd=root,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return changed_lines_from_diff(diff, root)
+
+
+def _definitions(tree: ast.Module) -> Iterator[tuple[str, int, int]]:
+    def span(node: ast.AST) -> tuple[int, int]:
+        decorators = getattr(node, "decorator_list", [])
+        start = min([node.lineno] + [d.lineno for d in decorators])
+        return start, node.end_lineno or node.lineno
+
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            yield node.name, *span(node)
+        elif isinstance(node, ast.ClassDef):
+            yield node.name, *span(node)
+            for item in node.body:
+                if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    yield f"{node.name}.{item.name}", *span(item)
+
+
+def changed_names(
+    changed: ChangedLines, module_names: Optional[Mapping[pathlib.Path, str]] = None
+) -> set[str]:
+    """
+    Snapshot keys of the definitions on the changed lines, qualified by the
+    module each file was parsed as in `module_names`. Files without a module
+    name give bare names.
+    """
+    names: set[str] = set()
+    for path, lines in changed.items():
+        if path.suffix != ".py" or not path.exists():
+            continue
+        module = (module_names or {}).get(path, "")
+        for name, start, end in _definitions(ast.parse(path.read_text())):
+            if lines is None or any(start <= line <= end for line in lines):
+                names.add(qualified_name(module, name))
+    return names
+
+
+def restore_from_snapshot(
+    graph: DependencyGraph,
+    snapshot: GraphSnapshot,
+    changed: set[str],
+    keys: Optional[Mapping[Hashable, str]] = None,
+) -> set:
+    """
+    Marks every node whose source is unchanged since `snapshot` as resolved with
+    its stored description, except for changed nodes and everything depending on
+    them. Returns the containers that still need describing.
+    """
+    keys = node_keys(graph, keys)
+    stale = set()
+    for container in graph.containers():
+        key = keys[container]
+        stored = snapshot.reusable(key, source_digest(container.source()))
+        if key in changed or stored is None or stored.state != "resolved":
+            stale.add(container)
+    affected = graph.transitive_dependents(stale)
+    for container in graph.containers():
+        if container in affected:
+            continue
+        node = graph.node(container)
+        stored = snapshot.nodes[keys[container]]
+        node.description = stored.description
+        node.feedback = stored.feedback
+        node.state = NodeState.RESOLVED
+    log_event(
+        "incremental.plan",
+        changed=sorted(keys[container] for container in stale),
+        affected=len(affected),
+        reused=graph.node_count - len(affected),
+    )
+    return affected
+
+
+async def describe_incrementally(
+    container,
+    snapshot_path: pathlib.Path,
+    changed: Optional[ChangedLines] = None,
+    module_names: Optional[Mapping[pathlib.Path, str]] = None,
+    keys: Optional[Mapping[Hashable, str]] = None,
+) -> str:
+    """
+    Describes `container`, reusing every description in the snapshot at
+    `snapshot_path` that is unaffected by `changed` or by source edits, then
+    writes the updated snapshot back. Without a snapshot this is a full run.
+    `module_names` maps changed files to the module names they were parsed as,
+    and `keys` are the snapshot keys `module_keys` gives for those modules.
+    """
+    snapshot = GraphSnapshot.load(snapshot_path)
+    graph: DependencyGraph = DependencyGraph()
+    affected = None
+    async with llm_client():
+        # Rebuilding the graph is served from the fan cache for unchanged nodes.
+        await build_dependency_graph(container, graph)
+        if snapshot is not None:
+            affected = restore_from_snapshot(
+                graph, snapshot, changed_names(changed or {}, module_names), keys
+            )
+        scheduler = await resolve_graph(graph, [container])
+    take_snapshot(graph, keys).save(snapshot_path)
+    report_run(
+        graph,
+        scheduler,
+        incremental={
+            "affected": graph.node_count if affected is None else len(affected)
+        },
+    )
+    return graph.node(container).description
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Re-describe only what changed since the last snapshot."
+    )
+    parser.add_argument("source", type=pathlib.Path)
+    parser.add_argument("name")
+    parser.add_argument("--module-name")
+    parser.add_argument("--snapshot", type=pathlib.Path, required=True)
+    parser.add_argument("--changed", type=pathlib.Path, nargs="*", default=[])
+    parser.add_argument("--git-diff", metavar="REV")
+    parser.add_argument("--repo", type=pathlib.Path, default=pathlib.Path("."))
+    args = parser.parse_args()
+    changed_lines: dict[pathlib.Path, Optional[set[int]]] = {
+        path.resolve(): None for path in args.changed
+    }
+    if args.git_diff is not None:
+        changed_lines.update(git_changed_lines(args.git_diff, args.repo.resolve()))
+    module_name = args.module_name or args.source.stem
+    module = parse_module(args.source, module_name=module_name, starting_path=None)
+    print(
+        asyncio.run(
+            describe_incrementally(
+                module.resolve_name(args.name).origin,
+                args.snapshot,
+                changed_lines,
+                {args.source.resolve(): module_name},
+                module_keys(module, module_name, args.source.read_text()),
+            )
+        )
+    )
@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import bisect
+import json
+import logging
+import pathlib
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+LabelKey = tuple[tuple[str, str], ...]
+
+DEFAULT_BUCKETS: tuple[float, ...] = (
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+    300.0,
+)
+
+
+def _label_key(labels: dict[str, object]) -> LabelKey:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(label_key: LabelKey, extra: Optional[dict[str, str]] = None) -> str:
+    items = list(label_key) + list((extra or {}).items())
+    if len(items) == 0:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in items) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, description: str) -> None:
+        self.name = name
+        self.description = description
+        self.values: dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels: object) -> None:
+        key = _label_key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels: object) -> float:
+        return self.values.get(_label_key(labels), 0)
+
+    def snapshot(self) -> list[dict]:
+        return [
+            {"labels": dict(key), "value": value} for key, value in self.values.items()
+        ]
+
+    def prometheus_lines(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(key)} {value}"
+            for key, value in self.values.items()
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels: object) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: object) -> None:
+        self.values[_label_key(labels)] = value
+
+    @contextmanager
+    def track(self, **labels: object) -> Iterator[None]:
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, description: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS
+    ) -> None:
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        # Per label set: bucket counts (last bucket is +Inf), sum, count
+        self.values: dict[LabelKey, tuple[list[int], float, int]] = {}
+
+    def observe(self, value: float, **labels: object) -> None:
+        key = _label_key(labels)
+        counts, total, count = self.values.get(
+            key, ([0] * (len(self.buckets) + 1), 0.0, 0)
+        )
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.values[key] = (counts, total + value, count + 1)
+
+    @contextmanager
+    def time(self, **labels: object) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self) -> list[dict]:
+        return [
+            {
+                "labels": dict(key),
+                "buckets": dict(zip([str(b) for b in self.buckets] + ["+Inf"], counts)),
+                "sum": total,
+                "count": count,
+            }
+            for key, (counts, total, count) in self.values.items()
+        ]
+
+    def prometheus_lines(self) -> list[str]:
+        lines = []
+        for key, (counts, total, count) in self.values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(
+                [str(b) for b in self.buckets] + ["+Inf"], counts
+            ):
+                cumulative += bucket_count
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(key, {'le': bound})} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, Counter | Gauge | Histogram] = {}
+
+    def _register(self, metric: Counter | Gauge | Histogram):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, description: str) -> Counter:
+        return self._register(Counter(name, description))
+
+    def gauge(self, name: str, description: str) -> Gauge:
+        return self._register(Gauge(name, description))
+
+    def histogram(
+        self, name: str, description: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, description, buckets))
+
+    def snapshot(self) -> dict:
+        return {
+            name: {
+                "type": metric.kind,
+                "description": metric.description,
+                "values": metric.snapshot(),
+            }
+            for name, metric in self._metrics.items()
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self) -> str:
+        lines = []
+        for name, metric in self._metrics.items():
+            lines.append(f"# HELP {name} {metric.description}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.prometheus_lines())
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: pathlib.Path) -> None:
+        path.write_text(
+            self.to_prometheus() if path.suffix == ".prom" else self.to_json()
+        )
+
+
+def log_event(event: str, level: int = logging.INFO, **fields: object) -> None:
+    logger.log(
+        level,
+        json.dumps({"event": event, **fields}, default=str),
+        extra={"event": event, "fields": fields},
+    )
+
+
+metrics = MetricsRegistry()
+
+LLM_REQUEST_SECONDS = metrics.histogram(
+    "llm_request_seconds", "Latency of LLM requests by pipeline stage and model"
+)
+LLM_PROMPT_TOKENS = metrics.counter(
+    "llm_prompt_tokens_total", "Prompt tokens sent by pipeline stage and model"
+)
+LLM_COMPLETION_TOKENS = metrics.counter(
+    "llm_completion_tokens_total",
+    "Completion tokens received by pipeline stage and model",
+)
+LLM_RETRIES = metrics.counter(
+    "llm_retries_total", "Retried LLM requests by pipeline stage"
+)
+LLM_IN_FLIGHT = metrics.gauge(
+    "llm_requests_in_flight", "LLM requests currently awaiting a reply"
+)
+CACHE_LOOKUPS = metrics.counter(
+    "cache_lookups_total", "Cache lookups by cache and result (hit or miss)"
+)
+STAGE_SECONDS = metrics.histogram(
+    "pipeline_stage_seconds", "Wall time of description pipeline stages"
+)
+SINGLE_FLIGHT_REQUESTS = metrics.counter(
+    "single_flight_requests_total", "Requests issued or coalesced by single-flight"
+)
+PROMPT_COMPACTIONS = metrics.counter(
+    "prompt_compactions_total",
+    "Prompt compaction steps applied to fit the context window",
+)
+PROMPTS_REJECTED = metrics.counter(
+    "prompts_rejected_total",
+    "Prompts refused before sending as they exceed the context window",
+)
+PACKED_ITEMS = metrics.counter(
+    "packed_items_total",
+    "Small functions described in a packed request, by result (packed or fallback)",
+)
+BEAM_CANDIDATES = metrics.counter(
+    "beam_candidates_total",
+    "Beam candidates written, or skipped by adaptive width or convergence",
+)
+DESCRIPTION_ITERATIONS = metrics.histogram(
+    "description_iterations",
+    "Improvement passes a node took before resolving, by stop reason",
+    buckets=(0, 1, 2, 3, 5, 8),
+)
+MEMORY_CACHE_EVENTS = metrics.counter(
+    "memory_cache_events_total",
+    "In-memory cache tier lookups and evictions, by namespace and event",
+)
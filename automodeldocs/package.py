@@ -0,0 +1,166 @@
+from __future__ import annotations
+import argparse
+import ast
+import asyncio
+import json
+import logging
+import pathlib
+from contextlib import AsyncExitStack
+from typing import Hashable, Iterator, Optional
+
+from function_discovery import parse_module
+from function_discovery.structure import ClassContainer, FunctionContainer
+
+from automodeldocs.chat.client import llm_client
+from automodeldocs.checkpoint import Checkpointer, resume_from_checkpoint
+from automodeldocs.config.llm_config import LLMConfig
+from automodeldocs.explorer import build_dependency_graph, report_run, resolve_graph
+from automodeldocs.graph import DependencyGraph
+from automodeldocs.metrics import log_event
+from automodeldocs.snapshot import module_keys
+
+logger = logging.getLogger(__name__)
+
+
+def public_names(source: str) -> list[str]:
+    """
+    Names a module exports - `__all__` when it is a literal list or tuple,
+    otherwise every top-level function and class not starting with `_`.
+    """
+    tree = ast.parse(source)
+    for node in tree.body:
+        if (
+            isinstance(node, ast.Assign)
+            and any(
+                isinstance(target, ast.Name) and target.id == "__all__"
+                for target in node.targets
+            )
+            and isinstance(node.value, (ast.List, ast.Tuple))
+        ):
+            return [
+                element.value
+                for element in node.value.elts
+                if isinstance(element, ast.Constant) and isinstance(element.value, str)
+            ]
+    return [
+        node.name
+        for node in tree.body
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))
+        and not node.name.startswith("_")
+    ]
+
+
+def package_modules(
+    root: pathlib.Path, package_name: Optional[str] = None
+) -> Iterator[tuple[pathlib.Path, str]]:
+    """Yields (path, module name) for every public module under `root`."""
+    package_name = package_name or root.stem
+    if root.is_file():
+        yield root, package_name
+        return
+    for path in sorted(root.rglob("*.py")):
+        parts = path.relative_to(root).with_suffix("").parts
+        if any(part.startswith("_") and part != "__init__" for part in parts):
+            continue
+        if parts[-1] == "__init__":
+            parts = parts[:-1]
+        yield path, ".".join((package_name,) + parts)
+
+
+def parse_package(
+    root: pathlib.Path, package_name: Optional[str] = None
+) -> tuple[dict[str, FunctionContainer | ClassContainer], dict[Hashable, str]]:
+    """
+    The package's targets, by dotted name, and the snapshot keys of everything
+    its modules define.
+    """
+    targets: dict[str, FunctionContainer | ClassContainer] = {}
+    keys: dict[Hashable, str] = {}
+    seen: set[FunctionContainer | ClassContainer] = set()
+    for path, module_name in package_modules(root, package_name):
+        module = parse_module(path, module_name=module_name, starting_path=None)
+        keys.update(module_keys(module, module_name, path.read_text()))
+        for name in public_names(path.read_text()):
+            resolved = module.resolve_name(name)
+            if resolved is None:
+                logger.warning(f"Couldn't resolve {module_name}.{name}")
+                continue
+            # Re-exports resolve to the same container; describe it once.
+            if (
+                isinstance(resolved.origin, (FunctionContainer, ClassContainer))
+                and resolved.origin not in seen
+            ):
+                seen.add(resolved.origin)
+                targets[f"{module_name}.{name}"] = resolved.origin
+    return targets, keys
+
+
+async def fully_describe_package(
+    root: pathlib.Path,
+    package_name: Optional[str] = None,
+    checkpoint_path: Optional[pathlib.Path] = None,
+    resume: bool = False,
+) -> dict[str, str]:
+    """
+    Describes every public function and class under `root` in one run. All
+    targets share one dependency graph, so a dependency used across the
+    package is described once. With `checkpoint_path` the graph is saved as
+    the run goes, and `resume` continues from the last save.
+    """
+    targets, keys = parse_package(root, package_name)
+    log_event("package.start", root=str(root), targets=len(targets))
+    graph: DependencyGraph = DependencyGraph()
+    build_semaphore = asyncio.Semaphore(LLMConfig.from_env().describe_concurrency)
+    built = 0
+
+    async def build(container: FunctionContainer | ClassContainer) -> None:
+        nonlocal built
+        async with build_semaphore:
+            await build_dependency_graph(container, graph)
+        built += 1
+        log_event("package.graph_progress", built=built, total=len(targets))
+
+    def progress(done: int, total: int) -> None:
+        if done % 25 == 0 or done == total:
+            log_event("package.describe_progress", done=done, total=total)
+
+    async with llm_client():
+        await asyncio.gather(*[build(container) for container in targets.values()])
+        async with AsyncExitStack() as stack:
+            if checkpoint_path is not None:
+                if resume:
+                    resume_from_checkpoint(graph, checkpoint_path, keys)
+                await stack.enter_async_context(
+                    Checkpointer(
+                        graph,
+                        checkpoint_path,
+                        LLMConfig.from_env().checkpoint_interval,
+                        keys,
+                    )
+                )
+            scheduler = await resolve_graph(graph, list(targets.values()), progress)
+    report_run(graph, scheduler, package={"root": str(root), "targets": len(targets)})
+    return {
+        name: graph.node(container).description for name, container in targets.items()
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Describe every public function and class in a package."
+    )
+    parser.add_argument("root", type=pathlib.Path)
+    parser.add_argument("--package-name")
+    parser.add_argument("--output", type=pathlib.Path, required=True)
+    parser.add_argument("--checkpoint", type=pathlib.Path)
+    parser.add_argument(
+        "--resume", action="store_true", help="Continue from --checkpoint"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    descriptions = asyncio.run(
+        fully_describe_package(
+            args.root, args.package_name, args.checkpoint, args.resume
+        )
+    )
+    args.output.write_text(json.dumps(descriptions, indent=2))
@@ -0,0 +1,233 @@
+from __future__ import annotations
+import asyncio
+import json
+import logging
+import re
+from dataclasses import dataclass
+from json import JSONDecodeError
+from typing import Awaitable, Callable, Optional
+
+from automodeldocs.chat.send_message import chat_completion_request
+from automodeldocs.context_guard import ContextWindowExceededError
+from automodeldocs.describe.packed_prompt import (
+    PackedDescribeFunctions,
+    PackedScratchPrompt,
+)
+from automodeldocs.evaluator.parser import EvaluationResponse
+from automodeldocs.evaluator.prompt import PackedEvaluator
+from automodeldocs.fan_cache import save_fan_cache
+from automodeldocs.metrics import PACKED_ITEMS, log_event
+from automodeldocs.structures import message_from_system_str, message_from_user_str
+from automodeldocs.writer import format_description
+
+logger = logging.getLogger(__name__)
+
+ITEM_HEADING = re.compile(r"^#+\s*Item\s+(\d+)\b[^\n]*$", re.MULTILINE)
+
+
+class PackingError(Exception):
+    """A packed response could not be split back into one result per item."""
+
+
+@dataclass(frozen=True)
+class PackedItem:
+    function_source: str
+    function_name: str
+    function_docs: Optional[str]
+
+
+def split_packed_sections(content: str, n_items: int) -> list[str]:
+    matches = list(ITEM_HEADING.finditer(content))
+    sections: dict[int, str] = {}
+    for match, next_match in zip(matches, matches[1:] + [None]):
+        end = next_match.start() if next_match is not None else len(content)
+        sections[int(match.group(1))] = content[match.end() : end].strip()
+    if sorted(sections) != list(range(n_items)) or not all(sections.values()):
+        raise PackingError(
+            f"Expected sections for items 0-{n_items - 1}, got {sorted(sections)}"
+        )
+    return [sections[idx] for idx in range(n_items)]
+
+
+def parse_packed_evaluations(
+    content: str, n_documents: list[int]
+) -> list[EvaluationResponse]:
+    try:
+        entries = json.loads(content.replace("\n", "").replace(r"\'", r"\\'"))["items"]
+        evaluations = {
+            int(entry["item"]): EvaluationResponse.from_json(entry) for entry in entries
+        }
+    except (JSONDecodeError, KeyError, TypeError, ValueError) as e:
+        raise PackingError(f"Couldn't parse packed evaluation - {e!r}") from e
+    if sorted(evaluations) != list(range(len(n_documents))):
+        raise PackingError(f"Expected evaluations for {len(n_documents)} items")
+    for idx, documents in enumerate(n_documents):
+        if not 0 <= evaluations[idx].documentation_idx < documents:
+            raise PackingError(f"Item {idx} picked a document that doesn't exist")
+    return [evaluations[idx] for idx in range(len(n_documents))]
+
+
+async def _packed_request(prompt, n_items: int, stage: str, **kwargs) -> list[str]:
+    response = await chat_completion_request(
+        [
+            message_from_system_str(prompt.system_message()),
+            message_from_user_str(prompt.user_message()),
+        ],
+        stage=stage,
+        **kwargs,
+    )
+    return split_packed_sections(response.item[-1].content, n_items)
+
+
+async def write_packed_descriptions(items: list[PackedItem]) -> list[str]:
+    names = [item.function_name for item in items]
+    sources = [item.function_source for item in items]
+    scratches = await _packed_request(
+        PackedScratchPrompt(names, sources),
+        len(items),
+        stage="packed_scratch",
+        model="gpt-3.5-turbo-16k",
+        use_cache=False,
+    )
+    return await _packed_request(
+        PackedDescribeFunctions(names, scratches, sources),
+        len(items),
+        stage="packed_description",
+        model="gpt-3.5-turbo-16k",
+        use_cache=False,
+    )
+
+
+async def describe_packed(
+    items: list[PackedItem], beam_width: int
+) -> list[tuple[str, EvaluationResponse]]:
+    """
+    Runs the scratch, description and evaluation stages once for all `items`,
+    rather than once per item, and splits the replies back per item.
+    """
+    beams = await asyncio.gather(
+        *[write_packed_descriptions(items) for _ in range(beam_width)]
+    )
+    candidates = [
+        [beam[idx] for beam in beams]
+        + ([item.function_docs] if item.function_docs is not None else [])
+        for idx, item in enumerate(items)
+    ]
+    evaluator = PackedEvaluator([item.function_name for item in items], candidates)
+    response = await chat_completion_request(
+        [
+            message_from_system_str(evaluator.system_message()),
+            message_from_user_str(evaluator.user_message()),
+        ],
+        stage="packed_evaluation",
+    )
+    evaluations = parse_packed_evaluations(
+        response.item[-1].content, [len(documents) for documents in candidates]
+    )
+    results = []
+    for item, documents, evaluation_response in zip(items, candidates, evaluations):
+        best_description = await format_description(
+            item.function_name, documents[evaluation_response.documentation_idx]
+        )
+        save_fan_cache(
+            function_source=item.function_source,
+            function_name=item.function_name,
+            function_docs=item.function_docs,
+            improvement=None,
+            description=best_description,
+            evaluation_response=evaluation_response,
+        )
+        results.append((best_description, evaluation_response))
+    return results
+
+
+@dataclass
+class _PendingItem:
+    item: PackedItem
+    future: asyncio.Future[tuple[str, EvaluationResponse]]
+
+
+class FunctionPacker:
+    """
+    Collects small functions that arrive within `collect_window` seconds of each
+    other and describes up to `max_items` of them per packed request. Any pack
+    whose reply can't be split back per item is retried one item at a time
+    through `describe_single`.
+    """
+
+    def __init__(
+        self,
+        describe_single: Callable[
+            [PackedItem], Awaitable[tuple[str, EvaluationResponse]]
+        ],
+        beam_width: Callable[[list[PackedItem]], int],
+        max_items: int = 8,
+        collect_window: float = 0.05,
+    ) -> None:
+        self.describe_single = describe_single
+        self.beam_width = beam_width
+        self.max_items = max_items
+        self.collect_window = collect_window
+        self._pending: list[_PendingItem] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._running_packs: set[asyncio.Task] = set()
+
+    async def describe(self, item: PackedItem) -> tuple[str, EvaluationResponse]:
+        future: asyncio.Future[tuple[str, EvaluationResponse]] = (
+            asyncio.get_running_loop().create_future()
+        )
+        self._pending.append(_PendingItem(item, future))
+        if len(self._pending) >= self.max_items:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(
+                self.collect_window, self._flush
+            )
+        return await future
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending = self._pending, []
+        if len(pending) == 0:
+            return
+        pack = asyncio.create_task(self._run_pack(pending))
+        self._running_packs.add(pack)
+        pack.add_done_callback(self._running_packs.discard)
+
+    async def _run_pack(self, pending: list[_PendingItem]) -> None:
+        items = [p.item for p in pending]
+        try:
+            if len(items) == 1:
+                results = [await self.describe_single(items[0])]
+            else:
+                results = await self._describe_pack(items)
+        except Exception as e:
+            for p in pending:
+                if not p.future.done():
+                    p.future.set_exception(e)
+            return
+        for p, result in zip(pending, results):
+            # Skips items whose caller was cancelled.
+            if not p.future.done():
+                p.future.set_result(result)
+
+    async def _describe_pack(
+        self, items: list[PackedItem]
+    ) -> list[tuple[str, EvaluationResponse]]:
+        try:
+            results = await describe_packed(items, self.beam_width(items))
+        except (PackingError, ContextWindowExceededError) as e:
+            log_event(
+                "packing.fallback",
+                level=logging.WARNING,
+                items=[item.function_name for item in items],
+                error=str(e),
+            )
+            PACKED_ITEMS.inc(len(items), result="fallback")
+            return list(
+                await asyncio.gather(*[self.describe_single(item) for item in items])
+            )
+        PACKED_ITEMS.inc(len(items), result="packed")
+        return results
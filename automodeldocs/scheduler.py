@@ -0,0 +1,156 @@
+from __future__ import annotations
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Hashable, Iterable, Optional
+
+from automodeldocs.graph import DependencyGraph
+
+logger = logging.getLogger(__name__)
+
+DescribeFn = Callable[[Hashable], Awaitable[bool]]
+
+
+class TopologicalScheduler:
+    """
+    Describe every node reachable from a set of targets, dependencies first.
+
+    Nodes whose dependencies are all done form the ready set and are described
+    in parallel, up to `concurrency` at a time. When a node finishes, each
+    dependent's count of unfinished dependencies drops; those reaching zero
+    become ready. `describe` returns False when the node needs another pass,
+    typically because it added new dependencies to the graph; those are picked
+    up and the node waits for them. Cycles are broken by describing the stalled
+    node with the fewest unfinished dependencies.
+
+    `progress`, if given, is called with the done and known node counts each
+    time a node finishes.
+    """
+
+    def __init__(
+        self,
+        graph: DependencyGraph,
+        describe: DescribeFn,
+        concurrency: int,
+        is_done: Callable[[Hashable], bool] = lambda container: False,
+        progress: Optional[Callable[[int, int], None]] = None,
+    ) -> None:
+        self.graph = graph
+        self.describe = describe
+        self.concurrency = max(1, concurrency)
+        self.is_done = is_done
+        self.progress = progress
+        # Bookkeeping is by graph node id, so it never hashes containers.
+        self._remaining: dict[int, int] = {}
+        self._dependents: dict[int, set[int]] = {}
+        self._done: set[int] = set()
+        self._running: dict[asyncio.Task[bool], int] = {}
+        self._active: set[int] = set()
+        self._ready: deque[int] = deque()
+        self.described = 0
+        self.cycles_broken = 0
+        self.max_parallel = 0
+
+    def _is_done(self, node_id: int) -> bool:
+        if node_id in self._done:
+            return True
+        if node_id not in self._remaining and self.is_done(
+            self.graph.container_of(node_id)
+        ):
+            self._done.add(node_id)
+            return True
+        return False
+
+    def _unfinished_dependencies(self, node_id: int) -> list[int]:
+        return [
+            dependency
+            for dependency in self.graph.dependency_ids(node_id)
+            if dependency != node_id and not self._is_done(dependency)
+        ]
+
+    def _discover(self, roots: Iterable[int]) -> None:
+        """Register every not-yet-known node reachable from `roots`."""
+        stack = list(roots)
+        while stack:
+            node_id = stack.pop()
+            if node_id in self._remaining or self._is_done(node_id):
+                continue
+            dependencies = self._unfinished_dependencies(node_id)
+            self._remaining[node_id] = len(dependencies)
+            for dependency in dependencies:
+                self._dependents.setdefault(dependency, set()).add(node_id)
+            if len(dependencies) == 0:
+                self._ready.append(node_id)
+            stack.extend(dependencies)
+
+    def _requeue(self, node_id: int) -> None:
+        """Re-count a node that needs another pass once its new inputs are done."""
+        self._discover(self._unfinished_dependencies(node_id))
+        dependencies = self._unfinished_dependencies(node_id)
+        for dependency in dependencies:
+            self._dependents.setdefault(dependency, set()).add(node_id)
+        self._remaining[node_id] = len(dependencies)
+        if len(dependencies) == 0:
+            self._ready.append(node_id)
+
+    def _finish(self, node_id: int) -> None:
+        del self._remaining[node_id]
+        self._done.add(node_id)
+        if self.progress is not None:
+            self.progress(len(self._done), len(self._done) + len(self._remaining))
+        for dependent in self._dependents.pop(node_id, ()):
+            # Running nodes are re-counted when they finish.
+            if dependent not in self._remaining or dependent in self._active:
+                continue
+            self._remaining[dependent] -= 1
+            if self._remaining[dependent] == 0:
+                self._ready.append(dependent)
+
+    def _break_cycle(self) -> None:
+        ready = set(self._ready)
+        stalled = [
+            node_id
+            for node_id in self._remaining
+            if node_id not in self._active and node_id not in ready
+        ]
+        node_id = min(stalled, key=lambda i: self._remaining[i])
+        logger.debug(f"Breaking dependency cycle at {self.graph.container_of(node_id)}")
+        self.cycles_broken += 1
+        self._ready.append(node_id)
+
+    async def run(self, targets: Iterable[Hashable]) -> None:
+        self._discover(self.graph.id_of(target) for target in targets)
+        try:
+            while self._remaining:
+                while self._ready and len(self._running) < self.concurrency:
+                    node_id = self._ready.popleft()
+                    self._active.add(node_id)
+                    task = asyncio.create_task(
+                        self.describe(self.graph.container_of(node_id))
+                    )
+                    self._running[task] = node_id
+                self.max_parallel = max(self.max_parallel, len(self._running))
+                if not self._running:
+                    self._break_cycle()
+                    continue
+                finished, _ = await asyncio.wait(
+                    self._running, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in finished:
+                    node_id = self._running.pop(task)
+                    self._active.discard(node_id)
+                    self.described += 1
+                    if task.result():
+                        self._finish(node_id)
+                    else:
+                        self._requeue(node_id)
+        finally:
+            for task in self._running:
+                task.cancel()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "described": self.described,
+            "cycles_broken": self.cycles_broken,
+            "max_parallel": self.max_parallel,
+        }
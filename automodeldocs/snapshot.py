@@ -0,0 +1,124 @@
+from __future__ import annotations
+import ast
+import dataclasses
+import json
+import logging
+import os
+import pathlib
+from dataclasses import dataclass, field
+from typing import Hashable
+
+from function_discovery.structure import ClassContainer
+
+from automodeldocs.fingerprint import source_key
+
+logger = logging.getLogger(__name__)
+
+# 2: digests are source fingerprints rather than hashes of the raw text.
+# 3: nodes are keyed on their module-qualified name.
+# 4: keys are the module and qualname a container is defined under.
+SNAPSHOT_VERSION = 4
+
+
+def source_digest(source: str) -> str:
+    # Fingerprinted, so reformatting a function doesn't make it stale.
+    return source_key(source)
+
+
+def qualified_name(module: str, name: str) -> str:
+    """`module:qualname`, so same-named helpers in different modules stay apart."""
+    return f"{module}:{name}" if module else name
+
+
+def module_keys(module, module_name: str, source: str) -> dict[Hashable, str]:
+    """
+    Snapshot keys for the functions, classes and methods `source` defines,
+    looked up in `module` - its parse as `module_name` - so they are the
+    containers the dependency graph holds.
+    """
+    keys: dict[Hashable, str] = {}
+    for node in ast.parse(source).body:
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+        resolved = module.resolve_name(node.name)
+        if resolved is None:
+            continue
+        keys[resolved.origin] = qualified_name(module_name, node.name)
+        if isinstance(resolved.origin, ClassContainer):
+            for method in resolved.origin.functions:
+                keys[method] = qualified_name(module_name, f"{node.name}.{method.name}")
+    return keys
+
+
+@dataclass
+class NodeSnapshot:
+    name: str
+    digest: str
+    state: str
+    description: str
+    feedback: str
+    dependencies: list[str] = field(default_factory=list)
+    iterations: int = 0
+    # `module:qualname`, or the qualname alone when the module isn't known.
+    key: str = ""
+
+    def __post_init__(self) -> None:
+        if len(self.key) == 0:
+            self.key = self.name
+
+
+@dataclass
+class GraphSnapshot:
+    """
+    The description graph of a run, keyed by module-qualified node name and
+    persisted between runs. Dependencies are listed by the same keys.
+    A node is only reusable while its source digest still matches.
+    """
+
+    nodes: dict[str, NodeSnapshot] = field(default_factory=dict)
+
+    def add(self, node: NodeSnapshot) -> None:
+        self.nodes[node.key] = node
+
+    def reusable(self, key: str, digest: str) -> NodeSnapshot | None:
+        node = self.nodes.get(key)
+        if node is None or node.digest != digest:
+            return None
+        return node
+
+    def dependents(self) -> dict[str, set[str]]:
+        dependents: dict[str, set[str]] = {}
+        for node in self.nodes.values():
+            for dependency in node.dependencies:
+                dependents.setdefault(dependency, set()).add(node.key)
+        return dependents
+
+    def to_dict(self) -> dict:
+        return {
+            "version": SNAPSHOT_VERSION,
+            "nodes": [dataclasses.asdict(node) for node in self.nodes.values()],
+        }
+
+    @classmethod
+    def from_dict(cls, item: dict) -> GraphSnapshot:
+        if item.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version {item.get('version')}")
+        nodes = [NodeSnapshot(**node) for node in item["nodes"]]
+        return cls({node.key: node for node in nodes})
+
+    def save(self, path: pathlib.Path) -> None:
+        # Written to a temporary file first so a crash never leaves half a snapshot.
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        tmp_path.write_text(json.dumps(self.to_dict()))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: pathlib.Path) -> GraphSnapshot | None:
+        if not path.exists():
+            return None
+        try:
+            return cls.from_dict(json.loads(path.read_text()))
+        except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable graph snapshot {path} - {e!r}")
+            return None
@@ -1,13 +1,25 @@
+import asyncio
+from collections.abc import AsyncIterator
 from typing import Optional, Coroutine, Any
 
-from automodeldocs.chat.send_message import chat_completion_request, CacheStatus
+from automodeldocs.chat.send_message import (
+    chat_completion_request,
+    chat_completion_stream,
+    CacheStatus,
+)
+from automodeldocs.context_guard import DOCUMENT_TRUNCATION_MARKER, compact_prompt
+from automodeldocs.definitions import OpenAIInputMessage
 from automodeldocs.describe.formatter import FormatResponsePrompt
 from automodeldocs.describe.function_report_prompt import DescribeFunction
-from automodeldocs.describe.function_scratch_prompt import ScratchFunctionPrompt
+from automodeldocs.describe.function_scratch_prompt import (
+    SCRATCH_END,
+    ScratchFunctionPrompt,
+)
 from automodeldocs.format_cache import (
     try_load_formatted_description_cache,
     save_formatted_description_to_cache,
 )
+from automodeldocs.metrics import CACHE_LOOKUPS
 from automodeldocs.response.formatted import FormattedOpenAIResponse
 from automodeldocs.structures import (
     Improvement,
@@ -15,11 +27,50 @@ from automodeldocs.structures import (
     message_from_user_str,
 )
 
+# Streams left running after their section was read, kept until they finish caching.
+_draining_streams: set[asyncio.Task] = set()
+
 
 async def raw_llm_to_string(
-    raw_response: Coroutine[Any, Any, CacheStatus[list[FormattedOpenAIResponse]]],
+    raw_response: (
+        Coroutine[Any, Any, CacheStatus[list[FormattedOpenAIResponse]]]
+        | AsyncIterator[str]
+    ),
+) -> str:
+    if isinstance(raw_response, AsyncIterator):
+        content = "".join([delta async for delta in raw_response])
+    else:
+        content = (await raw_response).item[-1].content
+    return content.replace("# Report\n", "")
+
+
+async def read_section(
+    stream: AsyncIterator[str], heading: str, next_heading: str
 ) -> str:
-    return (await raw_response).item[-1].content.replace("# Report\n", "")
+    """
+    Reads `stream` until the section under `heading` is complete, i.e. `next_heading`
+    starts or the stream ends. Only the heading the prompt asks for ends the section, as
+    notes on Python code often contain `# comment` lines. The rest of the stream is
+    drained in the background so the full completion still reaches the cache.
+    """
+    content = ""
+    async for delta in stream:
+        content += delta
+        section_start = content.find(heading)
+        if section_start == -1:
+            continue
+        section_end = content.find(f"\n{next_heading}", section_start + len(heading))
+        if section_end != -1:
+            drain = asyncio.create_task(_drain(stream))
+            _draining_streams.add(drain)
+            drain.add_done_callback(_draining_streams.discard)
+            return content[:section_end]
+    return content
+
+
+async def _drain(stream: AsyncIterator[str]) -> None:
+    async for _ in stream:
+        pass
 
 
 async def write_description(
@@ -28,21 +79,32 @@ async def write_description(
     scratch: str,
     improvement: Optional[Improvement] = None,
 ) -> str:
-    description_prompt = DescribeFunction(
-        function_name=function_name,
-        scratch=scratch,
-        context=improvement.context if improvement is not None else None,
-        code_source=function_source,
-    )
+    def build_messages(
+        source: str, improvement: Optional[Improvement]
+    ) -> list[OpenAIInputMessage]:
+        description_prompt = DescribeFunction(
+            function_name=function_name,
+            scratch=scratch,
+            context=improvement.context if improvement is not None else None,
+            code_source=source,
+        )
+        return [
+            message_from_system_str(description_prompt.system_message()),
+            message_from_user_str(description_prompt.user_message()),
+        ] + description_prompt.evaluation_messages(improvement)
+
     written_description = await raw_llm_to_string(
-        chat_completion_request(
-            [
-                message_from_system_str(description_prompt.system_message()),
-                message_from_user_str(description_prompt.user_message()),
-            ]
-            + description_prompt.evaluation_messages(improvement),
+        chat_completion_stream(
+            compact_prompt(
+                build_messages,
+                function_source,
+                improvement,
+                model="gpt-3.5-turbo-16k",
+                stage="description",
+            ),
             model="gpt-3.5-turbo-16k",
             use_cache=False,
+            stage="description",
         )
     )
     return written_description
@@ -53,17 +115,33 @@ async def format_description(function_name: str, function_description: str) -> s
         function_name, function_description
     )
     if cached_formatted_description is not None:
+        CACHE_LOOKUPS.inc(cache="format", result="hit")
         return cached_formatted_description
-    prompt = FormatResponsePrompt(function_name, function_description)
+    CACHE_LOOKUPS.inc(cache="format", result="miss")
+
+    def build_messages(
+        description: str, improvement: Optional[Improvement]
+    ) -> list[OpenAIInputMessage]:
+        prompt = FormatResponsePrompt(function_name, description)
+        return [
+            message_from_system_str(prompt.system_message()),
+            message_from_user_str(prompt.user_message()),
+        ]
+
     # We cache at this stage regardless, but it's helpful to cache the description in a readable way
     formatted_description = await raw_llm_to_string(
         chat_completion_request(
-            [
-                message_from_system_str(prompt.system_message()),
-                message_from_user_str(prompt.user_message()),
-            ],
+            compact_prompt(
+                build_messages,
+                function_description,
+                None,
+                model="gpt-4",
+                stage="format",
+                marker=DOCUMENT_TRUNCATION_MARKER,
+            ),
             model="gpt-4",
             use_cache=True,
+            stage="format",
         )
     )
     save_formatted_description_to_cache(
@@ -77,19 +155,33 @@ async def write_scratch(
     function_name: str,
     improvement: Optional[Improvement] = None,
 ) -> str:
-    description_prompt = ScratchFunctionPrompt(
-        function_name,
-        improvement.context if improvement is not None else None,
-        function_source,
-    )
-    scratch = await raw_llm_to_string(
-        chat_completion_request(
-            [
-                message_from_system_str(description_prompt.system_message()),
-                message_from_user_str(description_prompt.user_message()),
-            ],
+    def build_messages(
+        source: str, improvement: Optional[Improvement]
+    ) -> list[OpenAIInputMessage]:
+        description_prompt = ScratchFunctionPrompt(
+            function_name,
+            improvement.context if improvement is not None else None,
+            source,
+        )
+        return [
+            message_from_system_str(description_prompt.system_message()),
+            message_from_user_str(description_prompt.user_message()),
+        ]
+
+    scratch = await read_section(
+        chat_completion_stream(
+            compact_prompt(
+                build_messages,
+                function_source,
+                improvement,
+                model="gpt-3.5-turbo-16k",
+                stage="scratch",
+            ),
             model="gpt-3.5-turbo-16k",
             use_cache=False,
-        )
+            stage="scratch",
+        ),
+        heading="# Scratch",
+        next_heading=SCRATCH_END,
     )
     return scratch
@@ -0,0 +1,81 @@
+import argparse
+import asyncio
+import os
+import pathlib
+import random
+import tempfile
+
+from automodeldocs.chat.backends import SyntheticBackend, set_backend
+from automodeldocs.cache_store import ContentStore
+from automodeldocs.config.llm_config import LLMConfig
+from automodeldocs.package import fully_describe_package
+
+EXAMPLES = pathlib.Path(__file__).parent.parent / "examples"
+
+
+class DivergingSyntheticBackend(SyntheticBackend):
+    """
+    Synthetic replies are identical, so every beam would converge. Reword a
+    share of the descriptions so some beams have to be widened.
+    """
+
+    def __init__(self, latency: float, divergence: float) -> None:
+        super().__init__(latency=latency, jitter=0.0, seed=0)
+        self.divergence = divergence
+        self.requests = 0
+
+    def _reply(self, messages) -> str:
+        self.requests += 1
+        reply = super()._reply(messages)
+        if reply.startswith("# Report") and self._random.random() < self.divergence:
+            words = [f"w{self._random.randrange(10_000)}" for _ in range(20)]
+            return "# Report\n" + " ".join(words)
+        return reply
+
+
+async def count_requests(
+    root: pathlib.Path, adaptive: bool, latency: float, divergence: float
+) -> int:
+    backend = DivergingSyntheticBackend(latency, divergence)
+    set_backend(backend)
+    previous = {name: os.environ.get(name) for name in ["ADAPTIVE_BEAM", "HOME"]}
+    with tempfile.TemporaryDirectory() as tmp_home:
+        # Every run starts from empty caches, out of the real home directory.
+        os.environ.update(ADAPTIVE_BEAM=str(adaptive).lower(), HOME=tmp_home)
+        LLMConfig.from_env.cache_clear()
+        ContentStore._shared = None
+        try:
+            await fully_describe_package(root, root.stem)
+        finally:
+            ContentStore._shared = None
+            for name, value in previous.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+            LLMConfig.from_env.cache_clear()
+    return backend.requests
+
+
+async def main(latency: float, divergence: float) -> None:
+    total_fixed, total_adaptive = 0, 0
+    for source in sorted(EXAMPLES.rglob("*.py")):
+        fixed = await count_requests(source, False, latency, divergence)
+        adaptive = await count_requests(source, True, latency, divergence)
+        total_fixed, total_adaptive = total_fixed + fixed, total_adaptive + adaptive
+        print(
+            f"{source.relative_to(EXAMPLES)}: {fixed} requests with a fixed beam, "
+            f"{adaptive} adaptive ({fixed - adaptive} saved)"
+        )
+    print(
+        f"total: {total_fixed} fixed, {total_adaptive} adaptive "
+        f"({1 - total_adaptive / max(total_fixed, 1):.0%} saved)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.01)
+    parser.add_argument("--divergence", type=float, default=0.5)
+    args = parser.parse_args()
+    asyncio.run(main(args.latency, args.divergence))
@@ -0,0 +1,49 @@
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from automodeldocs.chat.backends import SyntheticBackend, set_backend
+from automodeldocs.config.llm_config import LLMConfig
+from automodeldocs.explorer import fan_and_evaluate
+
+
+async def time_per_node(
+    label: str, beam_width: int, beam_concurrency: int, n_nodes: int
+) -> float:
+    os.environ["BEAM_WIDTH"] = str(beam_width)
+    os.environ["BEAM_CONCURRENCY"] = str(beam_concurrency)
+    LLMConfig.from_env.cache_clear()
+    start = time.perf_counter()
+    for idx in range(n_nodes):
+        # Unique sources, so the fan cache never answers.
+        await fan_and_evaluate(
+            f"def f_{label}_{beam_width}_{idx}(x):\n    return x",
+            f"f_{idx}",
+            None,
+        )
+    return (time.perf_counter() - start) / n_nodes
+
+
+async def main(beam_widths: list[int], n_nodes: int) -> None:
+    for beam_width in beam_widths:
+        serial = await time_per_node("serial", beam_width, 1, n_nodes)
+        concurrent = await time_per_node("concurrent", beam_width, beam_width, n_nodes)
+        print(
+            f"BEAM_WIDTH={beam_width}: serial beam {serial:6.2f}s/node, "
+            f"concurrent beam {concurrent:6.2f}s/node"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--beam-widths", type=int, nargs="+", default=[1, 2, 3, 5, 8])
+    parser.add_argument("--nodes", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+    set_backend(SyntheticBackend(latency=args.latency, jitter=0.0))
+    with tempfile.TemporaryDirectory() as tmp_home:
+        # Keep every on-disk cache out of the real home directory.
+        os.environ["HOME"] = tmp_home
+        asyncio.run(main(args.beam_widths, args.nodes))
@@ -0,0 +1,57 @@
+import argparse
+import pathlib
+import random
+import tempfile
+import time
+from dataclasses import dataclass
+
+from automodeldocs.describe.cache import DescribeDBCache, FunctionDescriptionRequest
+
+
+@dataclass(frozen=True)
+class SourceContainer:
+    name: str
+    code: str
+
+    def source(self) -> str:
+        return self.code
+
+
+def _request(idx: int) -> FunctionDescriptionRequest:
+    return FunctionDescriptionRequest(
+        SourceContainer(f"function_{idx}", f"def function_{idx}(x):\n    return x")
+    )
+
+
+def main(sizes: list[int], n_lookups: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = DescribeDBCache(pathlib.Path(tmp_dir) / "descriptions.parquet")
+        populated = 0
+        for n_entries in sorted(sizes):
+            start = time.perf_counter()
+            for idx in range(populated, n_entries):
+                cache[_request(idx)] = f"Description {idx}"
+            per_write = (time.perf_counter() - start) / (n_entries - populated)
+            populated = n_entries
+            lookups = [_request(random.randrange(n_entries)) for _ in range(n_lookups)]
+            start = time.perf_counter()
+            for request in lookups:
+                assert cache[request] is not None
+            per_lookup = (time.perf_counter() - start) / n_lookups
+            print(
+                f"{n_entries:>9} entries: {per_write * 1e6:8.1f}us per write, "
+                f"{per_lookup * 1e6:8.1f}us per lookup"
+            )
+        start = time.perf_counter()
+        cache.close()
+        print(f"final compaction: {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000]
+    )
+    parser.add_argument("--lookups", type=int, default=10_000)
+    args = parser.parse_args()
+    main(args.sizes, args.lookups)
@@ -0,0 +1,62 @@
+import argparse
+import asyncio
+import os
+import pathlib
+import tempfile
+import time
+
+from function_discovery import parse_module
+
+from automodeldocs.chat.backends import Completion, SyntheticBackend, set_backend
+from automodeldocs.explorer import fully_describe_item
+
+EXAMPLES = pathlib.Path(__file__).parent.parent / "examples"
+
+
+class CountingSyntheticBackend(SyntheticBackend):
+    def __init__(self, latency: float, jitter: float) -> None:
+        super().__init__(latency=latency, jitter=jitter, seed=0)
+        self.requests = 0
+
+    async def complete(
+        self, messages, model, functions=None, function_call=None
+    ) -> Completion:
+        self.requests += 1
+        return await super().complete(messages, model, functions, function_call)
+
+    async def stream(self, messages, model):
+        self.requests += 1
+        async for delta in super().stream(messages, model):
+            yield delta
+
+
+async def main(
+    source_file: pathlib.Path, name: str, latency: float, jitter: float
+) -> None:
+    backend = CountingSyntheticBackend(latency, jitter)
+    set_backend(backend)
+    module = parse_module(source_file, module_name=source_file.stem, starting_path=None)
+    start = time.perf_counter()
+    await fully_describe_item(module.resolve_name(name).origin)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name}: {backend.requests} requests in {elapsed:.2f}s "
+        f"({backend.requests / elapsed:.1f} requests/s)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--source",
+        type=pathlib.Path,
+        default=EXAMPLES / "parameter_identification" / "naive_perceptron.py",
+    )
+    parser.add_argument("--name", default="Perceptron")
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp_home:
+        # Keep every on-disk cache out of the real home directory.
+        os.environ["HOME"] = tmp_home
+        asyncio.run(main(args.source, args.name, args.latency, args.jitter))
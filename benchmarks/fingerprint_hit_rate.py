@@ -0,0 +1,79 @@
+import argparse
+import ast
+import asyncio
+import os
+import pathlib
+import tempfile
+
+from automodeldocs.cache_store import ContentStore
+from automodeldocs.chat.backends import SyntheticBackend, set_backend
+from automodeldocs.config.llm_config import LLMConfig
+from automodeldocs.metrics import CACHE_LOOKUPS
+from automodeldocs.package import fully_describe_package
+
+EXAMPLES = pathlib.Path(__file__).parent.parent / "examples"
+
+
+class CountingSyntheticBackend(SyntheticBackend):
+    def __init__(self, latency: float) -> None:
+        super().__init__(latency=latency, jitter=0.0, seed=0)
+        self.requests = 0
+
+    def _reply(self, messages) -> str:
+        self.requests += 1
+        return super()._reply(messages)
+
+
+def reformat(source: pathlib.Path, target_dir: pathlib.Path) -> pathlib.Path:
+    """Rewrites `source` with different layout and quoting and no comments."""
+    target = target_dir / source.name
+    target.write_text(ast.unparse(ast.parse(source.read_text())))
+    return target
+
+
+def fan_lookups() -> tuple[float, float]:
+    return (
+        CACHE_LOOKUPS.value(cache="fan", result="hit"),
+        CACHE_LOOKUPS.value(cache="fan", result="miss"),
+    )
+
+
+async def hit_rate_after_reformat(
+    source: pathlib.Path, fingerprint: bool, latency: float
+) -> tuple[float, int]:
+    """Fan cache hit rate and LLM requests when re-describing a reformatted file."""
+    os.environ["FINGERPRINT_CACHE_KEYS"] = str(fingerprint).lower()
+    LLMConfig.from_env.cache_clear()
+    with tempfile.TemporaryDirectory() as tmp_home:
+        # Every run starts from empty caches, out of the real home directory.
+        os.environ["HOME"] = tmp_home
+        ContentStore._shared = None
+        set_backend(CountingSyntheticBackend(latency))
+        await fully_describe_package(source, source.stem)
+        backend = CountingSyntheticBackend(latency)
+        set_backend(backend)
+        hits, misses = fan_lookups()
+        reformatted = reformat(source, pathlib.Path(tmp_home))
+        await fully_describe_package(reformatted, source.stem)
+        new_hits, new_misses = fan_lookups()
+        ContentStore._shared = None
+    hits, misses = new_hits - hits, new_misses - misses
+    return hits / max(hits + misses, 1), backend.requests
+
+
+async def main(latency: float) -> None:
+    for source in sorted(EXAMPLES.rglob("*.py")):
+        raw_rate, raw_requests = await hit_rate_after_reformat(source, False, latency)
+        rate, requests = await hit_rate_after_reformat(source, True, latency)
+        print(
+            f"{source.relative_to(EXAMPLES)}: fan cache hit rate after reformatting "
+            f"{raw_rate:.0%} with raw keys ({raw_requests} requests), "
+            f"{rate:.0%} with fingerprints ({requests} requests)"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.latency))
@@ -0,0 +1,100 @@
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Awaitable, Callable
+
+import aiohttp
+from aiohttp import web
+
+from automodeldocs.chat.client import client_session, llm_client
+
+STUB_RESPONSE = {
+    "id": "chatcmpl-stub",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "stub",
+    "choices": [
+        {"index": 0, "message": {"role": "assistant", "content": "# Report\nStub"}}
+    ],
+}
+
+
+async def _stub_completion(request: web.Request) -> web.Response:
+    await request.json()
+    return web.json_response(STUB_RESPONSE)
+
+
+async def start_stub_server() -> tuple[web.AppRunner, str]:
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", _stub_completion)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/v1/chat/completions"
+
+
+async def _session_per_call(url: str) -> None:
+    async with aiohttp.ClientSession() as session:
+        async with session.post(url, json={"messages": []}) as response:
+            await response.json()
+
+
+async def _pooled_call(url: str) -> None:
+    async with client_session() as session:
+        async with session.post(url, json={"messages": []}) as response:
+            await response.json()
+
+
+async def run_calls(
+    call: Callable[[str], Awaitable[None]], url: str, n_calls: int, concurrency: int
+) -> tuple[list[float], float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+
+    async def timed_call() -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await call(url)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[timed_call() for _ in range(n_calls)])
+    return latencies, time.perf_counter() - start
+
+
+def report(label: str, latencies: list[float], elapsed: float) -> None:
+    ordered = sorted(latencies)
+    print(
+        f"{label:>18}: "
+        f"mean {statistics.mean(ordered) * 1000:7.2f}ms  "
+        f"p50 {ordered[len(ordered) // 2] * 1000:7.2f}ms  "
+        f"p95 {ordered[int(len(ordered) * 0.95)] * 1000:7.2f}ms  "
+        f"{len(ordered) / elapsed:9.1f} calls/s"
+    )
+
+
+async def main(n_calls: int, concurrency: int) -> None:
+    runner, url = await start_stub_server()
+    try:
+        report(
+            "session per call",
+            *await run_calls(_session_per_call, url, n_calls, concurrency),
+        )
+        async with llm_client():
+            report(
+                "pooled client",
+                *await run_calls(_pooled_call, url, n_calls, concurrency),
+            )
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+    asyncio.run(main(args.calls, args.concurrency))
@@ -0,0 +1,61 @@
+import argparse
+import pathlib
+import random
+import tempfile
+import time
+
+from automodeldocs.cache_store import ContentStore
+from automodeldocs.chat.cache import ResponseCache
+from automodeldocs.definitions import OpenAIInputMessage
+from automodeldocs.response.formatted import FormattedOpenAIResponse
+
+
+def _messages(idx: int) -> list[OpenAIInputMessage]:
+    return [
+        {"role": "system", "content": "You describe functions."},
+        {"role": "user", "content": f"def function_{idx}(x):\n    return x + {idx}"},
+    ]
+
+
+def populate(cache: ResponseCache, start: int, n_entries: int) -> None:
+    for idx in range(start, n_entries):
+        cache.add_item(
+            _messages(idx),
+            [FormattedOpenAIResponse("assistant", f"# Report\nDescription {idx}")],
+        )
+
+
+def time_lookups(cache: ResponseCache, n_entries: int, n_lookups: int) -> float:
+    lookups = [_messages(random.randrange(n_entries)) for _ in range(n_lookups)]
+    start = time.perf_counter()
+    for messages in lookups:
+        assert cache.try_retrieve(messages) is not None
+    return (time.perf_counter() - start) / n_lookups
+
+
+def main(sizes: list[int], n_lookups: int, memory_bytes: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = ResponseCache(ContentStore(pathlib.Path(tmp_dir), memory_bytes))
+        populated = 0
+        for n_entries in sorted(sizes):
+            start = time.perf_counter()
+            populate(cache, populated, n_entries)
+            per_write = (time.perf_counter() - start) / (n_entries - populated)
+            populated = n_entries
+            per_lookup = time_lookups(cache, n_entries, n_lookups)
+            print(
+                f"{n_entries:>9} entries: {per_write * 1e6:8.1f}us per write, "
+                f"{per_lookup * 1e6:8.1f}us per lookup"
+            )
+        print(f"memory tier: {cache.store.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--lookups", type=int, default=10_000)
+    parser.add_argument("--memory-bytes", type=int, default=0)
+    args = parser.parse_args()
+    main(args.sizes, args.lookups, args.memory_bytes)
@@ -0,0 +1,66 @@
+import argparse
+import asyncio
+import random
+import time
+import tracemalloc
+
+from automodeldocs.explorer import DescriptionNode, NodeState
+from automodeldocs.graph import DependencyGraph
+from automodeldocs.scheduler import TopologicalScheduler
+
+
+def random_dag(nodes: int, fan_out: int, seed: int) -> DependencyGraph:
+    rng = random.Random(seed)
+    graph: DependencyGraph = DependencyGraph()
+    for node in range(nodes):
+        graph.update(node, DescriptionNode(node, f"node_{node}", "", ""))
+        for _ in range(min(fan_out, nodes - node - 1)):
+            graph.add_edge(node, rng.randrange(node + 1, nodes))
+    return graph
+
+
+def measure_memory(nodes: int, fan_out: int) -> tuple[DependencyGraph, float]:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    graph = random_dag(nodes, fan_out, seed=0)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return graph, (after - before) / nodes
+
+
+async def schedule(graph: DependencyGraph, nodes: int, concurrency: int) -> None:
+    async def describe(container: int) -> bool:
+        graph.node(container).state = NodeState.RESOLVED
+        return True
+
+    scheduler = TopologicalScheduler(
+        graph,
+        describe,
+        concurrency=concurrency,
+        is_done=lambda container: graph.node(container).state is NodeState.RESOLVED,
+    )
+    start = time.perf_counter()
+    await scheduler.run(range(nodes))
+    elapsed = time.perf_counter() - start
+    print(
+        f"{nodes} nodes / {graph.edge_count} edges: scheduled in {elapsed:.2f}s "
+        f"({elapsed / nodes * 1e6:.1f}us/node), {scheduler.stats()}"
+    )
+
+
+def main(sizes: list[int], fan_out: int, concurrency: int) -> None:
+    for nodes in sizes:
+        graph, bytes_per_node = measure_memory(nodes, fan_out)
+        print(f"{nodes} nodes: {bytes_per_node:.0f} bytes/node (graph and nodes)")
+        asyncio.run(schedule(graph, nodes, concurrency))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--nodes", type=int, nargs="+", default=[10_000, 50_000, 100_000]
+    )
+    parser.add_argument("--fan-out", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+    main(args.nodes, args.fan_out, args.concurrency)
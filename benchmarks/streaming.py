@@ -0,0 +1,138 @@
+import argparse
+import asyncio
+import json
+import pathlib
+import statistics
+import tempfile
+import time
+
+from aiohttp import web
+
+from automodeldocs.chat.backends import OpenAIBackend, set_backend
+from automodeldocs.cache_store import ContentStore
+from automodeldocs.chat.client import llm_client
+from automodeldocs.chat.send_message import (
+    chat_completion_request,
+    chat_completion_stream,
+)
+from automodeldocs.describe.function_scratch_prompt import SCRATCH_END
+from automodeldocs.structures import message_from_system_str, message_from_user_str
+from automodeldocs.writer import raw_llm_to_string, write_description, write_scratch
+
+FUNCTION_SOURCE = "def add_one(x):\n    return x + 1"
+
+
+def _stub_completion_text(messages: list[dict], n_chunks: int) -> list[str]:
+    if "# Scratch" in messages[0]["content"]:
+        # Models regularly keep writing after the requested section.
+        return (
+            ["# Scratch\n"]
+            + [f"note {i} " for i in range(n_chunks // 2)]
+            + [f"\n{SCRATCH_END}\n# Summary\n"]
+            + [f"summary {i} " for i in range(n_chunks // 2)]
+        )
+    return ["# Report\n"] + [f"word {i} " for i in range(n_chunks)]
+
+
+def stub_app(n_chunks: int, chunk_delay: float) -> web.Application:
+    async def completion(request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        chunks = _stub_completion_text(body["messages"], n_chunks)
+        if not body.get("stream"):
+            await asyncio.sleep(chunk_delay * len(chunks))
+            return web.json_response(
+                {
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {
+                                "role": "assistant",
+                                "content": "".join(chunks),
+                            },
+                        }
+                    ]
+                }
+            )
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for chunk in chunks:
+            await asyncio.sleep(chunk_delay)
+            event = {"choices": [{"index": 0, "delta": {"content": chunk}}]}
+            await response.write(f"data: {json.dumps(event)}\n\n".encode())
+        await response.write(b"data: [DONE]\n\n")
+        return response
+
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", completion)
+    return app
+
+
+async def time_to_first_token() -> float:
+    start = time.perf_counter()
+    stream = chat_completion_stream(
+        [message_from_user_str("Say something")], model="gpt-3.5-turbo", use_cache=False
+    )
+    await stream.__anext__()
+    elapsed = time.perf_counter() - start
+    async for _ in stream:
+        pass
+    return elapsed
+
+
+async def buffered_node() -> float:
+    start = time.perf_counter()
+    scratch = await raw_llm_to_string(
+        chat_completion_request(
+            [
+                message_from_system_str("# Scratch"),
+                message_from_user_str(FUNCTION_SOURCE),
+            ],
+            model="gpt-3.5-turbo",
+            use_cache=False,
+        )
+    )
+    await raw_llm_to_string(
+        chat_completion_request(
+            [message_from_system_str(scratch), message_from_user_str(FUNCTION_SOURCE)],
+            model="gpt-3.5-turbo",
+            use_cache=False,
+        )
+    )
+    return time.perf_counter() - start
+
+
+async def streamed_node() -> float:
+    start = time.perf_counter()
+    scratch = await write_scratch(FUNCTION_SOURCE, "add_one")
+    await write_description(FUNCTION_SOURCE, "add_one", scratch)
+    return time.perf_counter() - start
+
+
+async def main(n_nodes: int, n_chunks: int, chunk_delay: float) -> None:
+    runner = web.AppRunner(stub_app(n_chunks, chunk_delay))
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    set_backend(OpenAIBackend(api_base=f"http://127.0.0.1:{port}/v1", api_key="stub"))
+    try:
+        async with llm_client():
+            ttft = [await time_to_first_token() for _ in range(n_nodes)]
+            buffered = [await buffered_node() for _ in range(n_nodes)]
+            streamed = [await streamed_node() for _ in range(n_nodes)]
+        print(f"time to first token: {statistics.mean(ttft) * 1000:8.1f}ms")
+        print(f"buffered per node:   {statistics.mean(buffered) * 1000:8.1f}ms")
+        print(f"streamed per node:   {statistics.mean(streamed) * 1000:8.1f}ms")
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nodes", type=int, default=10)
+    parser.add_argument("--chunks", type=int, default=40)
+    parser.add_argument("--chunk-delay", type=float, default=0.01)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        ContentStore._shared = ContentStore(pathlib.Path(tmp_dir))
+        asyncio.run(main(args.nodes, args.chunks, args.chunk_delay))
@@ -0,0 +1,25 @@
+import asyncio
+
+from automodeldocs.chat.backends import SyntheticBackend
+from automodeldocs.evaluator.parser import EvaluationResponse
+from automodeldocs.evaluator.prompt import Evaluator
+from automodeldocs.structures import message_from_system_str, message_from_user_str
+
+
+def test_synthetic_backend_returns_parseable_evaluations():
+    evaluator = Evaluator(["First description", "Second description"])
+    backend = SyntheticBackend(latency=0.0, jitter=0.0, seed=0)
+
+    async def evaluate() -> EvaluationResponse:
+        completion = await backend.complete(
+            [
+                message_from_system_str(evaluator.system_message()),
+                message_from_user_str(evaluator.user_message()),
+            ],
+            model="gpt-4",
+        )
+        return await EvaluationResponse.from_fmt(completion.responses[-1])
+
+    evaluation_response = asyncio.run(evaluate())
+    assert evaluation_response.documentation_idx in (0, 1)
+    assert evaluation_response.additional_context_items == []
@@ -0,0 +1,127 @@
+import asyncio
+
+from automodeldocs.chat.backends import SyntheticBackend
+from automodeldocs.chat.batch import BatchBackend, LocalBatchEndpoint
+from automodeldocs.structures import message_from_user_str
+
+
+def _run_wave(state_dir, endpoint) -> list[str]:
+    backend = BatchBackend(endpoint, state_dir, collect_window=0.01, poll_interval=0.01)
+
+    async def wave() -> list[str]:
+        completions = await asyncio.gather(
+            *[
+                backend.complete([message_from_user_str(f"prompt {idx}")], "gpt-4")
+                for idx in (0, 1, 1)
+            ]
+        )
+        return [c.responses[-1].content for c in completions]
+
+    return asyncio.run(wave())
+
+
+def test_batch_backend_submits_one_job_per_wave(tmp_path):
+    endpoint = LocalBatchEndpoint(
+        tmp_path / "endpoint", SyntheticBackend(latency=0.0, jitter=0.0)
+    )
+    first_run = _run_wave(tmp_path / "jobs", endpoint)
+    assert len(first_run) == 3
+    assert len(list((tmp_path / "endpoint").iterdir())) == 1
+
+    # A restarted process replays the same wave from the stored job.
+    assert _run_wave(tmp_path / "jobs", endpoint) == first_run
+    assert len(list((tmp_path / "endpoint").iterdir())) == 1
+
+
+def test_batch_backend_flushes_a_steady_trickle(tmp_path):
+    endpoint = LocalBatchEndpoint(
+        tmp_path / "endpoint", SyntheticBackend(latency=0.0, jitter=0.0)
+    )
+    backend = BatchBackend(
+        endpoint,
+        tmp_path / "jobs",
+        collect_window=0.05,
+        poll_interval=0.01,
+        max_wait=0.1,
+        max_requests=3,
+    )
+
+    async def trickle() -> None:
+        requests = []
+        for idx in range(8):
+            requests.append(
+                asyncio.ensure_future(
+                    backend.complete([message_from_user_str(f"prompt {idx}")], "gpt-4")
+                )
+            )
+            await asyncio.sleep(0.03)
+        await asyncio.gather(*requests)
+
+    asyncio.run(trickle())
+    # Never quiet for a whole collect window, so only the size and age caps flush.
+    assert len(list((tmp_path / "endpoint").iterdir())) > 1
+
+
+class StalledEndpoint(LocalBatchEndpoint):
+    """Accepts jobs but never runs them, like a process killed mid-batch."""
+
+    async def status(self, job_id: str) -> str:
+        return "in_progress"
+
+
+def test_batch_backend_resumes_per_request_after_restart(tmp_path):
+    backend = SyntheticBackend(latency=0.0, jitter=0.0)
+    stalled = StalledEndpoint(tmp_path / "endpoint", backend)
+    first = BatchBackend(stalled, tmp_path / "jobs", collect_window=0.01)
+
+    async def crash() -> None:
+        wave = asyncio.gather(
+            *[
+                first.complete([message_from_user_str(f"prompt {idx}")], "gpt-4")
+                for idx in range(3)
+            ]
+        )
+        await asyncio.sleep(0.1)
+        wave.cancel()
+
+    asyncio.run(crash())
+    assert len(list((tmp_path / "endpoint").iterdir())) == 1
+
+    # Batched one request at a time now, yet nothing is submitted again.
+    endpoint = LocalBatchEndpoint(tmp_path / "endpoint", backend)
+    restarted = BatchBackend(
+        endpoint, tmp_path / "jobs", collect_window=0.01, max_requests=1
+    )
+
+    async def resume() -> list[str]:
+        completions = await asyncio.gather(
+            *[
+                restarted.complete([message_from_user_str(f"prompt {idx}")], "gpt-4")
+                for idx in range(3)
+            ]
+        )
+        return [c.responses[-1].content for c in completions]
+
+    assert len(asyncio.run(resume())) == 3
+    assert len(list((tmp_path / "endpoint").iterdir())) == 1
+
+
+def test_batch_backend_skips_cancelled_callers(tmp_path):
+    endpoint = LocalBatchEndpoint(
+        tmp_path / "endpoint", SyntheticBackend(latency=0.0, jitter=0.0)
+    )
+    backend = BatchBackend(endpoint, tmp_path / "jobs", collect_window=0.05)
+
+    async def wave() -> list[str]:
+        requests = [
+            asyncio.ensure_future(
+                backend.complete([message_from_user_str(f"prompt {idx}")], "gpt-4")
+            )
+            for idx in range(3)
+        ]
+        await asyncio.sleep(0.01)
+        requests[0].cancel()
+        completions = await asyncio.gather(*requests[1:])
+        return [c.responses[-1].content for c in completions]
+
+    assert len(asyncio.run(wave())) == 2
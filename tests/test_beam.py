@@ -0,0 +1,31 @@
+from automodeldocs.beam import (
+    BeamSignals,
+    choose_beam_width,
+    converged,
+    unresolved_names,
+)
+
+
+def test_beam_width_follows_node_signals():
+    helper = BeamSignals(
+        source_tokens=40, docstring_words=0, unresolved_names=1, improvement=False
+    )
+    forward = BeamSignals(
+        source_tokens=900, docstring_words=0, unresolved_names=12, improvement=False
+    )
+    assert choose_beam_width(helper, max_width=3) == 1
+    assert choose_beam_width(forward, max_width=3) == 3
+    documented = BeamSignals(
+        source_tokens=200, docstring_words=60, unresolved_names=0, improvement=True
+    )
+    assert choose_beam_width(documented, max_width=3) == 1
+
+
+def test_unresolved_names_ignores_locals_and_builtins():
+    source = "def f(x):\n    y = len(x)\n    return helper(y, CONSTANT)\n"
+    assert unresolved_names(source) == 2
+
+
+def test_converged():
+    assert converged(["Squares the input.", "Squares the input!"], threshold=0.9)
+    assert not converged(["Squares the input.", "Loads a CSV file."], threshold=0.9)
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from automodeldocs.budget import (
+    BudgetExceededError,
+    BudgetLevel,
+    RunBudget,
+    run_budget,
+)
+from automodeldocs.chat.client import llm_client
+
+
+def test_budget_degrades_in_steps():
+    budget = RunBudget(max_tokens=1000)
+    assert budget.level() == BudgetLevel.FULL
+    budget.charge("gpt-4", prompt_tokens=500, completion_tokens=100)
+    assert budget.level() == BudgetLevel.REDUCED_BEAM
+    budget.charge("gpt-4", prompt_tokens=200, completion_tokens=0)
+    assert budget.level() == BudgetLevel.NO_IMPROVEMENT
+    budget.charge("gpt-4", prompt_tokens=150, completion_tokens=0)
+    assert budget.level() == BudgetLevel.DOCSTRING_ONLY
+    budget.check()
+    budget.charge("gpt-4", prompt_tokens=50, completion_tokens=0)
+    with pytest.raises(BudgetExceededError):
+        budget.check()
+
+
+def test_budget_reports_skips():
+    budget = RunBudget(max_dollars=1.0)
+    budget.charge("gpt-4", prompt_tokens=10_000, completion_tokens=5_000)
+    budget.record_skip("improvement", "Perceptron.fit")
+    report = budget.report()
+    assert report["used_dollars"] == 0.6
+    assert report["skipped"] == [
+        {
+            "stage": "improvement",
+            "name": "Perceptron.fit",
+            "budget_level": "REDUCED_BEAM",
+        }
+    ]
+
+
+def test_budget_reserves_in_flight_requests():
+    budget = RunBudget(max_tokens=1000)
+    reservation = budget.check("gpt-4", prompt_tokens=400, completion_tokens=200)
+    budget.check("gpt-4", prompt_tokens=300, completion_tokens=0)
+    with pytest.raises(BudgetExceededError):
+        budget.check("gpt-4", prompt_tokens=200, completion_tokens=0)
+    budget.charge(
+        "gpt-4", prompt_tokens=400, completion_tokens=50, reservation=reservation
+    )
+    assert budget.used_tokens == 450
+    assert budget.reserved_tokens == 300
+    budget.check("gpt-4", prompt_tokens=200, completion_tokens=0)
+
+
+def test_llm_client_starts_a_fresh_budget_per_run():
+    async def run() -> RunBudget:
+        async with llm_client():
+            run_budget().charge("gpt-4", prompt_tokens=100, completion_tokens=0)
+        return run_budget()
+
+    async def runs() -> tuple[RunBudget, RunBudget]:
+        return await run(), await run()
+
+    first, second = asyncio.run(runs())
+    assert first is not second
+    assert second.used_tokens == 100
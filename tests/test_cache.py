@@ -1,4 +1,19 @@
-from automodeldocs.chat.cache import simple_cache
+import json
+import os
+import sqlite3
+import time
+
+from automodeldocs.cache_maintenance import remove_empty_directories
+from automodeldocs.cache_migration import migrate_all
+from automodeldocs.cache_store import ContentStore
+from automodeldocs.chat.cache import ResponseCache, SimpleFileCache, simple_cache
+from automodeldocs.config.llm_config import LLMConfig
+from automodeldocs.evaluator.parser import EvaluationResponse
+from automodeldocs.fan_cache import legacy_fan_cache_key, try_load_fan_cache
+from automodeldocs.format_cache import (
+    format_cache_key,
+    try_load_formatted_description_cache,
+)
 from automodeldocs.response.formatted import FormattedOpenAIResponse
 
 
@@ -13,3 +28,139 @@ def test_cache():
             [{"role": "123", "content": "456"}, {"role": "123", "content": "567"}]
         )
     assert res == [("system", "result")]
+    assert SimpleFileCache.from_file().try_retrieve(
+        [{"role": "123", "content": "456"}, {"role": "123", "content": "567"}]
+    ) == [("system", "result")]
+
+
+def test_store_misses_leave_no_directories(tmp_path):
+    store = ContentStore(tmp_path / "store")
+    assert store.get("fan", "missing") is None
+    assert not (tmp_path / "store").exists()
+    store.put("fan", "present", {"description": "Adds."})
+    assert store.get("fan", "present") == {"description": "Adds."}
+    assert [path.suffix for path in store.path("fan", "present").parent.iterdir()] == [
+        ".json"
+    ]
+
+
+def test_memory_tier_serves_repeats_and_evicts_by_size(tmp_path):
+    store = ContentStore(tmp_path, memory_bytes=100)
+    store.put("format", "a", "x" * 40)
+    store.put("format", "b", "y" * 40)
+    store.path("format", "a").unlink()
+    # Served from memory, so the missing file goes unnoticed.
+    assert store.get("format", "a") == "x" * 40
+    store.put("format", "c", "z" * 40)
+    assert store.memory is not None
+    assert ("format", "b") not in store.memory
+    assert store.get("format", "b") == "y" * 40
+    assert store.stats()["hits"] == 1
+    assert store.stats()["misses"] == 1
+    assert store.stats()["evictions"] == 2
+    assert store.stats()["bytes"] <= 100
+
+
+def test_memory_tier_hits_are_independent_copies(tmp_path):
+    store = ContentStore(tmp_path, memory_bytes=1000)
+    store.put("fan", "a", {"context": ["numpy.where"]})
+    store.get("fan", "a")["context"].append("mutated")
+    assert store.get("fan", "a") == {"context": ["numpy.where"]}
+    assert store.stats()["hits"] == 2
+
+
+def test_migrate_legacy_caches(tmp_path, monkeypatch):
+    messages = [{"role": "user", "content": "migrated"}]
+    (tmp_path / ".llm_cache.json").write_text(
+        json.dumps({ResponseCache.hash_message(messages): [["assistant", "reply"]]})
+    )
+    connection = sqlite3.connect(tmp_path / ".llm_cache.sqlite3")
+    with connection:
+        connection.execute(
+            "CREATE TABLE responses (message_hash TEXT PRIMARY KEY, response TEXT)"
+        )
+        connection.execute("INSERT INTO responses VALUES ('1', '[[\"a\", \"b\"]]')")
+    connection.close()
+    key = legacy_fan_cache_key("def f(): pass", "f", None)
+    entry = tmp_path / ".function_cache" / key
+    entry.mkdir(parents=True)
+    (entry / "description.txt").write_text("Does nothing.")
+    (entry / "evaluation_response.json").write_text(
+        json.dumps(EvaluationResponse(0, "Clear.", [], []).to_dict())
+    )
+    # A directory left behind by a lookup that missed.
+    (tmp_path / ".function_cache" / "g" / ("0" * 32)).mkdir(parents=True)
+
+    store = ContentStore(tmp_path / "store")
+    migrated = migrate_all(store, tmp_path, remove=True)
+    assert migrated == {"fan": 1, "format": 0, "chat": 2}
+    assert ResponseCache(store).try_retrieve(messages) == [("assistant", "reply")]
+    monkeypatch.setattr(ContentStore, "_shared", store)
+    assert try_load_fan_cache("def f(): pass", "f", None)[0] == "Does nothing."
+    assert not (tmp_path / ".function_cache").exists()
+    assert not (tmp_path / ".llm_cache.sqlite3").exists()
+
+
+def test_collect_expires_then_evicts_least_recently_used(tmp_path):
+    store = ContentStore(tmp_path)
+    now = time.time()
+    for key, days_unused in [("old", 40), ("stale", 3), ("recent", 2), ("new", 0)]:
+        store.put("fan", key, "x" * 98)
+        os.utime(store.path("fan", key), (now, now - days_unused * 86400))
+    reports = store.collect(max_bytes=250, ttl_seconds=30 * 86400)
+    assert reports["fan"].removed == 2
+    assert reports["fan"].reclaimed_bytes == 200
+    assert [
+        store.get("fan", key) is None for key in ["old", "stale", "recent", "new"]
+    ] == [
+        True,
+        True,
+        False,
+        False,
+    ]
+    assert len(list((tmp_path / "fan").iterdir())) == 2
+
+
+def test_remove_empty_directories(tmp_path):
+    # Left by lookups that missed, apart from one entry that was written.
+    (tmp_path / "fit" / "miss").mkdir(parents=True)
+    (tmp_path / "predict" / "miss").mkdir(parents=True)
+    (tmp_path / "predict" / "hit").mkdir(parents=True)
+    (tmp_path / "predict" / "hit" / "description.txt").write_text("Predicts.")
+    assert remove_empty_directories(tmp_path) == 3
+    assert sorted(path.name for path in tmp_path.rglob("*")) == [
+        "description.txt",
+        "hit",
+        "predict",
+    ]
+
+
+def test_store_migrates_legacy_caches_when_first_opened(tmp_path, monkeypatch):
+    messages = [{"role": "user", "content": "from before the store"}]
+    (tmp_path / ".llm_cache.json").write_text(
+        json.dumps({ResponseCache.hash_message(messages): [["assistant", "reply"]]})
+    )
+    entry = tmp_path / ".function_description_cache" / format_cache_key("f", "Raw.")
+    entry.mkdir(parents=True)
+    (entry / "description.txt").write_text("Formatted.")
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setattr(ContentStore, "_shared", None)
+    monkeypatch.setattr(
+        ContentStore, "default_root", classmethod(lambda cls: tmp_path / "store")
+    )
+    with simple_cache() as cache:
+        assert cache.try_retrieve(messages) == [("assistant", "reply")]
+    assert try_load_formatted_description_cache("f", "Raw.") == "Formatted."
+    # Later opens skip the migration.
+    assert (tmp_path / "store" / ".legacy_migrated").exists()
+
+
+def test_shared_store_tracks_reads_without_a_policy(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setattr(ContentStore, "_shared", None)
+    monkeypatch.setattr(
+        ContentStore, "default_root", classmethod(lambda cls: tmp_path / "store")
+    )
+    assert LLMConfig.from_env().cache_max_bytes is None
+    assert LLMConfig.from_env().cache_ttl_days is None
+    assert ContentStore.shared().track_access
@@ -0,0 +1,77 @@
+from dataclasses import dataclass
+
+from automodeldocs.checkpoint import restore_checkpoint, take_snapshot
+from automodeldocs.explorer import DescriptionNode, NodeState
+from automodeldocs.graph import DependencyGraph
+
+
+@dataclass(frozen=True)
+class SourceContainer:
+    name: str
+    code: str
+
+    def source(self) -> str:
+        return self.code
+
+
+def build_graph(fit: SourceContainer, helper: SourceContainer) -> DependencyGraph:
+    graph: DependencyGraph = DependencyGraph()
+    for container in [fit, helper]:
+        graph.update(
+            container,
+            DescriptionNode(container, container.name, "Initial.", ""),
+        )
+    return graph
+
+
+def test_checkpoint_restores_state_and_late_edges():
+    fit = SourceContainer("fit", "def fit(x): return helper(x)")
+    helper = SourceContainer("helper", "def helper(x): return x")
+    graph = build_graph(fit, helper)
+    graph.update(
+        helper,
+        DescriptionNode(helper, "helper", "Returns x.", "", NodeState.RESOLVED),
+    )
+    # An edge found by an improvement pass, so missing from a rebuilt graph.
+    graph.add_edge(fit, helper)
+    snapshot = take_snapshot(graph)
+
+    rebuilt = build_graph(fit, helper)
+    assert restore_checkpoint(rebuilt, snapshot) == 2
+    assert rebuilt.node(helper).state is NodeState.RESOLVED
+    assert rebuilt.node(helper).description == "Returns x."
+    assert rebuilt.node(fit).state is NodeState.INITIAL
+    assert rebuilt.dependencies(fit) == [helper]
+
+
+def test_checkpoint_skips_changed_sources():
+    helper = SourceContainer("helper", "def helper(x): return x")
+    graph = build_graph(SourceContainer("fit", ""), helper)
+    graph.update(
+        helper,
+        DescriptionNode(helper, "helper", "Returns x.", "", NodeState.RESOLVED),
+    )
+    snapshot = take_snapshot(graph)
+
+    changed = SourceContainer("helper", "def helper(x): return 2 * x")
+    rebuilt = build_graph(SourceContainer("fit", ""), changed)
+    assert restore_checkpoint(rebuilt, snapshot) == 1
+    assert rebuilt.node(changed).state is NodeState.INITIAL
+
+
+def test_checkpoint_keys_nodes_by_module():
+    first = SourceContainer("helper", "def helper(x): return x")
+    second = SourceContainer("helper", "def helper(x): return 2 * x")
+    keys = {first: "pkg.a:helper", second: "pkg.b:helper"}
+    graph = build_graph(first, second)
+    graph.update(
+        first,
+        DescriptionNode(first, "helper", "Returns x.", "", NodeState.RESOLVED),
+    )
+    snapshot = take_snapshot(graph, keys)
+    assert set(snapshot.nodes) == {"pkg.a:helper", "pkg.b:helper"}
+
+    rebuilt = build_graph(first, second)
+    assert restore_checkpoint(rebuilt, snapshot, keys) == 2
+    assert rebuilt.node(first).description == "Returns x."
+    assert rebuilt.node(second).state is NodeState.INITIAL
@@ -0,0 +1,83 @@
+from typing import Optional
+
+import pytest
+
+from automodeldocs.chat.tokens import count_message_tokens
+from automodeldocs.context_guard import (
+    ContextWindowExceededError,
+    DOCUMENT_TRUNCATION_MARKER,
+    TRUNCATION_MARKER,
+    compact_documents,
+    compact_prompt,
+    ensure_fits,
+    prompt_token_limit,
+)
+from automodeldocs.structures import (
+    DescriptionContext,
+    Feedback,
+    Improvement,
+    message_from_assistant_str,
+    message_from_system_str,
+    message_from_user_str,
+)
+
+
+def build_messages(source: str, improvement: Optional[Improvement]) -> list:
+    messages = [
+        message_from_system_str(
+            improvement.context.as_str() if improvement is not None else ""
+        ),
+        message_from_user_str(source),
+    ]
+    for feedback in improvement.feedback if improvement is not None else []:
+        messages.append(message_from_assistant_str(feedback.prior_description))
+        messages.append(message_from_user_str(feedback.report))
+    return messages
+
+
+def test_compact_prompt_trims_oldest_feedback_first():
+    improvement = Improvement(
+        feedback=[
+            Feedback(f"description {idx} " * 300, "feedback") for idx in range(20)
+        ],
+        context=DescriptionContext({}),
+    )
+    messages = compact_prompt(
+        build_messages, "def f(): pass", improvement, "gpt-4", "test"
+    )
+    assert count_message_tokens(messages, "gpt-4") <= prompt_token_limit("gpt-4")
+    assert messages[-2]["content"].startswith("description 19")
+    assert not any(m["content"].startswith("description 0 ") for m in messages)
+
+
+def test_compact_prompt_truncates_source_last():
+    source = "x = 1\n" * 20_000
+    messages = compact_prompt(build_messages, source, None, "gpt-4", "test")
+    assert count_message_tokens(messages, "gpt-4") <= prompt_token_limit("gpt-4")
+    assert messages[1]["content"].endswith(TRUNCATION_MARKER)
+
+
+def test_ensure_fits_rejects_oversized_prompts():
+    with pytest.raises(ContextWindowExceededError):
+        ensure_fits([message_from_user_str("token " * 20_000)], "gpt-4", "test")
+
+
+def build_evaluation(documents: list[str]) -> list:
+    return [message_from_user_str("\n".join(documents))]
+
+
+def test_compact_documents_narrows_the_beam_first():
+    documents = ["short " * 100, "long " * 5_000, "medium " * 3_000]
+    messages, kept = compact_documents(build_evaluation, documents, "gpt-4", "test")
+    assert count_message_tokens(messages, "gpt-4") <= prompt_token_limit("gpt-4")
+    assert kept == [0, 2]
+    assert messages[0]["content"] == "\n".join([documents[0], documents[2]])
+
+
+def test_compact_documents_truncates_the_last_document():
+    messages, kept = compact_documents(
+        build_evaluation, ["word " * 20_000, "word " * 30_000], "gpt-4", "test"
+    )
+    assert count_message_tokens(messages, "gpt-4") <= prompt_token_limit("gpt-4")
+    assert kept == [0]
+    assert messages[0]["content"].endswith(DOCUMENT_TRUNCATION_MARKER)
@@ -0,0 +1,69 @@
+from dataclasses import dataclass
+
+import pandas as pd
+import pytest
+
+from automodeldocs.describe.cache import DescribeDBCache, FunctionDescriptionRequest
+
+
+@dataclass(frozen=True)
+class SourceContainer:
+    name: str
+    code: str
+
+    def source(self) -> str:
+        return self.code
+
+
+def request(name: str, code: str) -> FunctionDescriptionRequest:
+    return FunctionDescriptionRequest(SourceContainer(name, code))  # type: ignore
+
+
+def test_describe_cache_replays_log_and_compacts(tmp_path):
+    path = tmp_path / "descriptions.parquet"
+    cache = DescribeDBCache(path, compact_every=3)
+    cache[request("f", "def f(): pass")] = "Does nothing."
+    cache[request("g", "def g(): return 1")] = "Returns one."
+    assert cache[request("f", "def f(): pass")] == "Does nothing."
+    with pytest.raises(KeyError):
+        cache[request("f", "def f(): return 2")]
+    # Not compacted yet, so the second instance reads the write-ahead log.
+    assert not path.exists()
+    assert len(DescribeDBCache(path)) == 2
+
+    cache[request("f", "def f(): pass")] = "Does nothing at all."
+    cache.compact()
+    assert pd.read_parquet(path).shape[0] == 2
+    cache.close()
+    reloaded = DescribeDBCache(path)
+    assert reloaded[request("f", "def f(): pass")] == "Does nothing at all."
+    reloaded.close()
+
+
+def test_describe_cache_rederives_stored_digests(tmp_path):
+    path = tmp_path / "descriptions.parquet"
+    cache = DescribeDBCache(path)
+    cache[request("f", "def f(): pass")] = "Does nothing."
+    cache.close()
+    data = pd.read_parquet(path)
+    data["digest"] = "written under an older key scheme"
+    data.to_parquet(path, index=False)
+    reloaded = DescribeDBCache(path)
+    assert (
+        reloaded[request("f", "def f():\n    pass  # reformatted")] == "Does nothing."
+    )
+    reloaded.close()
+
+
+def test_describe_cache_compacts_in_proportion_to_its_size(tmp_path):
+    path = tmp_path / "descriptions.parquet"
+    cache = DescribeDBCache(path, compact_every=2, compact_ratio=0.5)
+    for idx in range(8):
+        cache[request(f"f{idx}", f"def f{idx}(): pass")] = "Does nothing."
+    cache.compact()
+    # Two writes reach compact_every, but not half of the eight stored rows.
+    cache[request("g", "def g(): pass")] = "Does nothing."
+    cache[request("h", "def h(): pass")] = "Does nothing."
+    assert pd.read_parquet(path).shape[0] == 8
+    cache.close()
+    assert pd.read_parquet(path).shape[0] == 10
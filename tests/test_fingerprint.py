@@ -0,0 +1,63 @@
+import dataclasses
+
+from automodeldocs.cache_store import ContentStore
+from automodeldocs.config.llm_config import LLMConfig
+from automodeldocs.evaluator.parser import EvaluationResponse
+from automodeldocs.fan_cache import (
+    NAMESPACE,
+    legacy_fan_cache_key,
+    save_fan_cache,
+    try_load_fan_cache,
+)
+from automodeldocs.fingerprint import source_fingerprint
+
+ORIGINAL = '''
+    def fit(self, X, y):
+        """Fits the model.
+        Returns self."""
+        def step(w): return w - self.lr * grad(w, X, y)  # one update
+        self.w = step(self.w)
+        return self
+'''
+
+REFORMATTED = '''
+def fit(self, X, y):
+    """
+    Fits the model.
+
+    Returns self.
+    """
+
+    def step(w):
+        return w - self.lr * grad(w, X, y)
+
+    self.w = step(self.w)
+    return self
+'''
+
+
+def test_fingerprint_ignores_formatting_comments_and_indentation():
+    assert source_fingerprint(ORIGINAL) == source_fingerprint(REFORMATTED)
+    assert source_fingerprint(ORIGINAL) != source_fingerprint(
+        REFORMATTED.replace("self.lr *", "self.lr /")
+    )
+
+
+def test_fan_cache_hits_reformatted_and_legacy_entries(tmp_path, monkeypatch):
+    monkeypatch.setattr(ContentStore, "_shared", ContentStore(tmp_path))
+    response = EvaluationResponse(0, "Clear.", [], [])
+    save_fan_cache(ORIGINAL, "fit", None, None, "Fits.", response)
+    assert try_load_fan_cache(REFORMATTED, "fit", None) == ("Fits.", response)
+
+    # An entry keyed by the raw source, as written before fingerprinting.
+    ContentStore.shared().put(
+        NAMESPACE,
+        legacy_fan_cache_key("def g(): pass", "g", None),
+        {"description": "Passes.", "evaluation_response": response.to_dict()},
+    )
+    assert try_load_fan_cache("def g(): pass", "g", None) == ("Passes.", response)
+    # The hit was copied forward, so it survives turning the fallback off.
+    config = dataclasses.replace(LLMConfig.from_env(), legacy_fan_keys=False)
+    monkeypatch.setattr(LLMConfig, "from_env", lambda: config)
+    assert try_load_fan_cache("def g():\n    pass", "g", None) == ("Passes.", response)
+    assert try_load_fan_cache("def h(): pass", "h", None) is None
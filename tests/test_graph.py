@@ -0,0 +1,39 @@
+import asyncio
+
+from automodeldocs.graph import DependencyGraph
+
+
+def test_graph_builds_each_node_once():
+    graph: DependencyGraph[str] = DependencyGraph()
+    builds = 0
+
+    async def build() -> str:
+        nonlocal builds
+        builds += 1
+        await asyncio.sleep(0.01)
+        return "helper"
+
+    async def run() -> list[tuple[str, bool]]:
+        return list(
+            await asyncio.gather(*[graph.node_for("helper", build) for _ in range(10)])
+        )
+
+    results = asyncio.run(run())
+    assert builds == 1
+    assert [created for _, created in results].count(True) == 1
+    assert {node for node, _ in results} == {"helper"}
+
+
+def test_graph_counts_shared_edges():
+    graph: DependencyGraph[str] = DependencyGraph()
+
+    async def run() -> None:
+        for name in ["a", "b", "helper"]:
+            await graph.node_for(name, lambda name=name: asyncio.sleep(0, name))
+
+    asyncio.run(run())
+    graph.add_edge("a", "helper")
+    graph.add_edge("b", "helper")
+    graph.add_edge("a", "helper")
+    assert graph.report() == {"nodes": 3, "edges": 2}
+    assert sorted(graph.dependents("helper")) == ["a", "b"]
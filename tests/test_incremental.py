@@ -0,0 +1,112 @@
+import asyncio
+
+from function_discovery import parse_module
+
+import automodeldocs.explorer as explorer
+from automodeldocs.checkpoint import take_snapshot
+from automodeldocs.evaluator.parser import EvaluationResponse
+from automodeldocs.explorer import NodeState, build_dependency_graph
+from automodeldocs.graph import DependencyGraph
+from automodeldocs.incremental import (
+    changed_lines_from_diff,
+    changed_names,
+    restore_from_snapshot,
+)
+from automodeldocs.snapshot import GraphSnapshot, NodeSnapshot, module_keys
+
+SOURCE = """def helper(x):
+    return x * 2
+
+
+class Model:
+    def fit(self, x):
+        return helper(x)
+
+    @property
+    def size(self):
+        return 1
+"""
+
+DIFF = """diff --git a/model.py b/model.py
+--- a/model.py
++++ b/model.py
+@@ -7 +7 @@ class Model:
+-        return helper(x)
++        return helper(x) + 1
+"""
+
+
+def test_diff_maps_to_changed_definitions(tmp_path):
+    (tmp_path / "model.py").write_text(SOURCE)
+    changed = changed_lines_from_diff(DIFF, tmp_path)
+    assert changed == {tmp_path / "model.py": {7}}
+    assert changed_names(changed) == {"Model", "Model.fit"}
+    assert "helper" in changed_names({tmp_path / "model.py": None})
+    assert changed_names(changed, {tmp_path / "model.py": "pkg.model"}) == {
+        "pkg.model:Model",
+        "pkg.model:Model.fit",
+    }
+
+
+def test_snapshot_round_trips(tmp_path):
+    snapshot = GraphSnapshot()
+    snapshot.add(NodeSnapshot("Model.fit", "abc", "resolved", "Fits.", "", ["helper"]))
+    snapshot.add(NodeSnapshot("helper", "def", "resolved", "Doubles.", ""))
+    path = tmp_path / "graph.json"
+    snapshot.save(path)
+    loaded = GraphSnapshot.load(path)
+    assert loaded == snapshot
+    assert loaded.reusable("helper", "def") is not None
+    assert loaded.reusable("helper", "changed") is None
+    assert loaded.dependents() == {"helper": {"Model.fit"}}
+    assert GraphSnapshot.load(tmp_path / "missing.json") is None
+
+
+def test_snapshot_keeps_same_named_helpers_apart():
+    snapshot = GraphSnapshot()
+    snapshot.add(
+        NodeSnapshot("helper", "abc", "resolved", "A.", "", key="pkg.a:helper")
+    )
+    snapshot.add(
+        NodeSnapshot("helper", "def", "resolved", "B.", "", key="pkg.b:helper")
+    )
+    assert snapshot.reusable("pkg.a:helper", "abc").description == "A."
+    assert snapshot.reusable("pkg.b:helper", "def").description == "B."
+
+
+def test_changed_helper_invalidates_the_class_using_it(tmp_path, monkeypatch):
+    async def fan_and_evaluate(source, name, docs, improvement=None):
+        context = ["helper"] if name == "Model.fit" else []
+        return f"Describes {name}.", EvaluationResponse(0, "", context, False)
+
+    monkeypatch.setattr(explorer, "fan_and_evaluate", fan_and_evaluate)
+    path = tmp_path / "model.py"
+    path.write_text(SOURCE)
+
+    def build() -> tuple[DependencyGraph, dict]:
+        module = parse_module(path, module_name="pkg.model", starting_path=None)
+        graph: DependencyGraph = DependencyGraph()
+        asyncio.run(build_dependency_graph(module.resolve_name("Model").origin, graph))
+        return graph, module_keys(module, "pkg.model", SOURCE)
+
+    graph, keys = build()
+    for node in graph.nodes():
+        node.state = NodeState.RESOLVED
+    snapshot = take_snapshot(graph, keys)
+    # The helper's node is named after the method that reached it, its key isn't.
+    assert sorted(snapshot.nodes) == [
+        "pkg.model:Model",
+        "pkg.model:Model.fit",
+        "pkg.model:Model.size",
+        "pkg.model:helper",
+    ]
+
+    graph, keys = build()
+    changed = changed_names({path: {2}}, {path: "pkg.model"})
+    assert changed == {"pkg.model:helper"}
+    affected = restore_from_snapshot(graph, snapshot, changed, keys)
+    assert sorted(keys[container] for container in affected) == [
+        "pkg.model:Model",
+        "pkg.model:Model.fit",
+        "pkg.model:helper",
+    ]
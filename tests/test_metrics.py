@@ -0,0 +1,26 @@
+import json
+
+from automodeldocs.metrics import MetricsRegistry
+
+
+def test_metrics_export():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests")
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    requests.inc(stage="scratch")
+    requests.inc(2, stage="scratch")
+    latency.observe(0.5, stage="scratch")
+    latency.observe(5.0, stage="scratch")
+
+    snapshot = json.loads(registry.to_json())
+    assert snapshot["requests_total"]["values"] == [
+        {"labels": {"stage": "scratch"}, "value": 3}
+    ]
+    assert snapshot["latency_seconds"]["values"][0]["count"] == 2
+
+    prometheus = registry.to_prometheus()
+    assert "# TYPE requests_total counter" in prometheus
+    assert 'requests_total{stage="scratch"} 3' in prometheus
+    assert 'latency_seconds_bucket{stage="scratch",le="1.0"} 1' in prometheus
+    assert 'latency_seconds_bucket{stage="scratch",le="+Inf"} 2' in prometheus
+    assert 'latency_seconds_sum{stage="scratch"} 5.5' in prometheus
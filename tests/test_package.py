@@ -0,0 +1,22 @@
+from automodeldocs.package import package_modules, public_names
+
+
+def test_public_names_prefers_dunder_all():
+    assert public_names("__all__ = ['fit']\ndef fit(): pass\ndef other(): pass") == [
+        "fit"
+    ]
+    assert public_names("def fit(): pass\ndef _private(): pass\nclass Model: pass") == [
+        "fit",
+        "Model",
+    ]
+
+
+def test_package_modules_skips_private_modules(tmp_path):
+    package = tmp_path / "models"
+    (package / "_internal").mkdir(parents=True)
+    for path in ["__init__.py", "linear.py", "_utils.py", "_internal/helpers.py"]:
+        (package / path).write_text("")
+    assert [name for _, name in package_modules(package)] == [
+        "models",
+        "models.linear",
+    ]
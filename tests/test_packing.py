@@ -0,0 +1,82 @@
+import asyncio
+import json
+
+import pytest
+
+import automodeldocs.packing as packing
+from automodeldocs.packing import (
+    FunctionPacker,
+    PackedItem,
+    PackingError,
+    parse_packed_evaluations,
+    split_packed_sections,
+)
+
+
+def test_split_packed_sections():
+    content = "## Item 0\nSquares x.\n## Item 1: add\nAdds a and b.\n"
+    assert split_packed_sections(content, 2) == ["Squares x.", "Adds a and b."]
+    with pytest.raises(PackingError):
+        split_packed_sections("## Item 0\nSquares x.", 2)
+
+
+def test_parse_packed_evaluations_checks_document_indices():
+    evaluation = {
+        "ratings": [],
+        "additional_context_required": [{"name": "helper", "reasoning": ""}],
+        "best_documentation_feedback": {"idx": "1", "feedback": "More detail."},
+    }
+    content = json.dumps({"items": [{"item": "0", **evaluation}]})
+    [response] = parse_packed_evaluations(content, [2])
+    assert response.documentation_idx == 1
+    assert response.additional_context_items == ["helper"]
+    with pytest.raises(PackingError):
+        parse_packed_evaluations(content, [1])
+
+
+def test_packer_falls_back_to_single_items(monkeypatch):
+    async def unparseable(items, beam_width):
+        raise PackingError("unparseable")
+
+    monkeypatch.setattr(packing, "describe_packed", unparseable)
+    described: list[str] = []
+
+    async def describe_single(item: PackedItem):
+        described.append(item.function_name)
+        return item.function_name, None
+
+    async def run() -> list:
+        packer = FunctionPacker(describe_single, beam_width=lambda name: 1)
+        return list(
+            await asyncio.gather(
+                *[
+                    packer.describe(PackedItem("pass", name, None))
+                    for name in ["a", "b", "c"]
+                ]
+            )
+        )
+
+    assert [name for name, _ in asyncio.run(run())] == ["a", "b", "c"]
+    assert sorted(described) == ["a", "b", "c"]
+
+
+def test_packer_skips_cancelled_items(monkeypatch):
+    async def describe_packed(items, beam_width):
+        await asyncio.sleep(0.02)
+        return [(item.function_name, None) for item in items]
+
+    monkeypatch.setattr(packing, "describe_packed", describe_packed)
+
+    async def run() -> list:
+        packer = FunctionPacker(
+            describe_single=None, beam_width=lambda items: 1, collect_window=0.01
+        )
+        described = [
+            asyncio.ensure_future(packer.describe(PackedItem("pass", name, None)))
+            for name in ["a", "b", "c"]
+        ]
+        await asyncio.sleep(0.015)
+        described[0].cancel()
+        return list(await asyncio.gather(*described[1:]))
+
+    assert [name for name, _ in asyncio.run(run())] == ["b", "c"]
@@ -0,0 +1,35 @@
+import asyncio
+import time
+
+from automodeldocs.chat.rate_limit import (
+    EXPECTED_COMPLETION_TOKENS,
+    RateLimiter,
+    RateLimits,
+    parse_reset_duration,
+)
+
+
+def test_parse_reset_duration():
+    assert parse_reset_duration("20ms") == 0.02
+    assert parse_reset_duration("1s") == 1.0
+    assert parse_reset_duration("6m0s") == 360.0
+    assert parse_reset_duration("2") == 2.0
+    assert parse_reset_duration("soon") is None
+
+
+def test_rate_limiter_waits_for_token_budget():
+    limiter = RateLimiter(
+        "test",
+        RateLimits(
+            requests_per_minute=6000, tokens_per_minute=60 * EXPECTED_COMPLETION_TOKENS
+        ),
+    )
+    # Drain the token bucket, refilling at EXPECTED_COMPLETION_TOKENS tokens per second.
+    limiter.update_from_headers({"x-ratelimit-remaining-tokens": "0"})
+
+    async def acquire() -> float:
+        start = time.monotonic()
+        await limiter.acquire(prompt_tokens=0)
+        return time.monotonic() - start
+
+    assert asyncio.run(acquire()) >= 0.9
@@ -0,0 +1,31 @@
+import asyncio
+
+from automodeldocs import explorer
+from automodeldocs.explorer import (
+    DescriptionNode,
+    NodeState,
+    describe_and_try_resolve_node,
+    refinement_stop_reason,
+)
+from automodeldocs.graph import DependencyGraph
+
+
+def test_refinement_stop_reason():
+    first, second = "Fits the model to data.", "Trains weights on X and y."
+    assert refinement_stop_reason(1, 3, first, second, 0, 0.95) == "no_new_context"
+    assert refinement_stop_reason(1, 3, first, first + "!", 2, 0.95) == "converged"
+    assert refinement_stop_reason(3, 3, first, second, 2, 0.95) == "iteration_cap"
+    assert refinement_stop_reason(1, 3, first, second, 2, 0.95) is None
+
+
+def test_capped_node_resolves_without_another_pass(monkeypatch):
+    async def fan_and_evaluate(*args, **kwargs):
+        raise AssertionError("No improvement pass expected")
+
+    monkeypatch.setattr(explorer, "fan_and_evaluate", fan_and_evaluate)
+    node = DescriptionNode("fit", "fit", "Fits.", "", NodeState.RESOLVING, 2)
+    graph: DependencyGraph = DependencyGraph()
+    graph.update("fit", node)
+    asyncio.run(describe_and_try_resolve_node(node, {}, graph))
+    assert node.state is NodeState.RESOLVED
+    assert node.iterations == 2
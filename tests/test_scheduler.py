@@ -0,0 +1,49 @@
+import asyncio
+
+from automodeldocs.graph import DependencyGraph
+from automodeldocs.scheduler import TopologicalScheduler
+
+
+def build_graph(edges: dict[str, list[str]]) -> DependencyGraph[str]:
+    graph: DependencyGraph[str] = DependencyGraph()
+    for name, dependencies in edges.items():
+        graph.update(name, name)
+        for dependency in dependencies:
+            graph.add_edge(name, dependency)
+    return graph
+
+
+def test_scheduler_describes_dependencies_first_in_parallel():
+    graph = build_graph({"root": ["a", "b"], "a": ["leaf"], "b": ["leaf"], "leaf": []})
+    order: list[str] = []
+
+    async def describe(name: str) -> bool:
+        await asyncio.sleep(0.01)
+        order.append(name)
+        return True
+
+    scheduler = TopologicalScheduler(graph, describe, concurrency=4)
+    asyncio.run(scheduler.run(["root"]))
+    assert order[0] == "leaf"
+    assert set(order[1:3]) == {"a", "b"}
+    assert order[3] == "root"
+    assert scheduler.stats() == {"described": 4, "cycles_broken": 0, "max_parallel": 2}
+
+
+def test_scheduler_breaks_cycles_and_picks_up_new_dependencies():
+    graph = build_graph({"a": ["b"], "b": ["a"]})
+    passes: dict[str, int] = {}
+
+    async def describe(name: str) -> bool:
+        passes[name] = passes.get(name, 0) + 1
+        if name == "a" and passes[name] == 1:
+            # The first pass asks for more context.
+            graph.update("c", "c")
+            graph.add_edge("a", "c")
+            return False
+        return True
+
+    scheduler = TopologicalScheduler(graph, describe, concurrency=2)
+    asyncio.run(scheduler.run(["a"]))
+    assert set(passes) == {"a", "b", "c"}
+    assert scheduler.stats()["cycles_broken"] >= 1
@@ -0,0 +1,87 @@
+import asyncio
+
+from automodeldocs.chat.single_flight import SingleFlight
+
+
+def test_single_flight_coalesces_concurrent_requests():
+    flight: SingleFlight[int] = SingleFlight("test")
+    calls = 0
+
+    async def request() -> int:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return 42
+
+    async def run() -> list[int]:
+        return list(
+            await asyncio.gather(*[flight.run("key", request) for _ in range(5)])
+        )
+
+    assert asyncio.run(run()) == [42] * 5
+    assert calls == 1
+    assert flight.stats() == {"issued": 1, "coalesced": 4, "in_flight": 0}
+
+
+def test_single_flight_shares_exceptions():
+    flight: SingleFlight[int] = SingleFlight("test_exception")
+
+    async def request() -> int:
+        await asyncio.sleep(0.01)
+        raise ValueError
+
+    async def run() -> list:
+        return list(
+            await asyncio.gather(
+                *[flight.run("key", request) for _ in range(3)], return_exceptions=True
+            )
+        )
+
+    assert all(isinstance(result, ValueError) for result in asyncio.run(run()))
+    assert flight.stats()["issued"] == 1
+
+
+def test_single_flight_survives_a_cancelled_issuer():
+    flight: SingleFlight[int] = SingleFlight("test_cancel")
+
+    async def request() -> int:
+        await asyncio.sleep(0.02)
+        return 42
+
+    async def run() -> int:
+        issuer = asyncio.ensure_future(flight.run("key", request))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(flight.run("key", request))
+        await asyncio.sleep(0)
+        issuer.cancel()
+        return await waiter
+
+    assert asyncio.run(run()) == 42
+    assert flight.stats() == {"issued": 1, "coalesced": 1, "in_flight": 0}
+
+
+def test_single_flight_starts_afresh_while_a_cancelled_request_winds_down():
+    flight: SingleFlight[int] = SingleFlight("test_wind_down")
+    calls = 0
+
+    async def request() -> int:
+        nonlocal calls
+        calls += 1
+        try:
+            await asyncio.sleep(0.02)
+        except asyncio.CancelledError:
+            # Cleanup that awaits, like closing an aiohttp response.
+            await asyncio.sleep(0.02)
+            raise
+        return 42
+
+    async def run() -> int:
+        abandoned = asyncio.ensure_future(flight.run("key", request))
+        await asyncio.sleep(0.005)
+        abandoned.cancel()
+        await asyncio.sleep(0.005)
+        return await flight.run("key", request)
+
+    assert asyncio.run(run()) == 42
+    assert calls == 2
+    assert flight.stats() == {"issued": 2, "coalesced": 0, "in_flight": 0}
@@ -0,0 +1,25 @@
+import asyncio
+from typing import AsyncIterator
+
+from automodeldocs.describe.function_scratch_prompt import SCRATCH_END
+from automodeldocs.writer import read_section
+
+
+async def deltas(*chunks: str) -> AsyncIterator[str]:
+    for chunk in chunks:
+        yield chunk
+
+
+def test_read_section_keeps_comment_lines():
+    scratch = asyncio.run(
+        read_section(
+            deltas(
+                "# Scratch\nThe loop reads\n",
+                "# update weights\nfrom the source.\n",
+                f"{SCRATCH_END}\n# Report\nFits the model.",
+            ),
+            heading="# Scratch",
+            next_heading=SCRATCH_END,
+        )
+    )
+    assert scratch == "# Scratch\nThe loop reads\n# update weights\nfrom the source."